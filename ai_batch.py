@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Agrupación de mensajes para la IA (micro-batching)
+Los mensajes que llegan dentro de una ventana de pocos milisegundos se envían
+al modelo en una sola petición que devuelve un array JSON de intenciones; cada
+resultado vuelve al hilo que estaba esperando su mensaje. Solo se agrupan los
+mensajes sin contexto de tareas: las tareas de un usuario no viajan junto a
+los mensajes de otros. Si la respuesta no trae exactamente un objeto por id,
+cada mensaje del lote se repite en su propia petición.
+"""
+
+import os
+import json
+import time
+import queue
+from threading import Thread, Lock
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ai_client import completar, construir_prompt_lote, limpiar_json, OPENAI_MAX_CONCURRENCY
+
+# 0 desactiva la agrupación: cada mensaje hace su propia petición
+AI_BATCH_WINDOW_MS = int(os.getenv('AI_BATCH_WINDOW_MS', 0))
+AI_BATCH_MAX_SIZE = int(os.getenv('AI_BATCH_MAX_SIZE', 16))
+
+# Tokens de respuesta por mensaje del lote
+TOKENS_POR_MENSAJE = 120
+
+
+def procesar_lote_con_ia(mensajes):
+    """
+    Interpreta varios mensajes sin contexto en una petición y devuelve una
+    intención por mensaje. ValueError si la respuesta no trae exactamente un
+    objeto por cada id del lote.
+    """
+    respuesta = completar(construir_prompt_lote(mensajes), max_tokens=TOKENS_POR_MENSAJE * len(mensajes))
+    intenciones = json.loads(limpiar_json(respuesta))
+    if not isinstance(intenciones, list) or len(intenciones) != len(mensajes):
+        raise ValueError("La IA no devolvió un objeto por mensaje")
+    por_id = {}
+    for intencion in intenciones:
+        if not isinstance(intencion, dict) or intencion.get('id') in por_id:
+            raise ValueError("Respuesta de la IA sin id o con ids repetidos")
+        por_id[intencion.pop('id', None)] = intencion
+    ids = range(1, len(mensajes) + 1)
+    if set(por_id) != set(ids):
+        raise ValueError("Los ids de la respuesta no coinciden con los del lote")
+    return [por_id[n] for n in ids]
+
+
+class IntentBatcher:
+    """Junta mensajes durante `window_ms` (o hasta `max_size`) y los resuelve en lote"""
+
+    def __init__(self, procesar_uno, procesar_lote=procesar_lote_con_ia,
+                 window_ms=AI_BATCH_WINDOW_MS, max_size=AI_BATCH_MAX_SIZE, concurrency=OPENAI_MAX_CONCURRENCY):
+        self.procesar_uno = procesar_uno
+        self.procesar_lote = procesar_lote
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-batch')
+        self._thread = None
+        self._lock = Lock()
+        self.stats = {'messages': 0, 'batches': 0, 'errors': 0, 'fallbacks': 0}
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_size > 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._collect, daemon=True, name='ai-batch-collector')
+            self._thread.start()
+        return self
+
+    def submit(self, mensaje, tareas_usuario):
+        """
+        Encola un mensaje y espera su intención (None si la IA falló). Con
+        tareas del usuario como contexto va en su propia petición.
+        """
+        if not self.enabled or tareas_usuario:
+            return self.procesar_uno(mensaje, tareas_usuario)
+        self.start()
+        future = Future()
+        self._queue.put((mensaje, future))
+        return future.result()
+
+    def _collect(self):
+        while True:
+            lote = [self._queue.get()]
+            limite = time.monotonic() + self.window
+            while len(lote) < self.max_size:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._queue.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run, lote)
+
+    def _run(self, lote):
+        with self._lock:
+            self.stats['messages'] += len(lote)
+            self.stats['batches'] += 1
+
+        if len(lote) == 1:
+            return self._uno(*lote[0])
+        try:
+            intenciones = self.procesar_lote([mensaje for mensaje, _ in lote])
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+                self.stats['fallbacks'] += len(lote)
+            print(f"⚠️ Error en lote de IA ({len(lote)} mensajes), se repiten por separado: {e}")
+            # Sin esperar aquí: cada mensaje ocupa su propio hilo del pool
+            for mensaje, future in lote:
+                self._executor.submit(self._uno, mensaje, future)
+            return
+
+        for (_, future), intencion in zip(lote, intenciones):
+            future.set_result(intencion)
+
+    def _uno(self, mensaje, future):
+        try:
+            future.set_result(self.procesar_uno(mensaje, []))
+        except Exception as e:
+            print(f"⚠️ Error en mensaje de IA: {e}")
+            future.set_result(None)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lotes = stats['batches']
+        return {
+            **stats,
+            'enabled': self.enabled,
+            'window_ms': int(self.window * 1000),
+            'max_size': self.max_size,
+            'avg_batch_size': round(stats['messages'] / lotes, 2) if lotes else None
+        }
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Caché LRU con TTL para las respuestas de la IA
+La clave combina el mensaje normalizado, un intervalo de tiempo (la respuesta
+depende de la hora actual) y un hash de las tareas pendientes que van en el
+prompt. Las entradas de un usuario se invalidan cuando cambian sus tareas.
+"""
+
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+from intents import normalizar
+
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', 1000))
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 300))
+AI_CACHE_BUCKET_SECONDS = int(os.getenv('AI_CACHE_BUCKET_SECONDS', 60))
+
+
+def hash_contexto(tareas_usuario):
+    """Hash de los campos de las tareas que forman parte del prompt"""
+    contexto = [(t['description'], t.get('due_time')) for t in tareas_usuario]
+    return hashlib.sha1(json.dumps(contexto, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """LRU acotado en tamaño con caducidad por entrada e índice por usuario"""
+
+    def __init__(self, max_entries=AI_CACHE_SIZE, ttl=AI_CACHE_TTL, bucket_seconds=AI_CACHE_BUCKET_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bucket_seconds = bucket_seconds
+        self._entries = OrderedDict()   # clave -> (expira, valor)
+        self._by_user = {}              # user_id -> {claves}
+        self._lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def key(self, user_id, mensaje, tareas_usuario):
+        """Clave de caché para un mensaje y el contexto con el que se enviaría a la IA"""
+        bucket = int(time.time() // self.bucket_seconds) if self.bucket_seconds else 0
+        return (str(user_id), normalizar(mensaje), bucket, hash_contexto(tareas_usuario))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def invalidate(self, user_id):
+        """Elimina las respuestas cacheadas de un usuario"""
+        with self._lock:
+            for key in self._by_user.pop(str(user_id), ()):
+                self._entries.pop(key, None)
+                self.stats['invalidations'] += 1
+
+    def metrics(self):
+        with self._lock:
+            consultas = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'hit_rate': round(self.stats['hits'] / consultas, 3) if consultas else None
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Archivo de tareas completadas (almacenamiento en frío)
+Las tareas completadas hace más de N días salen del conjunto activo y se
+agregan a archivos gzip JSONL append-only, uno por usuario y mes:
+archive/<user_id>/<YYYY-MM>.jsonl.gz
+"""
+
+import os
+import gzip
+import json
+from datetime import datetime, timedelta
+from threading import Lock
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+
+
+class TaskArchive:
+    """Archivos gzip JSONL por usuario y mes, leídos de forma paginada"""
+
+    def __init__(self, base_dir=ARCHIVE_DIR):
+        self.base_dir = base_dir
+        self._lock = Lock()
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.base_dir, str(user_id))
+
+    def append(self, user_id, tasks):
+        """Agrega tareas al archivo del mes en que se completaron"""
+        por_mes = {}
+        for task in tasks:
+            mes = (task.get('completed_at') or datetime.now().isoformat())[:7]
+            por_mes.setdefault(mes, []).append(task)
+
+        user_dir = self._user_dir(user_id)
+        with self._lock:
+            os.makedirs(user_dir, exist_ok=True)
+            for mes, tareas in por_mes.items():
+                # 'ab' agrega un miembro gzip nuevo; gzip los lee como un solo flujo
+                with gzip.open(os.path.join(user_dir, f"{mes}.jsonl.gz"), 'ab') as f:
+                    for task in tareas:
+                        f.write((json.dumps(task, ensure_ascii=False) + '\n').encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileobj.fileno())
+
+    def months(self, user_id):
+        """Meses archivados de un usuario, del más reciente al más antiguo"""
+        user_dir = self._user_dir(user_id)
+        if not os.path.isdir(user_dir):
+            return []
+        return sorted((name[:7] for name in os.listdir(user_dir) if name.endswith('.jsonl.gz')), reverse=True)
+
+    def _read_month(self, user_id, mes):
+        tasks = []
+        with gzip.open(os.path.join(self._user_dir(user_id), f"{mes}.jsonl.gz"), 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    tasks.append(json.loads(line))
+        return tasks
+
+    def page(self, user_id, cursor=None, limit=50):
+        """
+        Página de tareas archivadas, más recientes primero. El cursor tiene la
+        forma 'YYYY-MM:N' (saltar las N más recientes de ese mes); solo se leen
+        los meses necesarios para llenar la página.
+        Devuelve (tareas, siguiente_cursor o None).
+        """
+        meses = self.months(user_id)
+        inicio_mes, saltar = None, 0
+        if cursor:
+            inicio_mes, saltar = cursor.split(':')
+            saltar = int(saltar)
+            meses = [m for m in meses if m <= inicio_mes]
+
+        tareas = []
+        for mes in meses:
+            del_mes = list(reversed(self._read_month(user_id, mes)))
+            if mes != inicio_mes:
+                saltar = 0
+            restantes = del_mes[saltar:]
+            faltan = limit - len(tareas)
+            tareas.extend(restantes[:faltan])
+            if len(restantes) > faltan:
+                return tareas, f"{mes}:{saltar + faltan}"
+            if len(tareas) == limit:
+                siguiente = next((m for m in meses if m < mes), None)
+                return tareas, f"{siguiente}:0" if siguiente else None
+        return tareas, None
+
+
+def archivar_completadas(task_manager, archive, dias=ARCHIVE_AFTER_DAYS):
+    """
+    Mueve al archivo las tareas completadas hace más de `dias` días.
+    Se escribe primero el archivo y luego se quitan del conjunto activo: si el
+    proceso muere entre ambos pasos, la tarea puede quedar duplicada en el
+    archivo, pero nunca se pierde.
+    """
+    limite = (datetime.now() - timedelta(days=dias)).isoformat()
+    total = 0
+    for user_id in task_manager.get_user_ids():
+        viejas = [t for t in task_manager.get_user_tasks(user_id)
+                  if t['completed'] and (t.get('completed_at') or '') < limite]
+        if not viejas:
+            continue
+        archive.append(user_id, viejas)
+        task_manager.remove_tasks(user_id, [t['id'] for t in viejas])
+        total += len(viejas)
+    return total
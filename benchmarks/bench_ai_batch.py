@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: agrupación de mensajes para la IA (IntentBatcher) contra el stub
+local de OpenAI. Muchos remitentes escriben a la vez; se compara una petición
+por mensaje con lotes de distintas ventanas (rendimiento frente a latencia).
+
+Uso: python benchmarks/bench_ai_batch.py [--clientes 64] [--mensajes 5]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stub_openai import StubOpenAIServer
+
+VENTANAS_MS = [0, 10, 25, 50]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(batcher, clientes, mensajes):
+    latencias = []
+
+    def cliente(n):
+        for m in range(mensajes):
+            inicio = time.perf_counter()
+            intencion = batcher.submit(f'Tarea {n}-{m} a las {m + 1}pm', [])
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            assert intencion and intencion['accion'] == 'crear_tarea', intencion
+
+    hilos = [Thread(target=cliente, args=(n,)) for n in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+    return len(latencias) / total, percentil(latencias, 0.5), percentil(latencias, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clientes', type=int, default=64)
+    parser.add_argument('--mensajes', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--per-item', type=float, default=0.01)
+    parser.add_argument('--max-size', type=int, default=16)
+    args = parser.parse_args()
+
+    stub = StubOpenAIServer(latency=args.latency, per_item=args.per_item).start()
+    os.environ['OPENAI_BASE_URL'] = stub.url
+    os.environ['OPENAI_API_KEY'] = 'sk-stub'
+
+    from ai_client import completar, construir_prompt, limpiar_json, OPENAI_MAX_CONCURRENCY
+    from ai_batch import IntentBatcher
+
+    def procesar_uno(mensaje, tareas):
+        return json.loads(limpiar_json(completar(construir_prompt(mensaje, tareas))))
+
+    print(f"stub {args.latency * 1000:.0f} ms + {args.per_item * 1000:.0f} ms/mensaje; "
+          f"{OPENAI_MAX_CONCURRENCY} peticiones simultáneas")
+    # Con poca carga la ventana solo añade espera; con mucha, los lotes multiplican el rendimiento
+    for clientes in (4, args.clientes):
+        print(f"\n{clientes} remitentes x {args.mensajes} mensajes")
+        for ventana in VENTANAS_MS:
+            batcher = IntentBatcher(procesar_uno, window_ms=ventana, max_size=args.max_size)
+            peticiones = stub.requests
+            rendimiento, p50, p95 = medir(batcher, clientes, args.mensajes)
+            nombre = 'sin lotes' if not ventana else f'ventana {ventana} ms'
+            print(f"{nombre:<16} {rendimiento:>8.1f} msg/s   p50 {p50:>7.1f} ms   p95 {p95:>7.1f} ms   "
+                  f"peticiones {stub.requests - peticiones}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: caché de respuestas de la IA frente a una llamada por mensaje,
+contra el stub local de OpenAI (benchmarks/stub_openai.py). La carga simula
+usuarios que repiten mensajes parecidos (mayúsculas, puntuación, reintentos).
+
+Uso: python benchmarks/bench_ai_cache.py [--mensajes 300] [--latency 0.05]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stub_openai import StubOpenAIServer
+
+FRASES = [
+    'Comprar pan a las 3pm', 'llamar al doctor 5pm', 'qué tengo pendiente',
+    'pagar la luz a las 9', 'recoger a los niños 4:30 pm', 'sacar la basura 8pm',
+    'revisar correo 10am', 'ir al gimnasio a las 7', 'qué me falta hoy', 'regar las plantas 6pm'
+]
+
+
+def variante(frase):
+    """La misma frase como la escribiría un usuario otra vez"""
+    return random.choice([frase, frase.lower(), frase.upper(), frase + '.', '  ' + frase + '!'])
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(nombre, funcion, carga):
+    latencias = []
+    for user_id, mensaje, tareas in carga:
+        inicio = time.perf_counter()
+        funcion(user_id, mensaje, tareas)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    print(f"{nombre:<22} media {sum(latencias) / len(latencias):>8.2f} ms   "
+          f"p50 {percentil(latencias, 0.5):>8.2f} ms   p95 {percentil(latencias, 0.95):>8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mensajes', type=int, default=300)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = StubOpenAIServer(latency=args.latency).start()
+    os.environ['OPENAI_BASE_URL'] = stub.url
+    os.environ['OPENAI_API_KEY'] = 'sk-stub'
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_ai_cache_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+
+    random.seed(7)
+    tareas = {u: [{'description': f'tarea {n}', 'due_time': '10:00'} for n in range(u % 4)]
+              for u in range(args.usuarios)}
+    carga = []
+    for _ in range(args.mensajes):
+        user_id = random.randrange(args.usuarios)
+        # Zipf aproximado: unas pocas frases concentran la mayoría de mensajes
+        frase = FRASES[min(int(random.paretovariate(1.2)) - 1, len(FRASES) - 1)]
+        carga.append((user_id, variante(frase), tareas[user_id]))
+
+    print(f"{args.mensajes} mensajes, {args.usuarios} usuarios, latencia del stub {args.latency * 1000:.0f} ms")
+    peticiones = stub.requests
+    medir('sin caché', lambda u, m, t: bot.procesar_con_ia(m, t), carga)
+    sin_cache = stub.requests - peticiones
+
+    peticiones = stub.requests
+    medir('con caché', bot.procesar_con_ia_cache, carga)
+    con_cache = stub.requests - peticiones
+
+    print(f"peticiones a OpenAI: sin caché {sin_cache}, con caché {con_cache}")
+    print(f"métricas de la caché: {bot.ai_cache.metrics()}")
+
+
+if __name__ == '__main__':
+    main()
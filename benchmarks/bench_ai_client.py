@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coste por llamada de procesar_con_ia contra el stub local de
+OpenAI sin latencia. Cliente nuevo (y pool de conexiones nuevo) en cada
+mensaje, como antes, frente al cliente compartido.
+
+Uso: python benchmarks/bench_ai_client.py [--llamadas 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from stub_openai import StubOpenAIServer
+
+TAREAS = [{'description': f'tarea {n}', 'due_time': '10:00'} for n in range(5)]
+
+
+def llamada_anterior(mensaje):
+    """Cliente nuevo por mensaje, como hacía procesar_con_ia antes"""
+    from openai import OpenAI
+    from ai_client import construir_prompt
+
+    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    prompt = construir_prompt(mensaje, TAREAS)
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3,
+        max_tokens=500
+    )
+    return response.choices[0].message.content
+
+
+def llamada_compartida(mensaje):
+    from ai_client import completar, construir_prompt
+    return completar(construir_prompt(mensaje, TAREAS))
+
+
+def medir(nombre, funcion, llamadas):
+    funcion('calentar')
+    inicio = time.perf_counter()
+    for n in range(llamadas):
+        funcion(f'Comprar pan {n} a las 3pm')
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<34} {total / llamadas * 1000:>8.2f} ms/llamada")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--llamadas', type=int, default=200)
+    args = parser.parse_args()
+
+    stub = StubOpenAIServer(latency=0).start()
+    os.environ['OPENAI_BASE_URL'] = stub.url
+    os.environ['OPENAI_API_KEY'] = 'sk-stub'
+
+    print(f"{args.llamadas} llamadas contra el stub sin latencia")
+    medir('cliente nuevo por mensaje', llamada_anterior, args.llamadas)
+    medir('cliente compartido + plantilla', llamada_compartida, args.llamadas)
+
+
+if __name__ == '__main__':
+    main()
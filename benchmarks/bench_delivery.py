@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de envío de WhatsApp contra un stub local de Evolution API:
+envío serial con una conexión nueva por mensaje (comportamiento anterior)
+frente a WhatsAppSender con distintos tamaños de pool.
+
+Uso: python benchmarks/bench_delivery.py
+"""
+
+import os
+import sys
+import time
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import requests
+from delivery import WhatsAppSender, normalizar_destino
+from ratelimit import RateLimiter
+from stub_evolution import StubEvolutionServer
+
+MENSAJES = 200
+DESTINATARIOS = 50
+LATENCIA = 0.02
+
+
+def serial(url):
+    for n in range(MENSAJES):
+        requests.post(
+            f"{url}/message/sendText/bench",
+            json={'number': normalizar_destino(f'+52{n % DESTINATARIOS}'), 'text': f'msg {n}'},
+            headers={'Content-Type': 'application/json', 'apikey': 'bench'},
+            timeout=10
+        )
+
+
+def pool(url, workers):
+    # Sin límite de velocidad: se mide el rendimiento del pool (ver bench_rate_limit.py)
+    sender = WhatsAppSender(api_url=url, api_key='bench', instance='bench', workers=workers,
+                            limiter=RateLimiter(rate=0, recipient_per_minute=0))
+    for n in range(MENSAJES):
+        sender.enqueue(f'+52{n % DESTINATARIOS}', f'msg {n}')
+    sender.join()
+    return sender
+
+
+def medir(nombre, fn):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:<28} {MENSAJES / segundos:>8.1f} msg/s")
+
+
+def main():
+    server = StubEvolutionServer(latency=LATENCIA).start()
+    print(f"{MENSAJES} mensajes a {DESTINATARIOS} números, latencia del stub {LATENCIA * 1000:.0f} ms")
+    medir('serial (conexión nueva)', lambda: serial(server.url))
+    for workers in (1, 4, 16):
+        medir(f'pool {workers} worker(s)', lambda: pool(server.url, workers))
+
+    # Orden por destinatario: los mensajes a un mismo número llegan en orden
+    server.received.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pool(server.url, 16)
+    por_numero = {}
+    for _, number, text in server.received:
+        por_numero.setdefault(number, []).append(int(text.split()[1]))
+    en_orden = all(ids == sorted(ids) for ids in por_numero.values())
+    print(f"orden por destinatario preservado: {en_orden}")
+
+
+if __name__ == '__main__':
+    main()
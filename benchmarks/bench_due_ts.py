@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: una pasada de recordatorios sobre 100k tareas.
+
+- antes: parsear due_date/due_time con strptime en cada tarea pendiente
+- due_ts: comparar el epoch precalculado de cada tarea
+- heap: sacar del ReminderScheduler solo las entradas vencidas
+
+Uso: python benchmarks/bench_due_ts.py
+"""
+
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scheduler import ReminderScheduler, parse_due_ts
+
+TAREAS = 100_000
+VENCIDAS = 0.01
+
+
+def generar_tareas(now):
+    random.seed(42)
+    tasks = []
+    for n in range(TAREAS):
+        if random.random() < VENCIDAS:
+            due = now - timedelta(minutes=random.randint(1, 600))
+        else:
+            due = now + timedelta(minutes=random.randint(1, 60 * 24 * 30))
+        due_date, due_time = due.strftime('%Y-%m-%d'), due.strftime('%H:%M')
+        tasks.append({
+            'id': n,
+            'completed': False,
+            'due_date': due_date,
+            'due_time': due_time,
+            'due_ts': parse_due_ts(due_date, due_time),
+        })
+    return tasks
+
+
+def pasada_strptime(tasks, now):
+    vencidas = []
+    for task in tasks:
+        if task['completed']:
+            continue
+        if task.get('due_date') and task.get('due_time'):
+            try:
+                due_datetime = datetime.strptime(f"{task['due_date']} {task['due_time']}", '%Y-%m-%d %H:%M')
+                if now >= due_datetime:
+                    vencidas.append(task)
+            except:
+                pass
+    return vencidas
+
+
+def pasada_due_ts(tasks, now):
+    now_ts = now.timestamp()
+    return [t for t in tasks if not t['completed'] and t['due_ts'] is not None and t['due_ts'] <= now_ts]
+
+
+def medir(nombre, fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    ms = (time.perf_counter() - inicio) * 1000
+    print(f"{nombre:<32} {ms:>10.2f} ms  ({len(resultado)} vencidas)")
+
+
+def main():
+    now = datetime.now()
+    tasks = generar_tareas(now)
+
+    scheduler = ReminderScheduler()
+    for task in tasks:
+        scheduler.schedule('1', task['id'], task['due_ts'])
+
+    print(f"Pasada de recordatorios sobre {TAREAS} tareas pendientes")
+    medir('antes (strptime por tarea)', lambda: pasada_strptime(tasks, now))
+    medir('due_ts precalculado', lambda: pasada_due_ts(tasks, now))
+    medir('heap (solo vencidas)', lambda: scheduler.pop_due(now.timestamp()))
+
+
+if __name__ == '__main__':
+    main()
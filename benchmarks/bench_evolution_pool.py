@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: envío repartido entre varias instancias de Evolution API
+Levanta un stub por instancia y mide con WhatsAppSender:
+1) reparto por pesos (1/1/2) y que cada número salga siempre por la misma instancia
+2) rendimiento con 1, 2 y 3 instancias cuando cada una acepta N pet/s
+3) una instancia se desconecta a mitad de la ráfaga: mensajes perdidos,
+   failovers y tiempo; al reconectarse sus números vuelven a ella
+
+Uso: python benchmarks/bench_evolution_pool.py [--mensajes 600] [--limite 20]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from delivery import WhatsAppSender, normalizar_destino
+from evolution_pool import EvolutionInstance, EvolutionPool
+from ratelimit import RateLimiter
+from stub_evolution import StubEvolutionServer
+
+
+def crear(pesos, limite=0, latencia=0.01, tasa=0, cooldown=30):
+    """Un stub por instancia y un WhatsAppSender que reparte entre ellos"""
+    stubs = [StubEvolutionServer(latency=latencia, rate_limit=limite).start() for _ in pesos]
+    pool = EvolutionPool([EvolutionInstance(f'bot{n}', stub.url, 'bench', peso)
+                          for n, (stub, peso) in enumerate(zip(stubs, pesos))],
+                         failure_threshold=2, cooldown=cooldown, health_seconds=0)
+    limiter = RateLimiter(rate=tasa, burst=max(1, limite - tasa), recipient_per_minute=0)
+    sender = WhatsAppSender(instances=pool, workers=16, max_retries=3, backoff=0.05, limiter=limiter)
+    return stubs, sender
+
+
+def enviar(sender, mensajes, numeros, al_encolar=None):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(mensajes):
+            sender.enqueue(f'+52155{n % numeros:08d}', f'msg {n}')
+            if al_encolar:
+                al_encolar(n)
+        sender.join()
+    return time.perf_counter() - inicio
+
+
+def rutas(stubs):
+    """número -> instancias por las que salió"""
+    destino = defaultdict(set)
+    for stub in stubs:
+        for instancia, numero, _ in stub.received:
+            destino[numero].add(instancia)
+    return destino
+
+
+def reparto(mensajes, numeros):
+    pesos = (1, 1, 2)
+    print(f"1) {mensajes} mensajes a {numeros} números, 3 instancias con pesos {'/'.join(map(str, pesos))}")
+    stubs, sender = crear(pesos)
+    segundos = enviar(sender, mensajes, numeros)
+    total = sum(pesos)
+    for n, (stub, peso) in enumerate(zip(stubs, pesos)):
+        print(f"   bot{n} (peso {peso}): {len(stub.received):>5} mensajes  {len(stub.received) / mensajes:>5.1%}  "
+              f"(esperado {peso / total:.1%})")
+    destino = rutas(stubs)
+    mezclados = sum(1 for instancias in destino.values() if len(instancias) > 1)
+    print(f"   {len(destino)} números, {mezclados} salieron por más de una instancia; {segundos:.1f} s")
+    for stub in stubs:
+        stub.shutdown()
+
+
+def escala(mensajes, numeros, limite):
+    tasa = max(1, limite * 4 // 5)
+    print(f"2) {mensajes} mensajes; cada instancia acepta {limite} pet/s y se envía a {tasa}/s por instancia")
+    referencia = None
+    for instancias in (1, 2, 3):
+        stubs, sender = crear([1] * instancias, limite=limite, tasa=tasa)
+        segundos = enviar(sender, mensajes, numeros)
+        referencia = referencia or segundos
+        print(f"   {instancias} instancia(s): {segundos:>5.1f} s  {mensajes / segundos:>5.0f} msg/s  x{referencia / segundos:.2f}  "
+              f"entregados {sender.stats['sent']:>4}  429 {sum(s.throttled for s in stubs):>3}  "
+              f"intervalo del planificador {sender.send_interval() * 1000:.0f} ms")
+        for stub in stubs:
+            stub.shutdown()
+
+
+def failover(mensajes, numeros):
+    print(f"3) {mensajes} mensajes a {numeros} números; bot1 se desconecta al encolar la mitad")
+    stubs, sender = crear((1, 1, 1), latencia=0.02)
+    asignada = {normalizar_destino(f'+52155{n:08d}'): sender.instances.pick(normalizar_destino(f'+52155{n:08d}')).name
+                for n in range(numeros)}
+
+    def desconectar(n):
+        if n == mensajes // 2:
+            stubs[1].state = 'close'
+
+    segundos = enviar(sender, mensajes, numeros, desconectar)
+    metricas = sender.instances.metrics()
+    entregados = sum(len(stub.received) for stub in stubs)
+    print(f"   {segundos:.1f} s  entregados {entregados}/{mensajes}  perdidos {sender.stats['failed']}  "
+          f"reintentos {sender.stats['retried']}  failovers {sum(m['failovers'] for m in metricas.values())}  "
+          f"bot1 disponible: {metricas['bot1']['available']}")
+
+    stubs[1].state = 'open'
+    sender.instances.check_health(sender.session)
+    for stub in stubs:
+        stub.received.clear()
+    enviar(sender, numeros, numeros)
+    vuelven = sum(1 for numero, instancias in rutas(stubs).items() if instancias == {asignada[numero]})
+    print(f"   tras reconectar bot1: {vuelven}/{numeros} números salen por su instancia original")
+    for stub in stubs:
+        stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mensajes', type=int, default=600)
+    parser.add_argument('--numeros', type=int, default=300)
+    parser.add_argument('--limite', type=int, default=20, help='pet/s que acepta cada instancia')
+    args = parser.parse_args()
+
+    reparto(args.mensajes * 5, args.numeros * 5)
+    escala(args.mensajes, args.numeros, args.limite)
+    failover(args.mensajes, args.numeros)
+
+
+if __name__ == '__main__':
+    main()
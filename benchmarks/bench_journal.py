@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia por mutación de TaskManager con el log de mutaciones
+frente a la reescritura completa de tasks_auth.json, al crecer el número
+de tareas 100x. Después, una racha de mutaciones que lleva el log más allá
+del umbral de compactación (JOURNAL_COMPACT_BYTES): latencia mientras el
+compactador reescribe el snapshot y duración de una compactación.
+
+Uso: python benchmarks/bench_journal.py
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+USERS = 100
+MUTACIONES = 50
+
+
+def poblar(total):
+    """Genera un estado sintético con `total` tareas repartidas entre usuarios"""
+    tasks = {}
+    for n in range(total):
+        user_id = str(n % USERS + 1)
+        tasks.setdefault(user_id, []).append({
+            'id': len(tasks[user_id]) + 1,
+            'description': f'Tarea sintética {n}',
+            'completed': n % 3 == 0,
+            'due_date': '2025-01-01',
+            'due_time': '10:00',
+            'due_ts': 1735725600,
+            'reminder_count': 0,
+            'created_at': '2025-01-01T00:00:00'
+        })
+    return tasks
+
+
+def percentil(tiempos, p):
+    ordenados = sorted(tiempos)
+    return ordenados[min(len(ordenados) - 1, math.ceil(len(ordenados) * p) - 1)]
+
+
+def medir(fn, veces=MUTACIONES):
+    tiempos = []
+    for i in range(veces):
+        inicio = time.perf_counter()
+        fn(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def abrir(total):
+    """TaskManager sobre un snapshot con `total` tareas y sin log"""
+    from reminder_bot_auth import TaskManager, TASKS_FILE
+
+    with open(TASKS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(poblar(total), f)
+    for sufijo in ('.log', '.log.compacting'):
+        if os.path.exists(TASKS_FILE + sufijo):
+            os.remove(TASKS_FILE + sufijo)
+    return TaskManager()
+
+
+def bench(total):
+    from reminder_bot_auth import TASKS_FILE
+
+    # Comportamiento anterior: cada mutación serializa todo el archivo
+    estado = poblar(total)
+
+    def reescritura(i):
+        user_tasks = estado[str(i % USERS + 1)]
+        user_tasks.append({'id': len(user_tasks) + 1, 'description': f'Nueva tarea {i}', 'completed': False})
+        with open(TASKS_FILE + '.full', 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, indent=2)
+
+    manager = abrir(total)
+
+    def journal(i):
+        manager.add_task(i % USERS + 1, f'Nueva tarea {i}', '2025-01-01', '10:00')
+
+    legacy = medir(reescritura)
+    nuevo = medir(journal)
+    manager.store.close()
+    return legacy, nuevo
+
+
+def bench_compactacion(total):
+    """Mutaciones hasta pasar el umbral de compactación; (tiempos, compactaciones, ms de una compactación)"""
+    from reminder_bot_auth import TASKS_FILE
+
+    manager = abrir(total)
+    log_path = TASKS_FILE + '.log'
+    tiempos, compactaciones, tamano, i = [], 0, 0, 0
+    # Cada vuelta crea una tarea y la completa: dos registros en el log
+    while compactaciones < 2:
+        user_id = i % USERS + 1
+        inicio = time.perf_counter()
+        task = manager.add_task(user_id, f'Nueva tarea {i}', '2025-01-01', '10:00')
+        medio = time.perf_counter()
+        manager.complete_task(user_id, task['id'])
+        fin = time.perf_counter()
+        tiempos.extend(((medio - inicio) * 1000, (fin - medio) * 1000))
+        actual = os.path.getsize(log_path)
+        compactaciones += actual < tamano
+        tamano, i = actual, i + 1
+
+    inicio = time.perf_counter()
+    manager.store.compact()
+    duracion = (time.perf_counter() - inicio) * 1000
+    manager.store.close()
+    return tiempos, compactaciones, duracion
+
+
+def main():
+    from journal import COMPACT_THRESHOLD
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_journal_'))
+    print(f"{'tareas':>8} | {'reescritura p50/p99 (ms)':>26} | {'journal p50/p99 (ms)':>22}")
+    for total in (1_000, 10_000, 100_000):
+        legacy, nuevo = bench(total)
+        print(f"{total:>8} | {statistics.median(legacy):>12.3f} / {percentil(legacy, 0.99):>9.3f} | "
+              f"{statistics.median(nuevo):>9.3f} / {percentil(nuevo, 0.99):>9.3f}")
+
+    print(f"\nCruzando el umbral de compactación ({COMPACT_THRESHOLD / 1024 / 1024:.0f} MB de log)")
+    print(f"{'tareas':>8} | {'mutaciones':>10} | {'journal p50/p99/máx (ms)':>26} | {'compactación (ms)':>17}")
+    for total in (10_000, 100_000):
+        tiempos, compactaciones, duracion = bench_compactacion(total)
+        print(f"{total:>8} | {len(tiempos):>10} | {statistics.median(tiempos):>7.3f} / "
+              f"{percentil(tiempos, 0.99):>6.3f} / {max(tiempos):>7.1f} | {duracion:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
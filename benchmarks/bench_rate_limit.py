@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ráfagas de envío contra un Evolution API que limita a N pet/s
+1) WhatsAppSender con una ráfaga de mensajes, sin límite y con el token
+   bucket por instancia: 429 recibidos, mensajes perdidos y pico por segundo.
+2) Pasada del planificador con muchos usuarios vencidos a la vez: todo a la
+   cola de golpe frente al reparto en el tiempo (WHATSAPP_MAX_BACKLOG_SECONDS),
+   con la profundidad máxima de la cola de envío.
+3) Un número que agota su límite por destinatario y otros números atendidos
+   por el mismo worker: cuándo salen los demás (no deben esperarlo).
+4) Recordatorios del outbox a ese número que esperan su turno más que el
+   reclamo (OUTBOX_CLAIM_SECONDS): con barridos frecuentes no deben salir dos
+   veces; sin renovar el reclamo, el barrido los duplica.
+
+Uso: python benchmarks/bench_rate_limit.py [--mensajes 200] [--limite 25] [--tasa 20]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_evolution import StubEvolutionServer
+
+
+def rafaga(mensajes, limite, tasa):
+    """Encola todos los mensajes de golpe y espera a que salgan"""
+    from delivery import WhatsAppSender
+    from ratelimit import RateLimiter
+
+    print(f"1) {mensajes} mensajes a {mensajes // 4} números de golpe; el stub acepta {limite} pet/s")
+    for nombre, limiter in (('sin límite', RateLimiter(rate=0, recipient_per_minute=0)),
+                            (f'token bucket {tasa}/s', RateLimiter(rate=tasa, burst=max(1, limite - tasa)))):
+        stub = StubEvolutionServer(latency=0.01, rate_limit=limite).start()
+        sender = WhatsAppSender(api_url=stub.url, api_key='bench', instance='bench', workers=8,
+                                max_retries=3, backoff=0.2, limiter=limiter)
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for n in range(mensajes):
+                sender.enqueue(f'+52155{n % (mensajes // 4):08d}', f'msg {n}')
+            sender.join()
+        segundos = time.perf_counter() - inicio
+        print(f"   {nombre:<22} {segundos:>5.1f} s  entregados {sender.stats['sent']:>4}  perdidos "
+              f"{sender.stats['failed']:>3}  429 {stub.throttled:>4}  pico {stub.max_per_second():>3} pet/s")
+        stub.shutdown()
+
+
+def pasada(usuarios, limite, tasa, backlog):
+    """Proceso hijo: una pasada del planificador con `usuarios` resúmenes vencidos"""
+    stub = StubEvolutionServer(latency=0.01, rate_limit=limite).start()
+    os.environ.update(EVOLUTION_API_URL=stub.url, WHATSAPP_RATE=str(tasa), WHATSAPP_BURST=str(max(1, limite - tasa)),
+                      WHATSAPP_MAX_BACKLOG_SECONDS=str(backlog), REMINDER_DIGEST_SECONDS='0')
+    os.chdir(tempfile.mkdtemp(prefix='bench_rate_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+        # Sin el bucle del planificador: este proceso dispara a todos los usuarios
+        bot.shards_propios = None
+        for n in range(usuarios):
+            user, _ = bot.user_manager.register(f'user{n}', '1234', f'+52155{n:08d}')
+            bot.task_manager.add_task(user['id'], 'tarea', '2020-01-01', '10:00')
+
+        profundidad = 0
+        inicio = time.perf_counter()
+        while bot.whatsapp_sender.stats['sent'] + bot.whatsapp_sender.stats['failed'] < usuarios:
+            bot.enviar_recordatorios()
+            profundidad = max(profundidad, bot.whatsapp_sender.pool.depth())
+            bot.reminder_scheduler.wait_next(max_wait=0.05)
+        segundos = time.perf_counter() - inicio
+    print(json.dumps({'segundos': segundos, 'profundidad': profundidad, 'enviados': bot.whatsapp_sender.stats['sent'],
+                      'aplazados': bot.whatsapp_sender.limiter.stats['deferred'], '429': stub.throttled,
+                      'pico': stub.max_per_second()}))
+
+
+def destinatario_lento(seguidos, otros):
+    """`seguidos` mensajes a un número y luego uno a cada uno de `otros` números, con un solo worker"""
+    from delivery import WhatsAppSender
+    from ratelimit import RateLimiter
+
+    limiter = RateLimiter(rate=0, recipient_per_minute=20, recipient_burst=5)
+    print(f"3) {seguidos} mensajes a un número (límite 20/min, ráfaga 5) y luego {otros} a otros números, "
+          f"1 worker")
+    stub = StubEvolutionServer(latency=0.01).start()
+    sender = WhatsAppSender(api_url=stub.url, api_key='bench', instance='bench', workers=1, limiter=limiter)
+    inicio = time.monotonic()
+    entregas = {'lento': [], 'otros': []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(seguidos):
+            sender.enqueue('+5215500000000', f'msg {n}',
+                           lambda ok, detalle, reintentable: entregas['lento'].append(time.monotonic() - inicio))
+        for n in range(otros):
+            sender.enqueue(f'+52155{n + 1:08d}', 'hola',
+                           lambda ok, detalle, reintentable: entregas['otros'].append(time.monotonic() - inicio))
+        sender.join()
+    orden = [texto for _, numero, texto in stub.received if numero.startswith('5215500000000')]
+    print(f"   otros números: último a los {max(entregas['otros']):.2f} s; número limitado: último a los "
+          f"{max(entregas['lento']):.1f} s, en orden: {orden == [f'msg {n}' for n in range(seguidos)]}, "
+          f"apartados {sender.stats['recipient_delayed']}")
+    stub.shutdown()
+
+
+def reclamo_outbox(mensajes, renovar):
+    """Proceso hijo: `mensajes` del outbox a un número lento con un reclamo de 1 s y barridos cada 0.2 s"""
+    stub = StubEvolutionServer(latency=0.01).start()
+    os.environ.update(EVOLUTION_API_URL=stub.url, OUTBOX_CLAIM_SECONDS='1', WHATSAPP_RATE='0',
+                      WHATSAPP_RECIPIENT_PER_MINUTE='60', WHATSAPP_RECIPIENT_BURST='1')
+    os.chdir(tempfile.mkdtemp(prefix='bench_reclamo_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+        if not renovar:
+            bot.outbox.renew = lambda keys, now=None: 0
+        inicio = time.perf_counter()
+        bot.enviar_resumenes([(f'recordatorio:{n}', '+5215500000000', f'msg {n}') for n in range(mensajes)])
+        while bot.outbox.metrics()['pending']:
+            time.sleep(0.2)
+            bot.barrer_outbox()
+        bot.whatsapp_sender.join()
+        segundos = time.perf_counter() - inicio
+    print(json.dumps({'segundos': segundos, 'recibidos': len(stub.received),
+                      'distintos': len({texto for _, _, texto in stub.received})}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mensajes', type=int, default=200)
+    parser.add_argument('--usuarios', type=int, default=300)
+    parser.add_argument('--limite', type=int, default=25)
+    parser.add_argument('--tasa', type=int, default=20)
+    parser.add_argument('--hijo', type=float, help=argparse.SUPPRESS)
+    parser.add_argument('--reclamo', choices=('renovar', 'sin-renovar'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo is not None:
+        return pasada(args.usuarios, args.limite, args.tasa, args.hijo)
+    if args.reclamo:
+        return reclamo_outbox(5, args.reclamo == 'renovar')
+
+    rafaga(args.mensajes, args.limite, args.tasa)
+
+    print(f"2) pasada del planificador con {args.usuarios} usuarios vencidos a la vez, {args.tasa} msg/s")
+    for nombre, backlog in (('todo a la cola', 1e9), ('reparto (backlog 2 s)', 2)):
+        salida = subprocess.run([sys.executable, __file__, '--hijo', str(backlog), '--usuarios', str(args.usuarios),
+                                 '--limite', str(args.limite), '--tasa', str(args.tasa)],
+                                capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        r = json.loads(salida)
+        print(f"   {nombre:<22} {r['segundos']:>5.1f} s  enviados {r['enviados']:>4}  aplazados {r['aplazados']:>4}  "
+              f"cola máx {r['profundidad']:>4}  429 {r['429']:>3}  pico {r['pico']:>3} pet/s")
+
+    destinatario_lento(10, 20)
+
+    print("4) 5 recordatorios del outbox a un número (60/min, ráfaga 1), reclamo de 1 s, barrido cada 0.2 s")
+    for modo in ('renovar', 'sin-renovar'):
+        salida = subprocess.run([sys.executable, __file__, '--reclamo', modo],
+                                capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        r = json.loads(salida)
+        print(f"   {modo:<22} {r['segundos']:>5.1f} s  enviados {r['recibidos']:>2}  distintos {r['distintos']}  "
+              f"duplicados {r['recibidos'] - r['distintos']}")
+
+
+if __name__ == '__main__':
+    main()
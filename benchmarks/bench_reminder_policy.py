@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: mensajes de recordatorio enviados en 24 horas simuladas
+Ejecuta enviar_recordatorios con un reloj simulado sobre usuarios con tareas
+que vencen a lo largo del día y nunca se completan (el peor caso). Compara
+la repetición fija cada 5 minutos sin resumen (comportamiento anterior) con
+el backoff escalonado y los resúmenes por usuario.
+
+Uso: python benchmarks/bench_reminder_policy.py [--usuarios 200] [--tareas 5]
+"""
+
+import io
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ESCENARIOS = {
+    'anterior (cada 5m, sin resumen)': {'REMINDER_BACKOFF': '5m', 'REMINDER_DIGEST_SECONDS': '0'},
+    'backoff 5m,15m,1h,4h,1d': {'REMINDER_BACKOFF': '5m,15m,1h,4h,1d', 'REMINDER_DIGEST_SECONDS': '0'},
+    'backoff + resumen 5 min': {'REMINDER_BACKOFF': '5m,15m,1h,4h,1d', 'REMINDER_DIGEST_SECONDS': '300'},
+    'backoff + resumen 30 min': {'REMINDER_BACKOFF': '5m,15m,1h,4h,1d', 'REMINDER_DIGEST_SECONDS': '1800'},
+}
+
+INICIO = datetime(2025, 11, 26, 0, 0).timestamp()
+HORAS = 24
+
+
+class Reloj:
+    """Sustituye a time y datetime en el módulo del bot"""
+    ahora = INICIO
+
+    @classmethod
+    def time(cls):
+        return cls.ahora
+
+    @classmethod
+    def now(cls):
+        return datetime.fromtimestamp(cls.ahora)
+
+    monotonic = time
+
+
+def simular(usuarios, tareas):
+    """Se ejecuta en un proceso hijo con la política del escenario en el entorno"""
+    sys.path.insert(0, ROOT)
+    os.chdir(tempfile.mkdtemp(prefix='bench_policy_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+    bot.time = Reloj
+    bot.datetime = Reloj
+    # Sin el bucle del planificador: este proceso dispara a todos los usuarios
+    bot.shards_propios = None
+
+    mensajes = []
+    bot.enviar_resumenes = lambda resumenes: mensajes.extend(len(mensaje) for _, _, mensaje in resumenes)
+
+    random.seed(1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(usuarios):
+            user, _ = bot.user_manager.register(f'user{n}', '1234', f'+52155{n:08d}')
+            for _ in range(tareas):
+                vence = datetime.fromtimestamp(INICIO + random.randint(0, 20 * 3600))
+                bot.task_manager.add_task(user['id'], 'tarea', vence.strftime('%Y-%m-%d'), vence.strftime('%H:%M'))
+
+        fin = INICIO + HORAS * 3600
+        while True:
+            siguiente = bot.reminder_scheduler.next_fire_ts()
+            if siguiente is None or siguiente > fin:
+                break
+            Reloj.ahora = max(Reloj.ahora, siguiente)
+            bot.enviar_recordatorios()
+
+    metricas = bot.reminder_policy.metrics()
+    print(json.dumps({'mensajes': len(mensajes), 'recordatorios': metricas['reminders'],
+                      'aplazados': metricas['deferred'], 'bytes': sum(mensajes)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--tareas', type=int, default=5)
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        return simular(args.usuarios, args.tareas)
+
+    print(f"{args.usuarios} usuarios x {args.tareas} tareas que vencen durante el día y no se completan; {HORAS} h simuladas")
+    for nombre, entorno in ESCENARIOS.items():
+        salida = subprocess.run(
+            [sys.executable, __file__, '--hijo', '--usuarios', str(args.usuarios), '--tareas', str(args.tareas)],
+            env={**os.environ, **entorno, 'STORAGE_BACKEND': 'json', 'WHATSAPP_RATE': '0'}, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(salida)
+        print(f"{nombre:<34} mensajes {r['mensajes']:>7}   recordatorios {r['recordatorios']:>7}   "
+              f"{r['mensajes'] / args.usuarios:>6.1f} mensajes/usuario   {r['bytes'] / 1e6:>6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resolver el remitente de un mensaje entrante a un usuario con
+100k usuarios registrados. Búsqueda lineal con coincidencia por subcadena
+(comportamiento anterior) frente al índice E.164 de UserManager.
+
+Uso: python benchmarks/bench_routing.py
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+USUARIOS = 100_000
+CONSULTAS = 200
+
+
+def busqueda_lineal(users, numero_limpio):
+    for u in users:
+        user_number = u.get('whatsapp_number', '').replace('+', '').replace(' ', '').replace('-', '')
+        if numero_limpio in user_number or user_number in numero_limpio:
+            return u
+    return None
+
+
+def main():
+    os.chdir(tempfile.mkdtemp(prefix='bench_routing_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        from reminder_bot_auth import UserManager
+
+    manager = UserManager()
+    manager.users = [
+        {'id': n + 1, 'username': f'user{n}', 'whatsapp_number': f'+52 55-{n:08d}'}
+        for n in range(USUARIOS)
+    ]
+    inicio = time.perf_counter()
+    manager._reindex()
+    print(f"índice construido para {USUARIOS} usuarios en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    random.seed(1)
+    remitentes = [f'5255{random.randrange(USUARIOS):08d}@s.whatsapp.net' for _ in range(CONSULTAS)]
+
+    inicio = time.perf_counter()
+    for jid in remitentes:
+        busqueda_lineal(manager.users, jid.replace('@s.whatsapp.net', ''))
+    lineal = (time.perf_counter() - inicio) / CONSULTAS * 1e6
+
+    inicio = time.perf_counter()
+    for jid in remitentes:
+        manager.find_by_whatsapp(jid)
+    indice = (time.perf_counter() - inicio) / CONSULTAS * 1e6
+
+    print(f"{'búsqueda lineal (subcadena)':<30} {lineal:>12.1f} µs/mensaje")
+    print(f"{'índice E.164':<30} {indice:>12.1f} µs/mensaje")
+
+
+if __name__ == '__main__':
+    main()
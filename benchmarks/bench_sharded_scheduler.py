@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pasada del planificador repartida en shards entre procesos
+Crea una base SQLite con muchas tareas ya vencidas (1M por defecto) y mide,
+con 1, 2 y 4 procesos planificadores, la carga de los recordatorios de sus
+shards (cargar_recordatorios) y la pasada que los dispara
+(enviar_recordatorios: resumen, outbox, contador en la base y encolado). Cada
+proceso tiene un reparto fijo de shards (k % procesos) para medir solo el
+trabajo; el reparto dinámico es el de ShardLeases.
+
+Uso: python benchmarks/bench_sharded_scheduler.py [--usuarios 100000] [--tareas 10] [--shards 16]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def crear_base(path, usuarios, tareas, shards):
+    """Base con `usuarios` x `tareas` tareas pendientes vencidas ayer"""
+    sys.path.insert(0, ROOT)
+    from sqlite_store import SQLiteDatabase
+
+    db = SQLiteDatabase(path)
+    due_ts = int(time.time()) - 86400
+    with db.transaction() as conn:
+        conn.executemany(
+            'INSERT INTO users (id, username, password, whatsapp_number, whatsapp_e164, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((u, f'user{u}', 'x', f'+52155{u:08d}', f'+52155{u:08d}', '2025-01-01T00:00:00')
+             for u in range(1, usuarios + 1))
+        )
+        filas = ((u, t, due_ts, json.dumps({
+            'id': t, 'description': f'tarea {t}', 'completed': False, 'due_date': '2025-01-01',
+            'due_time': '10:00', 'due_ts': due_ts, 'reminder_count': 0, 'created_at': '2025-01-01T00:00:00'
+        })) for u in range(1, usuarios + 1) for t in range(1, tareas + 1))
+        conn.executemany('INSERT INTO tasks (user_id, id, completed, due_ts, data) VALUES (?, ?, 0, ?, ?)', filas)
+        conn.execute('INSERT INTO task_counts (user_id, total, completed) '
+                     'SELECT user_id, COUNT(*), SUM(completed) FROM tasks GROUP BY user_id')
+        conn.execute(f'CREATE INDEX idx_tasks_shard{shards} ON tasks (user_id % {shards}, completed, due_ts)')
+    db.connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def planificador(numero, procesos):
+    """Proceso hijo: espera la señal del padre y hace una pasada con sus shards"""
+    salida = sys.stdout
+    sys.path.insert(0, ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+    bot.shards_propios = frozenset(k for k in range(bot.SCHEDULER_SHARDS) if k % procesos == numero)
+    mensajes = []
+    # Hasta el outbox incluido; el envío HTTP queda fuera de la medida
+    bot.whatsapp_sender.enqueue = lambda numero, mensaje, al_terminar=None: mensajes.append(mensaje) or True
+
+    print('listo', file=salida, flush=True)
+    sys.stdin.readline()
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot.cargar_recordatorios()
+        cargado = time.perf_counter()
+        programados = len(bot.reminder_scheduler)
+        bot.enviar_recordatorios()
+    fin = time.perf_counter()
+    print(json.dumps({'carga': cargado - inicio, 'envio': fin - cargado, 'total': fin - inicio,
+                      'recordatorios': programados, 'mensajes': len(mensajes)}), file=salida, flush=True)
+
+
+def medir(base, procesos, shards):
+    """Lanza `procesos` planificadores sobre una copia de la base y los arranca a la vez"""
+    directorio = tempfile.mkdtemp(prefix='bench_shards_run_')
+    copia = os.path.join(directorio, 'reminderbot.db')
+    shutil.copy(base, copia)
+    entorno = {**os.environ, 'STORAGE_BACKEND': 'sqlite', 'SQLITE_PATH': copia, 'SCHEDULER_SHARDS': str(shards),
+               'REMINDER_DIGEST_SECONDS': '0', 'WHATSAPP_RATE': '0'}
+    hijos = [subprocess.Popen([sys.executable, __file__, '--hijo', str(n), '--procesos', str(procesos)],
+                              env=entorno, cwd=directorio, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for n in range(procesos)]
+    for hijo in hijos:
+        assert hijo.stdout.readline().strip() == 'listo'
+
+    inicio = time.perf_counter()
+    for hijo in hijos:
+        hijo.stdin.write('\n')
+        hijo.stdin.flush()
+    resultados = [json.loads(hijo.stdout.readline()) for hijo in hijos]
+    total = time.perf_counter() - inicio
+    for hijo in hijos:
+        hijo.wait()
+    shutil.rmtree(directorio)
+    return total, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--usuarios', type=int, default=100000)
+    parser.add_argument('--tareas', type=int, default=10)
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--procesos', default='1,2,4')
+    parser.add_argument('--hijo', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo is not None:
+        return planificador(args.hijo, int(args.procesos))
+
+    base = os.path.join(tempfile.mkdtemp(prefix='bench_shards_'), 'base.db')
+    inicio = time.perf_counter()
+    crear_base(base, args.usuarios, args.tareas, args.shards)
+    print(f"{args.usuarios * args.tareas} tareas vencidas ({args.usuarios} usuarios x {args.tareas}), "
+          f"{args.shards} shards; base creada en {time.perf_counter() - inicio:.1f} s; {os.cpu_count()} CPU(s)")
+
+    referencia = None
+    for procesos in [int(p) for p in args.procesos.split(',')]:
+        total, resultados = medir(base, procesos, args.shards)
+        referencia = referencia or total
+        carga = max(r['carga'] for r in resultados)
+        envio = max(r['envio'] for r in resultados)
+        recordatorios = sum(r['recordatorios'] for r in resultados)
+        print(f"{procesos} proceso(s): {total:>6.1f} s  (carga {carga:>5.1f} s, envío {envio:>5.1f} s)  "
+              f"{recordatorios / total:>8.0f} recordatorios/s  x{referencia / total:.2f}  "
+              f"{sum(r['mensajes'] for r in resultados)} mensajes")
+    shutil.rmtree(os.path.dirname(base))
+
+
+if __name__ == '__main__':
+    main()
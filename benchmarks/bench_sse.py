@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: conexiones SSE inactivas que aguanta un worker de gunicorn
+Arranca el bot (JSON, un worker) en un directorio temporal, abre N streams
+/api/events de un mismo usuario y mide: streams aceptados, memoria e hilos
+del worker, latencia de GET /api/tasks con los streams abiertos y tiempo
+hasta que un cambio llega a todos los streams.
+
+Uso: python benchmarks/bench_sse.py [--conexiones 200 500 1000]
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import selectors
+import subprocess
+
+import requests
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PUERTO = 5092
+
+
+def esperar_listo(url, timeout=30):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            if requests.get(f"{url}/api/health/ready", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def worker_pid(master):
+    """Pid del (único) worker hijo del master de gunicorn"""
+    for pid in os.listdir('/proc'):
+        if pid.isdigit():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == master:
+                        return int(pid)
+            except OSError:
+                continue
+    return None
+
+
+def memoria_e_hilos(pid):
+    campos = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            clave, _, valor = line.partition(':')
+            campos[clave] = valor.strip()
+    return int(campos['VmRSS'].split()[0]) / 1024, int(campos['Threads'])
+
+
+def abrir_streams(n, cookie):
+    """Abre n streams y espera el primer evento de cada uno; devuelve (sockets aceptados, rechazados)"""
+    peticion = (f"GET /api/events HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n"
+                f"Accept: text/event-stream\r\n\r\n").encode()
+    selector = selectors.DefaultSelector()
+    pendientes = {}
+    for _ in range(n):
+        s = socket.create_connection(('127.0.0.1', PUERTO))
+        s.sendall(peticion)
+        s.setblocking(False)
+        selector.register(s, selectors.EVENT_READ)
+        pendientes[s] = b''
+
+    aceptados, rechazados = [], 0
+    limite = time.time() + 60
+    while pendientes and time.time() < limite:
+        for clave, _ in selector.select(timeout=1):
+            s = clave.fileobj
+            datos = s.recv(65536)
+            pendientes[s] += datos
+            if b'event: tasks' in pendientes[s] or not datos or b' 503 ' in pendientes[s][:20]:
+                selector.unregister(s)
+                if b'event: tasks' in pendientes.pop(s):
+                    aceptados.append(s)
+                else:
+                    rechazados += 1
+                    s.close()
+    selector.close()
+    return aceptados, rechazados
+
+
+def esperar_evento(streams):
+    """Segundos hasta que todos los streams reciben un evento nuevo"""
+    selector = selectors.DefaultSelector()
+    for s in streams:
+        selector.register(s, selectors.EVENT_READ)
+    inicio = time.perf_counter()
+    faltan = set(streams)
+    while faltan and time.perf_counter() - inicio < 30:
+        for clave, _ in selector.select(timeout=1):
+            if b'event: tasks' in clave.fileobj.recv(65536):
+                faltan.discard(clave.fileobj)
+                selector.unregister(clave.fileobj)
+    selector.close()
+    return time.perf_counter() - inicio, len(faltan)
+
+
+def latencia_tasks(url, cookies, n=50):
+    s = requests.Session()
+    s.cookies.update(cookies)
+    tiempos = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        s.get(f"{url}/api/tasks")
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos)[n // 2]
+
+
+def medir(conexiones):
+    url = f"http://127.0.0.1:{PUERTO}"
+    directorio = tempfile.mkdtemp(prefix='bench_sse_')
+    env = {**os.environ, 'PORT': str(PUERTO), 'SECRET_KEY': 'bench', 'STARTUP_WARMUP': '0',
+           'EVOLUTION_API_URL': 'http://127.0.0.1:9', 'WEB_CONCURRENCY': '1',
+           'SSE_MAX_STREAMS': str(conexiones)}
+    comando = ['gunicorn', '-c', os.path.join(REPO, 'gunicorn.conf.py'), '--pythonpath', REPO,
+               '--worker-connections', str(conexiones + 100), 'wsgi:app']
+    proceso = subprocess.Popen(comando, cwd=directorio, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    streams = []
+    try:
+        if not esperar_listo(url):
+            print(f"{conexiones:>6}  no arrancó")
+            return
+        s = requests.Session()
+        s.post(f"{url}/register", json={'username': 'bench', 'password': '1234', 'whatsapp': '+5215500000000'})
+        cookies = s.cookies.get_dict()
+        cookie = '; '.join(f"{k}={v}" for k, v in cookies.items())
+        pid = worker_pid(proceso.pid)
+
+        rss_base, hilos_base = memoria_e_hilos(pid)
+        p50_base = latencia_tasks(url, cookies)
+
+        inicio = time.perf_counter()
+        streams, rechazados = abrir_streams(conexiones + 1, cookie)
+        apertura = time.perf_counter() - inicio
+        rss, hilos = memoria_e_hilos(pid)
+        p50 = latencia_tasks(url, cookies)
+
+        s.post(f"{url}/api/tasks", json={'description': 'aviso'})
+        entrega, sin_evento = esperar_evento(streams)
+
+        print(f"{conexiones:>6}  abiertos {len(streams):>5} (+{rechazados} rechazado)  "
+              f"apertura {apertura:>5.2f} s  RSS {rss_base:>5.0f} -> {rss:>5.0f} MB "
+              f"({(rss - rss_base) * 1024 / max(len(streams), 1):>4.0f} KB/stream)  "
+              f"hilos {hilos_base} -> {hilos}  GET /api/tasks p50 {p50_base:.1f} -> {p50:.1f} ms  "
+              f"evento a todos en {entrega * 1000:.0f} ms" + (f" ({sin_evento} sin evento)" if sin_evento else ''))
+    finally:
+        for s in streams:
+            s.close()
+        proceso.terminate()
+        proceso.wait(timeout=30)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conexiones', type=int, nargs='+', default=[100, 500, 1000])
+    args = parser.parse_args()
+    print("Streams SSE inactivos sobre gunicorn (1 worker, JSON); se intenta abrir uno más que SSE_MAX_STREAMS")
+    for conexiones in args.conexiones:
+        medir(conexiones)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
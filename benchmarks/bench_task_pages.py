@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /api/tasks de un usuario con muchas tareas
+Compara la lista completa (con pending_count) con la primera página de 50
+tareas pendientes, la página de vencidas ordenada por fecha y solo los
+contadores, en el backend configurado.
+
+Uso: python benchmarks/bench_task_pages.py [--tareas 20000]
+     STORAGE_BACKEND=sqlite python benchmarks/bench_task_pages.py
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def medir(nombre, funcion, repeticiones):
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        tamano = len(funcion())
+    ms = (time.perf_counter() - inicio) / repeticiones * 1000
+    print(f"{nombre:<40} {ms:>9.2f} ms   {tamano / 1024:>8.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tareas', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_pages_'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+
+    client = bot.app.test_client()
+    client.post('/register', json={'username': 'bench', 'password': '1234', 'whatsapp': '+5215500000000'})
+    user_id = bot.user_manager.get_user('bench')['id']
+
+    random.seed(1)
+    hoy = datetime.now()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(args.tareas):
+            fecha = (hoy + timedelta(days=random.randint(-60, 60))).strftime('%Y-%m-%d') if n % 3 else None
+            task = bot.task_manager.add_task(user_id, f'tarea {n}', fecha, '10:00' if fecha else None)
+            if random.random() < 0.6:
+                bot.task_manager.complete_task(user_id, task['id'])
+
+    print(f"{args.tareas} tareas, backend {bot.STORAGE_BACKEND}")
+    repeticiones = 20
+    medir('lista completa', lambda: client.get('/api/tasks').data, repeticiones)
+    medir('página: 50 pendientes', lambda: client.get('/api/tasks?status=pending&limit=50').data, repeticiones)
+    medir('página: 50 vencidas por fecha', lambda: client.get('/api/tasks?status=overdue&sort=due').data, repeticiones)
+    pagina = client.get('/api/tasks?status=pending&sort=-created&limit=50').get_json()
+    medir('página siguiente (cursor)',
+          lambda: client.get(f"/api/tasks?status=pending&sort=-created&cursor={pagina['next_cursor']}").data, repeticiones)
+    medir('contadores (count_tasks)', lambda: str(bot.task_manager.count_tasks(user_id)), 200)
+    medir('contadores recorriendo tareas (antes)',
+          lambda: str(len(bot.task_manager.get_pending_tasks(user_id))), repeticiones)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: extracción de fecha y hora sobre un corpus de mensajes reales
+(benchmarks/data/corpus_fechas.jsonl), con la hora de referencia fija en
+2025-11-26 10:00 (miércoles) salvo en los casos que traen la suya ("ahora"). Compara la versión anterior (regex + dateparser
+en cada candidato) con time_parser, en aciertos y tiempo por mensaje.
+
+Uso: python benchmarks/bench_time_parser.py
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from time_parser import extraer_hora_fecha, cache_info, _extraer
+
+AHORA = datetime(2025, 11, 26, 10, 0)
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'corpus_fechas.jsonl')
+
+
+def extraer_anterior(texto):
+    """Versión anterior de extraer_hora_fecha, con RELATIVE_BASE fijo para poder comparar"""
+    import re
+    import dateparser
+
+    patrones_hora = [
+        r'(\d{1,2}):(\d{2})\s*(am|pm)?',
+        r'(\d{1,2})\s*(am|pm)',
+        r'a las (\d{1,2})',
+        r'(\d{1,2})h',
+    ]
+    hora_encontrada = None
+    fecha_encontrada = None
+    for patron in patrones_hora:
+        match = re.search(patron, texto.lower())
+        if match:
+            try:
+                fecha_hora = dateparser.parse(match.group(0), settings={'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': AHORA})
+                if fecha_hora:
+                    hora_encontrada = fecha_hora.strftime('%H:%M')
+                    fecha_encontrada = fecha_hora.strftime('%Y-%m-%d')
+                    break
+            except Exception:
+                continue
+    if not hora_encontrada:
+        try:
+            fecha_hora = dateparser.parse(texto, settings={'PREFER_DATES_FROM': 'future', 'PREFER_DAY_OF_MONTH': 'current', 'RELATIVE_BASE': AHORA})
+            if fecha_hora:
+                hora_encontrada = fecha_hora.strftime('%H:%M')
+                fecha_encontrada = fecha_hora.strftime('%Y-%m-%d')
+        except Exception:
+            pass
+    return fecha_encontrada, hora_encontrada
+
+
+def ahora_de(caso):
+    """Hora de referencia del caso: la suya o AHORA"""
+    return datetime.fromisoformat(caso['ahora']) if 'ahora' in caso else AHORA
+
+
+def medir(nombre, funcion, corpus, repeticiones):
+    aciertos = sum(funcion(c) == (c['fecha'], c['hora']) for c in corpus)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for c in corpus:
+            funcion(c)
+    por_mensaje = (time.perf_counter() - inicio) / (repeticiones * len(corpus)) * 1e6
+    print(f"{nombre:<28} aciertos {aciertos:>3}/{len(corpus)}   {por_mensaje:>10.1f} µs/mensaje")
+
+
+def main():
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    import dateparser
+    dateparser.parse('calentar')
+
+    medir('anterior (dateparser)', lambda c: extraer_anterior(c['texto']), corpus, 3)
+    medir('time_parser sin caché',
+          lambda c: (_extraer.cache_clear(), extraer_hora_fecha(c['texto'], ahora_de(c)))[1], corpus, 20)
+    medir('time_parser con caché', lambda c: extraer_hora_fecha(c['texto'], ahora_de(c)), corpus, 200)
+    print(f"caché: {cache_info()}")
+
+    fallos = [(c['texto'], (c['fecha'], c['hora']), extraer_hora_fecha(c['texto'], ahora_de(c)))
+              for c in corpus if extraer_hora_fecha(c['texto'], ahora_de(c)) != (c['fecha'], c['hora'])]
+    for texto, esperado, obtenido in fallos:
+        print(f"  ✗ {texto!r}: esperado {esperado}, obtenido {obtenido}")
+
+
+if __name__ == '__main__':
+    main()
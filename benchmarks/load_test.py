@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de GET /api/tasks en cada modo de servicio:
+servidor de desarrollo de Flask (python reminder_bot_auth.py), gunicorn con un
+worker y JSON, y gunicorn con varios workers y SQLite. Cada modo arranca en un
+directorio temporal con un usuario y 50 tareas.
+
+Uso: python benchmarks/load_test.py [--segundos 10] [--clientes 16] [--modo gunicorn-json]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from threading import Thread
+
+import requests
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PUERTO = 5090
+
+MODOS = {
+    'flask-dev': ([sys.executable, os.path.join(REPO, 'reminder_bot_auth.py')], {}),
+    'gunicorn-json': (['gunicorn', '-c', os.path.join(REPO, 'gunicorn.conf.py'), '--pythonpath', REPO, 'wsgi:app'],
+                      {'WEB_CONCURRENCY': '1', 'WEB_THREADS': '8'}),
+    'gunicorn-sqlite': (['gunicorn', '-c', os.path.join(REPO, 'gunicorn.conf.py'), '--pythonpath', REPO, 'wsgi:app'],
+                        {'WEB_CONCURRENCY': '4', 'WEB_THREADS': '4', 'STORAGE_BACKEND': 'sqlite'}),
+}
+
+
+def esperar_listo(url, timeout=30):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            if requests.get(f"{url}/api/health/ready", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def preparar(url):
+    """Registra un usuario con 50 tareas y devuelve la cookie de sesión"""
+    s = requests.Session()
+    s.post(f"{url}/register", json={'username': 'carga', 'password': '1234', 'whatsapp': '+5215500000000'})
+    for n in range(50):
+        s.post(f"{url}/api/tasks", json={'description': f'tarea {n}', 'due_date': '2030-01-01', 'due_time': '10:00'})
+    return s.cookies.get_dict()
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0
+
+
+def cargar(url, cookies, clientes, segundos):
+    latencias, errores = [], [0]
+    fin = time.time() + segundos
+
+    def cliente():
+        s = requests.Session()
+        s.cookies.update(cookies)
+        while time.time() < fin:
+            inicio = time.perf_counter()
+            r = s.get(f"{url}/api/tasks")
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if r.status_code != 200:
+                errores[0] += 1
+
+    hilos = [Thread(target=cliente) for _ in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return len(latencias) / segundos, percentil(latencias, 0.5), percentil(latencias, 0.95), errores[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--segundos', type=int, default=10)
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--modo', choices=list(MODOS), action='append')
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{PUERTO}"
+    print(f"GET /api/tasks, {args.clientes} clientes, {args.segundos} s por modo")
+    for modo in args.modo or MODOS:
+        comando, entorno = MODOS[modo]
+        directorio = tempfile.mkdtemp(prefix='load_test_')
+        env = {**os.environ, **entorno, 'PORT': str(PUERTO), 'SECRET_KEY': 'carga',
+               'EVOLUTION_API_URL': 'http://127.0.0.1:9', 'STARTUP_WARMUP': '0'}
+        proceso = subprocess.Popen(comando, cwd=directorio, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not esperar_listo(url):
+                print(f"{modo:<18} no arrancó")
+                continue
+            cookies = preparar(url)
+            rps, p50, p95, errores = cargar(url, cookies, args.clientes, args.segundos)
+            print(f"{modo:<18} {rps:>8.0f} req/s   p50 {p50:>6.1f} ms   p95 {p95:>6.1f} ms   errores {errores}")
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
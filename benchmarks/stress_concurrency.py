@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés de concurrencia: muchos hilos usando la API a la vez
+(varios por usuario) y verificación de que no se pierden escrituras, ni en
+memoria ni al recargar desde disco.
+
+Uso: python benchmarks/stress_concurrency.py
+     STORAGE_BACKEND=sqlite python benchmarks/stress_concurrency.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import contextlib
+import io
+from threading import Thread, Barrier
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+USUARIOS = 8
+HILOS_POR_USUARIO = 4
+TAREAS_POR_HILO = 50
+
+
+def main():
+    os.chdir(tempfile.mkdtemp(prefix='stress_'))
+    # Compactar a menudo para ejercitar snapshot + log bajo carga
+    os.environ.setdefault('JOURNAL_COMPACT_BYTES', '20000')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import reminder_bot_auth as bot
+
+    clientes = []
+    for n in range(USUARIOS):
+        client = bot.app.test_client()
+        client.post('/register', json={'username': f'user{n}', 'password': '1234', 'whatsapp': f'+5210000{n}'})
+        clientes.append(client)
+
+    errores = []
+    barrera = Barrier(USUARIOS * HILOS_POR_USUARIO)
+
+    def trabajar(client, hilo):
+        with client.session_transaction() as sess:
+            cookie_user = sess['user_id']
+        # Cliente propio por hilo, con la misma sesión del usuario
+        propio = bot.app.test_client()
+        with propio.session_transaction() as sess:
+            sess['user_id'] = cookie_user
+            sess['username'] = f'user{cookie_user - 1}'
+        barrera.wait()
+        for i in range(TAREAS_POR_HILO):
+            r = propio.post('/api/tasks', json={'description': f'h{hilo}-t{i}'})
+            if r.status_code != 200:
+                errores.append(r.status_code)
+                continue
+            task_id = r.get_json()['task']['id']
+            # Completar las pares y borrar una de cada cinco
+            if i % 2 == 0:
+                propio.post(f'/api/tasks/{task_id}/complete')
+            if i % 5 == 0:
+                propio.delete(f'/api/tasks/{task_id}')
+
+    hilos = [Thread(target=trabajar, args=(clientes[u], h))
+             for u in range(USUARIOS) for h in range(HILOS_POR_USUARIO)]
+    inicio = time.perf_counter()
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    segundos = time.perf_counter() - inicio
+
+    borradas = len([i for i in range(TAREAS_POR_HILO) if i % 5 == 0])
+    completadas = len([i for i in range(TAREAS_POR_HILO) if i % 2 == 0 and i % 5 != 0])
+    esperadas = HILOS_POR_USUARIO * (TAREAS_POR_HILO - borradas)
+    esperadas_completadas = HILOS_POR_USUARIO * completadas
+
+    def verificar(manager, etiqueta):
+        ok = True
+        for n in range(USUARIOS):
+            tasks = manager.get_user_tasks(n + 1)
+            ids = [t['id'] for t in tasks]
+            hechas = len([t for t in tasks if t['completed']])
+            if len(tasks) != esperadas or len(set(ids)) != len(ids) or hechas != esperadas_completadas:
+                ok = False
+                print(f"❌ {etiqueta} user{n}: {len(tasks)} tareas ({hechas} completadas), "
+                      f"esperadas {esperadas} ({esperadas_completadas})")
+        return ok
+
+    operaciones = USUARIOS * HILOS_POR_USUARIO * TAREAS_POR_HILO
+    print(f"{operaciones} tareas creadas desde {len(hilos)} hilos en {segundos:.2f}s, errores HTTP: {len(errores)}")
+    ok = verificar(bot.task_manager, 'memoria')
+
+    if bot.STORAGE_BACKEND == 'json':
+        with contextlib.redirect_stdout(io.StringIO()):
+            recargado = bot.TaskManager()
+        ok = verificar(recargado, 'disco') and ok
+    print('✅ sin escrituras perdidas' if ok and not errores else '❌ escrituras perdidas')
+    sys.exit(0 if ok and not errores else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el endpoint sendText de Evolution API
+Responde 201 con un id de mensaje tras una latencia configurable y puede
+fallar con 500 en una fracción de las peticiones. Con --rate-limit responde
+429 (Retry-After: 1) a lo que pase de N peticiones en un segundo. También
+responde GET /instance/connectionState/<instancia> con `state`; si no es
+'open', sendText falla con 500 como una instancia desconectada.
+
+Uso: python benchmarks/stub_evolution.py --port 8081 --latency 0.05 --error-rate 0.01 --rate-limit 20
+"""
+
+import json
+import time
+import random
+import argparse
+import itertools
+from collections import deque
+from threading import Thread, Lock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubEvolutionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05, error_rate=0.0, rate_limit=0):
+        super().__init__(('127.0.0.1', port), StubEvolutionHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.state = 'open'
+        self.ids = itertools.count(1)
+        self.received = []
+        self.arrivals = []          # momento de cada petición aceptada
+        self.throttled = 0
+        self._window = deque()
+        self.lock = Lock()
+
+    def admit(self):
+        """False si la petición pasa del límite por segundo"""
+        now = time.monotonic()
+        with self.lock:
+            while self._window and self._window[0] <= now - 1:
+                self._window.popleft()
+            if self.rate_limit and len(self._window) >= self.rate_limit:
+                self.throttled += 1
+                return False
+            self._window.append(now)
+            self.arrivals.append(now)
+            return True
+
+    def max_per_second(self):
+        """Máximo de peticiones aceptadas en cualquier ventana de un segundo"""
+        with self.lock:
+            llegadas = sorted(self.arrivals)
+        maximo, inicio = 0, 0
+        for fin, momento in enumerate(llegadas):
+            while llegadas[inicio] <= momento - 1:
+                inicio += 1
+            maximo = max(maximo, fin - inicio + 1)
+        return maximo
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubEvolutionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if not self.path.startswith('/instance/connectionState/'):
+            return self._reply(404, {'error': 'Not found'})
+        self._reply(200, {'instance': {'instanceName': self.path.rsplit('/', 1)[1], 'state': self.server.state}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.startswith('/message/sendText/'):
+            return self._reply(404, {'error': 'Not found'})
+
+        if not self.server.admit():
+            return self._reply(429, {'error': 'Rate limit'}, [('Retry-After', '1')])
+        time.sleep(self.server.latency)
+        if self.server.state != 'open' or random.random() < self.server.error_rate:
+            return self._reply(500, {'error': 'Stub failure'})
+
+        with self.server.lock:
+            message_id = next(self.server.ids)
+            self.server.received.append((self.path.rsplit('/', 1)[1], payload.get('number'), payload.get('text')))
+        self._reply(201, {'key': {'id': f'STUB{message_id}'}, 'status': 'PENDING'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub local de Evolution API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=0, help='peticiones por segundo (0 = sin límite)')
+    args = parser.parse_args()
+
+    server = StubEvolutionServer(args.port, args.latency, args.error_rate, args.rate_limit)
+    print(f"🧪 Stub Evolution API en {server.url} (latencia {args.latency}s, errores {args.error_rate:.0%}, "
+          f"límite {args.rate_limit or 'ninguno'} pet/s)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el endpoint /v1/chat/completions de OpenAI
+Devuelve la intención en JSON que esperaría procesar_con_ia (o un array si el
+prompt es de un lote) tras una latencia fija más un tiempo por mensaje, que
+imita la generación de tokens. Para usarlo con el bot:
+OPENAI_BASE_URL=http://127.0.0.1:8082/v1
+
+Uso: python benchmarks/stub_openai.py --port 8082 --latency 0.4 --per-item 0.02
+"""
+
+import re
+import json
+import time
+import argparse
+import itertools
+from threading import Thread, Lock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATRON_MENSAJE = re.compile(r'^Mensaje: "(.*)"$', re.MULTILINE)
+PATRON_LOTE = re.compile(r'^Mensajes: (\[.*\])$', re.MULTILINE)
+PATRON_HORA = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?', re.IGNORECASE)
+
+
+def intencion_simulada(mensaje):
+    """Intención plausible para un mensaje, sin modelo"""
+    texto = mensaje.lower().strip()
+    vacia = {'descripcion': None, 'fecha': None, 'hora': None, 'numero_tarea': None}
+    if texto in ('lista', 'mis tareas', 'tareas'):
+        return {'accion': 'ver_lista', **vacia}
+    if texto in ('ayuda', 'help'):
+        return {'accion': 'ayuda', **vacia}
+    match = PATRON_HORA.search(texto)
+    if match:
+        hora = int(match.group(1)) % 24
+        if (match.group(3) or '').lower() == 'pm' and hora < 12:
+            hora += 12
+        descripcion = PATRON_HORA.sub('', mensaje).replace(' a las', '').strip()
+        return {'accion': 'crear_tarea', 'descripcion': descripcion, 'fecha': None,
+                'hora': f"{hora:02d}:{match.group(2) or '00'}", 'numero_tarea': None}
+    return {'accion': 'desconocido', **vacia}
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.4, per_item=0.0):
+        super().__init__(('127.0.0.1', port), StubOpenAIHandler)
+        self.latency = latency
+        self.per_item = per_item
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.lock = Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.endswith('/chat/completions'):
+            return self._reply(404, {'error': {'message': 'Not found'}})
+
+        prompt = payload['messages'][-1]['content']
+        lote = PATRON_LOTE.search(prompt)
+        if lote:
+            mensajes = json.loads(lote.group(1))
+            contenido = json.dumps([{'id': m['id'], **intencion_simulada(m['mensaje'])} for m in mensajes],
+                                   ensure_ascii=False)
+        else:
+            mensajes = PATRON_MENSAJE.findall(prompt)
+            contenido = json.dumps(intencion_simulada(mensajes[0]) if mensajes else {}, ensure_ascii=False)
+
+        time.sleep(self.server.latency + self.server.per_item * len(mensajes))
+        with self.server.lock:
+            self.server.requests += 1
+            completion_id = next(self.server.ids)
+        self._reply(200, {
+            'id': f'chatcmpl-stub{completion_id}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': contenido},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(contenido) // 4,
+                      'total_tokens': (len(prompt) + len(contenido)) // 4}
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub local de OpenAI chat completions')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.4)
+    parser.add_argument('--per-item', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubOpenAIServer(args.port, args.latency, args.per_item)
+    print(f"🧪 Stub OpenAI en {server.url} (latencia {args.latency}s + {args.per_item}s por mensaje)")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
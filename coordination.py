@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Coordinación entre procesos
+Un lease garantiza que solo un proceso (un worker de gunicorn o el proceso
+planificador) dispare los recordatorios. Con SQLite el lease es una fila con
+caducidad en la base compartida; con JSON es un flock sobre un archivo.
+Con SCHEDULER_SHARDS > 1 (SQLite) los usuarios se reparten en shards y cada
+shard tiene su propio lease, así varios procesos disparan a la vez.
+"""
+
+import os
+import time
+import socket
+
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', 30))
+# Partes en que se reparten los usuarios entre procesos planificadores (1 = un solo lease)
+SCHEDULER_SHARDS = int(os.getenv('SCHEDULER_SHARDS', 1))
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sin flock, se asume un solo proceso
+    fcntl = None
+
+
+def owner_id():
+    """Identificador de este proceso: host y pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def shard_de(user_id, shards):
+    """Shard de un usuario: los ids son secuenciales, así que el módulo reparte por igual"""
+    return int(user_id) % shards
+
+
+class FileLease:
+    """Lease local basado en flock; se libera solo si el proceso muere"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        """Intenta tomar (o conservar) el lease sin bloquear"""
+        if self._fd is not None or fcntl is None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, owner_id().encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class SQLiteLease:
+    """Lease con caducidad en una tabla de la base; hay que renovarlo antes de `ttl`"""
+
+    def __init__(self, db, name='scheduler', ttl=SCHEDULER_LEASE_SECONDS):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner_id()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def acquire(self):
+        """Toma el lease si está libre o caducado, o lo renueva si ya es nuestro"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (self.name, self.owner, now + self.ttl, now)
+            )
+            row = conn.execute("SELECT owner FROM leases WHERE name = ?", (self.name,)).fetchone()
+        return row is not None and row[0] == self.owner
+
+    def release(self):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+
+class ShardLeases:
+    """
+    Reparto de `shards` shards entre los procesos planificadores vivos. Cada
+    proceso renueva su latido y el lease de sus shards en una transacción;
+    se queda como mucho con ceil(shards / procesos vivos), suelta los que le
+    sobran cuando llega otro proceso y toma los libres o caducados, así que
+    los de un proceso muerto pasan a los demás en cuanto caduca su lease.
+    """
+
+    def __init__(self, db, shards=SCHEDULER_SHARDS, ttl=SCHEDULER_LEASE_SECONDS):
+        self.db = db
+        self.shards = shards
+        self.ttl = ttl
+        self.owner = owner_id()
+        self.owned = frozenset()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _renovar(self, conn, name, expires_at):
+        conn.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+            (name, self.owner, expires_at)
+        )
+
+    def acquire(self):
+        """Renueva el latido y los shards propios y toma los que falten; devuelve los shards propios"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            self._renovar(conn, f"worker:{self.owner}", now + self.ttl)
+            # Latidos de procesos muertos hace tiempo: ya no cuentan ni ocupan sitio
+            conn.execute("DELETE FROM leases WHERE name LIKE 'worker:%' AND expires_at < ?", (now - self.ttl,))
+            vivos = conn.execute(
+                "SELECT COUNT(*) FROM leases WHERE name LIKE 'worker:%' AND expires_at >= ?", (now,)
+            ).fetchone()[0]
+            objetivo = -(-self.shards // max(vivos, 1))
+
+            ocupados = {}
+            for name, owner, expires_at in conn.execute(
+                    "SELECT name, owner, expires_at FROM leases WHERE name LIKE 'shard:%'"):
+                shard = int(name.split(':')[1])
+                if shard < self.shards and expires_at >= now:
+                    ocupados[shard] = owner
+            propios = sorted(s for s, owner in ocupados.items() if owner == self.owner)
+
+            # Sobran: los suelta para que los tome un proceso recién llegado
+            for shard in propios[objetivo:]:
+                conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (f"shard:{shard}", self.owner))
+            propios = propios[:objetivo]
+            libres = [s for s in range(self.shards) if s not in ocupados]
+            propios += libres[:max(0, objetivo - len(propios))]
+
+            for shard in propios:
+                self._renovar(conn, f"shard:{shard}", now + self.ttl)
+        self.owned = frozenset(propios)
+        return self.owned
+
+    def release(self):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE owner = ?", (self.owner,))
+        self.owned = frozenset()
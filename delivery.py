@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Cola de envío de mensajes de WhatsApp (Evolution API)
+Los mensajes se encolan y un grupo de workers los envía reutilizando
+conexiones HTTP (keep-alive). Cada número siempre lo atiende el mismo
+worker, así que los mensajes a un destinatario salen en orden. Quien
+necesite saber el resultado (el outbox) pasa un callback al encolar.
+Antes de cada petición se espera turno en los buckets de la instancia y
+del destinatario (ver ratelimit.py). El turno del destinatario no se duerme
+en el worker: el mensaje se aparta hasta su hora y vuelve a la cola, así los
+demás números de ese worker no esperan por él. Con varias instancias de Evolution cada
+destinatario sale por la suya y, si falla, por la siguiente (evolution_pool.py).
+"""
+
+import os
+import time
+import heapq
+import itertools
+import requests
+from threading import Thread, Lock, Condition
+from requests.adapters import HTTPAdapter
+from workers import KeyedWorkerPool
+from ratelimit import RateLimiter
+from evolution_pool import EvolutionInstance, EvolutionPool, parse_instancias
+
+# Configuración Evolution API
+EVOLUTION_API_URL = os.getenv('EVOLUTION_API_URL', 'https://devevoapi.tuagenteia.click')
+EVOLUTION_API_KEY = os.getenv('EVOLUTION_API_KEY', 'e50bdaf76404943a4e2d13d7ff7a49a2')
+EVOLUTION_INSTANCE = os.getenv('EVOLUTION_INSTANCE', 'reminderbot')
+# Varias instancias: nombre@url[*peso],... (si no, solo la de arriba)
+EVOLUTION_INSTANCES = os.getenv('EVOLUTION_INSTANCES', '')
+
+# Configuración de la cola de envío
+WHATSAPP_WORKERS = int(os.getenv('WHATSAPP_WORKERS', 4))
+WHATSAPP_QUEUE_SIZE = int(os.getenv('WHATSAPP_QUEUE_SIZE', 1000))
+WHATSAPP_MAX_RETRIES = int(os.getenv('WHATSAPP_MAX_RETRIES', 3))
+WHATSAPP_TIMEOUT = float(os.getenv('WHATSAPP_TIMEOUT', 10))
+WHATSAPP_BACKOFF = float(os.getenv('WHATSAPP_BACKOFF', 0.5))
+
+
+def normalizar_e164(numero):
+    """
+    Forma canónica +<dígitos> de un número de WhatsApp, venga como
+    '+52 55-1234', '5255...' o '5255...@s.whatsapp.net'. None si no hay dígitos.
+    """
+    digitos = ''.join(c for c in numero.split('@', 1)[0] if c.isdigit())
+    return f"+{digitos}" if digitos else None
+
+
+def normalizar_destino(numero):
+    """Quita +, espacios y guiones y agrega @s.whatsapp.net si hace falta"""
+    numero_limpio = numero.replace('+', '').replace(' ', '').replace('-', '')
+    if '@' not in numero_limpio:
+        numero_limpio = f"{numero_limpio}@s.whatsapp.net"
+    return numero_limpio
+
+
+def instancias_configuradas():
+    """Pool de instancias de Evolution según EVOLUTION_INSTANCES o la instancia única"""
+    if EVOLUTION_INSTANCES.strip():
+        return EvolutionPool(parse_instancias(EVOLUTION_INSTANCES, EVOLUTION_API_KEY))
+    return EvolutionPool([EvolutionInstance(EVOLUTION_INSTANCE, EVOLUTION_API_URL, EVOLUTION_API_KEY)])
+
+
+def retry_after(response, defecto):
+    """Segundos de la cabecera Retry-After (solo el formato en segundos)"""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return defecto
+
+
+class WhatsAppSender:
+    """Workers que vacían una cola acotada de mensajes salientes"""
+
+    def __init__(self, api_url=EVOLUTION_API_URL, api_key=EVOLUTION_API_KEY, instance=EVOLUTION_INSTANCE,
+                 workers=WHATSAPP_WORKERS, queue_size=WHATSAPP_QUEUE_SIZE,
+                 max_retries=WHATSAPP_MAX_RETRIES, timeout=WHATSAPP_TIMEOUT, backoff=WHATSAPP_BACKOFF,
+                 limiter=None, instances=None):
+        # Sin pool explícito: una sola instancia con api_url/api_key/instance
+        self.instances = instances or EvolutionPool([EvolutionInstance(instance, api_url or '', api_key)])
+        self.configured = all(i.url and i.api_key for i in self.instances.instances)
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.limiter = limiter or RateLimiter()
+
+        # El destinatario decide el worker: los mensajes a un número salen en orden
+        self.pool = KeyedWorkerPool(self._procesar, self.workers, queue_size, name='whatsapp-sender')
+
+        # Mensajes apartados hasta el turno de su destinatario: (momento, orden, destino, args)
+        self._apartados = []
+        self._orden = itertools.count()
+        # Mensajes por destinatario entre apartados y de vuelta en la cola
+        self._retenidos = {}
+        self._apartados_cond = Condition()
+        self._liberador = None
+
+        # Sesión compartida con un pool de conexiones del tamaño del grupo
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(self.workers, len(self.instances)), pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'recipient_delayed': 0}
+        self._stats_lock = Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def enqueue(self, numero, mensaje, al_terminar=None):
+        """
+        Encola un mensaje; bloquea si la cola de ese worker está llena.
+        al_terminar(ok, detalle, reintentable) se llama tras el último intento,
+        con el id del mensaje o el error en `detalle`.
+        """
+        if not self.configured:
+            print("⚠️  Evolution API no configurado")
+            return False
+        self.instances.start_health_checks(self.session)
+        return self.pool.submit(normalizar_destino(numero), numero, mensaje, al_terminar)
+
+    def join(self):
+        """Espera a que se vacíen todas las colas, también los mensajes apartados"""
+        while True:
+            self.pool.join()
+            with self._apartados_cond:
+                if not self._retenidos:
+                    return
+            time.sleep(0.05)
+
+    def delayed(self):
+        """Mensajes apartados esperando el turno de su destinatario"""
+        with self._apartados_cond:
+            return len(self._apartados)
+
+    def recipient_delay(self, numero):
+        """Segundos hasta que un mensaje nuevo a `numero` pueda salir por su límite de destinatario"""
+        return self.limiter.recipient_delay(normalizar_destino(numero))
+
+    def _procesar(self, numero, mensaje, al_terminar=None, turno=False):
+        """Worker: aparta el mensaje si su destinatario no tiene turno todavía; si no, lo envía"""
+        destino = normalizar_destino(numero)
+        if turno:
+            try:
+                return self.send_now(numero, mensaje, al_terminar)
+            finally:
+                with self._apartados_cond:
+                    self._retenidos[destino] -= 1
+                    if not self._retenidos[destino]:
+                        del self._retenidos[destino]
+
+        espera = self.limiter.reserve_recipient(destino)
+        with self._apartados_cond:
+            # Con mensajes suyos ya apartados también se aparta, para no adelantarlos
+            if espera <= 0 and destino not in self._retenidos:
+                apartar = False
+            else:
+                apartar = True
+                self._retenidos[destino] = self._retenidos.get(destino, 0) + 1
+                heapq.heappush(self._apartados, (time.monotonic() + max(espera, 0.0), next(self._orden),
+                                                 destino, (numero, mensaje, al_terminar)))
+                self._apartados_cond.notify()
+        if not apartar:
+            return self.send_now(numero, mensaje, al_terminar)
+        self._count('recipient_delayed')
+        self._arrancar_liberador()
+
+    def _arrancar_liberador(self):
+        with self._apartados_cond:
+            if self._liberador is not None:
+                return
+            self._liberador = Thread(target=self._liberar, daemon=True, name='whatsapp-sender-turnos')
+        self._liberador.start()
+
+    def _liberar(self):
+        """Devuelve a la cola (al mismo worker) cada mensaje apartado cuando llega su turno"""
+        while True:
+            with self._apartados_cond:
+                while not self._apartados or self._apartados[0][0] > time.monotonic():
+                    self._apartados_cond.wait(self._apartados[0][0] - time.monotonic() if self._apartados else None)
+                _, _, destino, args = heapq.heappop(self._apartados)
+            self.pool.submit(destino, *args, True)
+
+    def _disponibles(self):
+        now = time.time()
+        nombres = [i.name for i in self.instances.instances if i.available(now)]
+        return nombres or [i.name for i in self.instances.instances]
+
+    def backlog_seconds(self):
+        """Cuánto tardaría en salir un mensaje encolado ahora, con la tasa de las instancias disponibles"""
+        return self.limiter.backlog_seconds(self._disponibles(), self.pool.depth())
+
+    def send_interval(self):
+        """Separación media entre envíos repartidos entre las instancias disponibles"""
+        return self.limiter.interval(len(self._disponibles()))
+
+    def send_now(self, numero, mensaje, al_terminar=None):
+        """
+        Envía un mensaje reintentando con backoff en 5xx, 429 y timeouts. Un
+        error de conexión o 5xx hace que el reintento vaya a la siguiente
+        instancia del destinatario. Solo espera el turno de la instancia: el
+        del destinatario ya lo dio la cola (enqueue)
+        """
+        payload = {
+            "number": normalizar_destino(numero),
+            "text": mensaje
+        }
+
+        reintentable = True
+        fallidas = set()
+        for intento in range(self.max_retries + 1):
+            if intento:
+                self._count('retried')
+                time.sleep(self.backoff * (2 ** (intento - 1)))
+            instancia = self.instances.pick(payload['number'], fallidas)
+            self.limiter.wait_instance(instancia.name)
+            try:
+                response = self.session.post(instancia.send_url(), json=payload, timeout=self.timeout,
+                                             headers={'apikey': instancia.api_key or ''})
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = str(e)
+                self.instances.failure(instancia, failover=intento < self.max_retries)
+                fallidas.add(instancia.name)
+                continue
+
+            if 200 <= response.status_code < 300:
+                try:
+                    message_id = response.json().get('key', {}).get('id', 'OK')
+                except (ValueError, AttributeError):
+                    message_id = 'OK'
+                print(f"✅ WhatsApp enviado a {numero}: {message_id}")
+                self._count('sent')
+                self.instances.success(instancia)
+                if al_terminar:
+                    al_terminar(True, message_id, False)
+                return True
+
+            error = f"{response.status_code} - {response.text}"
+            if response.status_code == 429:
+                # Frena todos los envíos de la instancia, no solo este reintento
+                self.limiter.rate_limited(instancia.name, retry_after(response, self.backoff * (2 ** intento)))
+            elif response.status_code >= 500:
+                self.instances.failure(instancia, failover=intento < self.max_retries)
+                fallidas.add(instancia.name)
+            else:
+                # Otro 4xx (número inválido, credenciales...): reintentar no sirve
+                reintentable = False
+                break
+
+        print(f"❌ Error al enviar WhatsApp a {numero}: {error}")
+        self._count('failed')
+        if al_terminar:
+            al_terminar(False, error, reintentable)
+        return False
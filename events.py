@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pub/sub en proceso para el canal de eventos (SSE) de la web
+Cada pestaña abierta es una suscripción. Publicar solo despierta a las
+suscripciones del usuario: el stream vuelve a leer la versión de sus tareas y
+el cliente pide los cambios con ?since=, así que varios avisos seguidos se
+funden en uno y nunca se acumulan colas.
+"""
+
+import os
+from threading import Event, Lock
+
+# Streams abiertos como máximo por proceso (cada uno ocupa un hilo del servidor)
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 100))
+# Cada cuánto se envía un comentario de keep-alive y se revisa la versión
+# (así llegan también los cambios hechos por otros procesos)
+SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+# Duración máxima de un stream; el navegador se reconecta solo
+SSE_MAX_SECONDS = int(os.getenv('SSE_MAX_SECONDS', 300))
+# Espera que se sugiere al navegador antes de reconectar (ms)
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))
+
+
+class Subscription:
+    """Suscripción de un stream: un aviso pendiente como máximo"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._event = Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout):
+        """True si hubo algún aviso desde la última espera"""
+        avisado = self._event.wait(timeout)
+        self._event.clear()
+        return avisado
+
+
+class EventBus:
+    """Suscripciones por usuario, con un límite de streams por proceso"""
+
+    def __init__(self, max_subscribers=SSE_MAX_STREAMS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}      # user_id -> set de Subscription
+        self._count = 0
+        self._lock = Lock()
+        self.closed = False
+        self.stats = {'published': 0, 'delivered': 0, 'rejected': 0}
+
+    def subscribe(self, user_id):
+        """Nueva suscripción, o None si ya hay max_subscribers abiertas"""
+        user_id = str(user_id)
+        with self._lock:
+            if self.closed or self._count >= self.max_subscribers:
+                self.stats['rejected'] += 1
+                return None
+            subscription = Subscription(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id)
+            if subs is None or subscription not in subs:
+                return
+            subs.discard(subscription)
+            if not subs:
+                del self._subscribers[subscription.user_id]
+            self._count -= 1
+
+    def publish(self, user_id):
+        """Avisa a todos los streams abiertos del usuario"""
+        with self._lock:
+            subs = list(self._subscribers.get(str(user_id), ()))
+            self.stats['published'] += 1
+            self.stats['delivered'] += len(subs)
+        for subscription in subs:
+            subscription.notify()
+
+    def close(self):
+        """Al parar el servidor: despierta todos los streams para que terminen"""
+        with self._lock:
+            self.closed = True
+            subs = [sub for user_subs in self._subscribers.values() for sub in user_subs]
+        for subscription in subs:
+            subscription.notify()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'streams': self._count,
+                'users': len(self._subscribers),
+                'max_streams': self.max_subscribers,
+                **self.stats
+            }
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Pool de instancias de Evolution API para los mensajes salientes
+Cada destinatario se asigna siempre a la misma instancia con rendezvous
+hashing ponderado: sin estado compartido entre procesos, proporcional a los
+pesos y, al agregar o quitar una instancia, solo se mueven sus usuarios.
+Una instancia que falla seguido (o cuyo connectionState no es 'open') queda
+fuera un tiempo y sus destinatarios pasan a la siguiente de su orden; al
+recuperarse vuelven a ella.
+
+EVOLUTION_INSTANCES=bot1@https://evo1.example.com*2,bot2@https://evo2.example.com
+La API key de cada una es EVOLUTION_API_KEY_<INSTANCIA> o, si no, EVOLUTION_API_KEY.
+"""
+
+import os
+import re
+import math
+import time
+import hashlib
+from collections import OrderedDict
+from threading import Thread, Lock
+
+# Fallos seguidos que sacan a una instancia del reparto, y por cuánto tiempo
+EVOLUTION_FAILURE_THRESHOLD = int(os.getenv('EVOLUTION_FAILURE_THRESHOLD', 3))
+EVOLUTION_COOLDOWN_SECONDS = float(os.getenv('EVOLUTION_COOLDOWN_SECONDS', 30))
+# Cada cuánto se consulta el connectionState de cada instancia (0 = nunca)
+EVOLUTION_HEALTH_SECONDS = float(os.getenv('EVOLUTION_HEALTH_SECONDS', 15))
+
+PATRON_INSTANCIA = re.compile(r'^\s*([\w.-]+)@(https?://[^\s*]+?)/?(?:\*(\d+(?:\.\d+)?))?\s*$')
+
+# Destinatarios fijados a la instancia por la que escribieron, como mucho
+MAX_FIJADOS = 10000
+
+
+def parse_instancias(texto, api_key_defecto=None):
+    """'bot1@https://a*2,bot2@https://b' -> [EvolutionInstance]; ValueError si no es válido"""
+    instancias = []
+    for parte in texto.split(','):
+        if not parte.strip():
+            continue
+        match = PATRON_INSTANCIA.match(parte)
+        if not match:
+            raise ValueError(f"Instancia de Evolution inválida: {parte!r} (formato nombre@url[*peso])")
+        nombre, url, peso = match.groups()
+        variable = 'EVOLUTION_API_KEY_' + re.sub(r'\W', '_', nombre).upper()
+        instancias.append(EvolutionInstance(nombre, url, os.getenv(variable, api_key_defecto),
+                                            float(peso) if peso else 1.0))
+    if len({i.name for i in instancias}) != len(instancias):
+        raise ValueError("Nombres de instancia de Evolution repetidos")
+    return instancias
+
+
+class EvolutionInstance:
+    """Una instancia de Evolution API (url + nombre) con su estado de salud"""
+
+    def __init__(self, name, url, api_key, weight=1.0):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.api_key = api_key
+        self.weight = weight
+        self.failures = 0           # fallos seguidos
+        self.down_until = 0.0       # fuera del reparto hasta este momento
+        self.state = None           # último connectionState
+        self.stats = {'sent': 0, 'failed': 0, 'failovers': 0}
+
+    def send_url(self):
+        return f"{self.url}/message/sendText/{self.name}"
+
+    def available(self, now):
+        return self.down_until <= now
+
+    def score(self, clave):
+        """Puntaje de rendezvous hashing ponderado para una clave"""
+        digest = hashlib.blake2b(f"{self.name}:{clave}".encode(), digest_size=8).digest()
+        u = (int.from_bytes(digest, 'big') + 1) / 2.0 ** 64     # (0, 1]
+        return -self.weight / math.log(u) if u < 1 else math.inf
+
+
+class EvolutionPool:
+    """Instancias de Evolution con asignación fija por destinatario y failover"""
+
+    def __init__(self, instances, failure_threshold=EVOLUTION_FAILURE_THRESHOLD,
+                 cooldown=EVOLUTION_COOLDOWN_SECONDS, health_seconds=EVOLUTION_HEALTH_SECONDS):
+        if not instances:
+            raise ValueError("Se necesita al menos una instancia de Evolution")
+        self.instances = list(instances)
+        self.by_name = {i.name: i for i in self.instances}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health_seconds = health_seconds
+        self._fijados = OrderedDict()
+        self._lock = Lock()
+        self._health_thread = None
+
+    def __len__(self):
+        return len(self.instances)
+
+    def candidates(self, destino):
+        """Instancias en el orden de preferencia del destinatario: disponibles primero"""
+        now = time.time()
+        with self._lock:
+            fijada = self._fijados.get(destino)
+        orden = sorted(self.instances, key=lambda i: (i.name != fijada, -i.score(destino)))
+        return [i for i in orden if i.available(now)] + [i for i in orden if not i.available(now)]
+
+    def pick(self, destino, excluir=()):
+        """Instancia para un envío; las de `excluir` (ya fallaron con este mensaje) al final"""
+        candidatas = self.candidates(destino)
+        for instancia in candidatas:
+            if instancia.name not in excluir:
+                return instancia
+        return candidatas[0]
+
+    def pin(self, destino, nombre):
+        """Fija un destinatario a la instancia por la que escribió (las respuestas salen por ahí)"""
+        if nombre not in self.by_name:
+            return
+        with self._lock:
+            self._fijados[destino] = nombre
+            self._fijados.move_to_end(destino)
+            if len(self._fijados) > MAX_FIJADOS:
+                self._fijados.popitem(last=False)
+
+    def success(self, instancia):
+        with self._lock:
+            instancia.failures = 0
+            instancia.stats['sent'] += 1
+
+    def failure(self, instancia, failover=False):
+        """Un envío falló por la instancia (conexión, timeout, 5xx); tras varios seguidos sale del reparto"""
+        with self._lock:
+            instancia.failures += 1
+            instancia.stats['failed'] += 1
+            if failover:
+                instancia.stats['failovers'] += 1
+            if len(self.instances) > 1 and instancia.failures >= self.failure_threshold:
+                if instancia.available(time.time()):
+                    print(f"⚠️ Instancia de Evolution '{instancia.name}' fuera del reparto por "
+                          f"{self.cooldown:.0f} s tras {instancia.failures} fallos")
+                instancia.down_until = time.time() + self.cooldown
+
+    def check_health(self, session, timeout=5):
+        """Consulta el connectionState de cada instancia; solo 'open' cuenta como sana"""
+        for instancia in self.instances:
+            try:
+                response = session.get(f"{instancia.url}/instance/connectionState/{instancia.name}",
+                                       headers={'apikey': instancia.api_key or ''}, timeout=timeout)
+                estado = response.json().get('instance', {}).get('state') if response.ok else f"HTTP {response.status_code}"
+            except Exception as e:
+                estado = type(e).__name__
+            with self._lock:
+                anterior = instancia.state
+                instancia.state = estado
+                if estado == 'open':
+                    instancia.failures = 0
+                    instancia.down_until = 0.0
+                else:
+                    instancia.down_until = time.time() + max(self.cooldown, self.health_seconds)
+            if estado != anterior and anterior is not None:
+                print(f"{'✅' if estado == 'open' else '⚠️'} Instancia de Evolution '{instancia.name}': {estado}")
+
+    def start_health_checks(self, session):
+        """Revisa la salud en segundo plano (solo con más de una instancia)"""
+        with self._lock:
+            if self._health_thread or len(self.instances) < 2 or not self.health_seconds:
+                return
+            self._health_thread = Thread(target=self._health_loop, args=(session,), daemon=True,
+                                         name='evolution-health')
+        self._health_thread.start()
+
+    def _health_loop(self, session):
+        while True:
+            try:
+                self.check_health(session)
+            except Exception as e:
+                print(f"⚠️ Error revisando instancias de Evolution: {str(e)}")
+            time.sleep(self.health_seconds)
+
+    def metrics(self):
+        now = time.time()
+        with self._lock:
+            return {i.name: {**i.stats, 'weight': i.weight, 'available': i.available(now),
+                             'state': i.state, 'consecutive_failures': i.failures}
+                    for i in self.instances}
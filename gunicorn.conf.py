@@ -0,0 +1,57 @@
+"""
+Configuración de gunicorn (se carga sola desde el directorio de trabajo)
+Con STORAGE_BACKEND=json usa un solo worker: las tareas viven en su memoria.
+Con STORAGE_BACKEND=sqlite se pueden usar varios (WEB_CONCURRENCY).
+"""
+
+import os
+import sys
+import signal
+from dotenv import load_dotenv
+
+# Las mismas variables que verá la app, .env incluido
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+# Con JSON cada worker tendría su propia copia de las tareas y todos escribirían
+# el mismo log: los cambios de uno se perderían en los demás
+workers = int(os.getenv('WEB_CONCURRENCY', 1)) if STORAGE_BACKEND == 'sqlite' else 1
+if STORAGE_BACKEND != 'sqlite' and int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+    print(f"⚠️ STORAGE_BACKEND=json admite un solo worker; se ignora WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY')}")
+# Cada stream SSE abierto (/api/events) ocupa un hilo mientras dura: se reservan
+# SSE_MAX_STREAMS hilos además de los WEB_THREADS para peticiones normales.
+# El pool los crea a medida que hacen falta.
+threads = int(os.getenv('WEB_THREADS', 8)) + int(os.getenv('SSE_MAX_STREAMS', 100))
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+
+
+def on_starting(server):
+    """-w/--workers en la línea de comandos también pisa `workers`: con JSON no se arranca"""
+    if STORAGE_BACKEND != 'sqlite' and server.num_workers > 1:
+        print(f"❌ STORAGE_BACKEND=json admite un solo worker (pedidos: {server.num_workers}); "
+              "usa STORAGE_BACKEND=sqlite para tener varios")
+        sys.exit(1)
+
+
+def _cerrar_streams():
+    # Los streams SSE abiertos retendrían el worker hasta caducar
+    app = sys.modules.get('reminder_bot_auth')
+    if app is not None:
+        app.event_bus.close()
+
+
+def post_worker_init(worker):
+    """Al recibir SIGTERM el worker cierra también los streams SSE"""
+    handle_exit = worker.handle_exit
+
+    def salir(sig, frame):
+        handle_exit(sig, frame)
+        _cerrar_streams()
+
+    signal.signal(signal.SIGTERM, salir)
+
+
+def worker_int(worker):
+    _cerrar_streams()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Clasificador local de intenciones para mensajes de WhatsApp
+Resuelve sin IA los comandos exactos o reconocibles con regex ("lista",
+"ayuda", "completar 2"...). Devuelve el mismo formato que procesar_con_ia,
+o None para que el mensaje se envíe al modelo.
+"""
+
+import re
+import unicodedata
+from threading import Lock
+
+COMANDOS_LISTA = {'lista', 'tareas', 'ver tareas', 'mis tareas', 'ver lista', 'pendientes', 'mis pendientes'}
+COMANDOS_AYUDA = {'ayuda', 'help', 'comandos', '?', 'menu', 'info'}
+
+PATRON_COMPLETAR = re.compile(
+    r'^(?:completar|completa|complete|hecho|hecha|listo|termine|terminar|terminada|✓|✔)'
+    r'\s*(?:la\s+)?(?:tarea\s+)?(?:#|n[o°º]\.?\s*)?(\d{1,4})$'
+)
+
+# Mensajes resueltos localmente frente a los enviados a la IA
+intent_stats = {'local': 0, 'remote': 0}
+_stats_lock = Lock()
+
+
+def registrar(origen):
+    """Cuenta un mensaje atendido localmente ('local') o por la IA ('remote')"""
+    with _stats_lock:
+        intent_stats[origen] += 1
+
+
+def normalizar(mensaje):
+    """Minúsculas, sin acentos, sin puntuación final ni espacios repetidos"""
+    texto = unicodedata.normalize('NFKD', mensaje.strip().lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'\s+', ' ', texto)
+    return texto.strip(' .!¡¿')
+
+
+def _intencion(accion, numero_tarea=None):
+    return {
+        'accion': accion,
+        'descripcion': None,
+        'fecha': None,
+        'hora': None,
+        'numero_tarea': numero_tarea
+    }
+
+
+def clasificar_local(mensaje):
+    """Intención del mensaje si es un comando inequívoco; None si no"""
+    texto = normalizar(mensaje)
+
+    if texto in COMANDOS_LISTA:
+        return _intencion('ver_lista')
+
+    if texto in COMANDOS_AYUDA:
+        return _intencion('ayuda')
+
+    match = PATRON_COMPLETAR.match(texto)
+    if match:
+        return _intencion('completar_tarea', int(match.group(1)))
+
+    return None
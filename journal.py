@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento con bitácora (write-ahead log)
+Cada mutación se agrega como una línea JSON al log; al arrancar se
+reproduce snapshot + log y un compactador en segundo plano reescribe
+el snapshot de forma atómica cuando el log supera un umbral.
+"""
+
+import os
+import copy
+import json
+import shutil
+from threading import Thread, RLock, Event
+
+# Tamaño del log (bytes) a partir del cual se compacta
+COMPACT_THRESHOLD = int(os.getenv('JOURNAL_COMPACT_BYTES', 4 * 1024 * 1024))
+
+# Forzar fsync en cada escritura del log (más lento, más durable)
+JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', '0') == '1'
+
+
+class JournaledStore:
+    """Snapshot JSON + log de mutaciones append-only"""
+
+    def __init__(self, path, empty, apply, snapshot=None, compact_threshold=COMPACT_THRESHOLD, fsync=JOURNAL_FSYNC):
+        """
+        path: archivo de snapshot (el log vive en path + '.log')
+        empty: función que devuelve el estado vacío (dict, list...)
+        apply: función apply(estado, registro) que reproduce una mutación
+        snapshot: función snapshot(estado) que devuelve una copia consistente
+            para serializar; por defecto, deepcopy bajo self.lock (válido si
+            las mutaciones se hacen con self.lock tomado)
+        """
+        self.path = path
+        self.log_path = path + '.log'
+        self.empty = empty
+        self.apply = apply
+        self.snapshot = snapshot or self._locked_copy
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.lock = RLock()
+        self.state = None
+        self._log = None
+        self._log_size = 0
+        self._compact_event = Event()
+        self._compact_lock = RLock()
+        self._compactor = None
+
+    def load(self):
+        """Carga el snapshot y reproduce el log encima"""
+        while True:
+            firma = self._file_signature()
+            state = self.read()
+            # Si otro proceso compactó mientras leíamos, volver a leer
+            if firma == self._file_signature():
+                break
+
+        self.state = state
+        self._open_log()
+        self._start_compactor()
+        return state
+
+    def read(self):
+        """Lee snapshot + log sin abrir el log para escritura"""
+        state = self.empty()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except:
+                state = self.empty()
+
+        # Un '.compacting' sobrevive si el proceso murió a mitad de una
+        # compactación; los registros son idempotentes, así que se reproduce
+        for log_path in (self.log_path + '.compacting', self.log_path):
+            if os.path.exists(log_path):
+                self._replay(state, log_path)
+        return state
+
+    def _file_signature(self):
+        # Inodos de snapshot y logs: cambian al rotar o reemplazar, no al agregar
+        firma = []
+        for path in (self.path, self.log_path + '.compacting', self.log_path):
+            try:
+                firma.append(os.stat(path).st_ino)
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def _locked_copy(self, state):
+        with self.lock:
+            return copy.deepcopy(state)
+
+    def _replay(self, state, log_path):
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Última línea truncada por un corte: se descarta
+                    continue
+                self.apply(state, record)
+
+    def _open_log(self):
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log_size = self._log.tell()
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = Thread(target=self._compact_loop, daemon=True)
+            self._compactor.start()
+
+    def append(self, record):
+        """Agrega una mutación al log"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self.lock:
+            self._log.write(line)
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._log_size += len(line.encode('utf-8'))
+            if self._log_size >= self.compact_threshold:
+                self._compact_event.set()
+
+    def _compact_loop(self):
+        while True:
+            self._compact_event.wait()
+            self._compact_event.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"⚠️ Error al compactar {self.path}: {str(e)}")
+
+    def compact(self):
+        """Reescribe el snapshot de forma atómica y vacía el log"""
+        with self._compact_lock:
+            with self.lock:
+                # A partir de aquí las mutaciones van a un log nuevo
+                self._log.close()
+                self._rotate_log()
+                self._open_log()
+
+            # La copia se toma después de rotar: todo lo que quedó en el log
+            # viejo ya está aplicado, y lo que entre mientras tanto queda en el
+            # log nuevo (los registros son idempotentes, reproducirlos es seguro)
+            snapshot = self.snapshot(self.state)
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            os.remove(self.log_path + '.compacting')
+
+    def _rotate_log(self):
+        """Pasa el log a '.compacting'; si quedó uno de una compactación interrumpida, se le agrega"""
+        compacting = self.log_path + '.compacting'
+        if not os.path.exists(compacting):
+            os.replace(self.log_path, compacting)
+            return
+        # Pisarlo perdería sus registros si esta compactación también falla
+        with open(compacting, 'ab+') as dst, open(self.log_path, 'rb') as src:
+            if dst.tell():
+                dst.seek(-1, os.SEEK_END)
+                if dst.read(1) != b'\n':
+                    # Última línea truncada: que no se pegue al primer registro
+                    dst.write(b'\n')
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.log_path)
+
+    def close(self):
+        with self.lock:
+            if self._log:
+                self._log.close()
+                self._log = None
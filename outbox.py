@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Outbox de mensajes salientes (recordatorios)
+Cada mensaje se guarda primero con una clave de idempotencia y solo se
+marca entregado cuando Evolution API responde 2xx. Mientras se envía queda
+reclamado por un tiempo (OUTBOX_CLAIM_SECONDS), que el proceso que lo tiene en
+su cola renueva en cada barrido (puede esperar más en la cola o apartado por
+el límite del destinatario): si el proceso muere, el barrido lo vuelve a
+enviar al caducar. Los fallos se reintentan con esperas
+crecientes y tras OUTBOX_MAX_ATTEMPTS pasan a 'dead' (dead letter).
+La entrega es al menos una vez: un mensaje en vuelo al morir el proceso
+puede salir dos veces, pero un mismo recordatorio nunca se encola dos veces.
+"""
+
+import os
+import time
+from threading import Lock
+from journal import JournaledStore
+
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', 'outbox.json')
+# Intentos de envío antes de dar un mensaje por muerto
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+# Primera espera tras un fallo; se duplica en cada intento hasta OUTBOX_MAX_RETRY_SECONDS
+OUTBOX_RETRY_SECONDS = int(os.getenv('OUTBOX_RETRY_SECONDS', 30))
+OUTBOX_MAX_RETRY_SECONDS = int(os.getenv('OUTBOX_MAX_RETRY_SECONDS', 3600))
+# Tiempo que un envío en curso queda reclamado antes de que otro barrido lo reintente
+OUTBOX_CLAIM_SECONDS = int(os.getenv('OUTBOX_CLAIM_SECONDS', 300))
+# Días que se guardan los entregados (ventana de deduplicación)
+OUTBOX_KEEP_DAYS = int(os.getenv('OUTBOX_KEEP_DAYS', 7))
+# Cada cuánto busca el planificador mensajes por reintentar, y cuántos como mucho
+OUTBOX_SWEEP_SECONDS = int(os.getenv('OUTBOX_SWEEP_SECONDS', 15))
+OUTBOX_SWEEP_BATCH = int(os.getenv('OUTBOX_SWEEP_BATCH', 100))
+
+ESTADOS = ('pending', 'delivered', 'dead')
+
+
+def clave_recordatorio(user_id, tasks):
+    """
+    Clave de idempotencia de un resumen: usuario y (tarea, número de
+    recordatorio). Si el proceso muere antes de sumar los contadores, el
+    reintento genera la misma clave y no se encola otra vez.
+    """
+    partes = ','.join(f"{t['id']}.{t.get('reminder_count') or 0}" for t in sorted(tasks, key=lambda t: t['id']))
+    return f"recordatorio:{user_id}:{partes}"
+
+
+def espera_reintento(intentos, base=OUTBOX_RETRY_SECONDS, maximo=OUTBOX_MAX_RETRY_SECONDS):
+    """Segundos hasta el siguiente intento tras `intentos` fallos"""
+    return min(base * 2 ** max(intentos - 1, 0), maximo)
+
+
+class JournalOutbox:
+    """Outbox en un snapshot JSON + log (backend JSON, un solo proceso)"""
+
+    def __init__(self, path=OUTBOX_FILE, max_attempts=OUTBOX_MAX_ATTEMPTS, claim_seconds=OUTBOX_CLAIM_SECONDS):
+        self.max_attempts = max_attempts
+        self.claim_seconds = claim_seconds
+        self.store = JournaledStore(path, dict, self._apply)
+        self.entries = self.store.load()
+        self.stats = {'added': 0, 'duplicates': 0, 'delivered': 0, 'retried': 0, 'dead': 0}
+        self._stats_lock = Lock()
+
+    @staticmethod
+    def _apply(state, record):
+        if record['op'] == 'put':
+            state[record['entry']['key']] = record['entry']
+        elif record['op'] == 'del':
+            state.pop(record['key'], None)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _put(self, entry):
+        # Con store.lock tomado
+        self.entries[entry['key']] = entry
+        self.store.append({'op': 'put', 'entry': entry})
+
+    def add(self, key, numero, mensaje):
+        """Guarda un mensaje nuevo ya reclamado para enviarlo; False si la clave ya existía"""
+        return bool(self.add_many([(key, numero, mensaje)]))
+
+    def add_many(self, mensajes):
+        """Como add para varios [(key, numero, mensaje)]; devuelve los que eran nuevos"""
+        now = time.time()
+        nuevos = []
+        with self.store.lock:
+            for key, numero, mensaje in mensajes:
+                if key in self.entries:
+                    self._count('duplicates')
+                    continue
+                self._put({'key': key, 'numero': numero, 'mensaje': mensaje, 'status': 'pending', 'attempts': 0,
+                           'next_attempt_ts': now + self.claim_seconds, 'created_ts': now, 'updated_ts': now,
+                           'message_id': None, 'last_error': None})
+                self._count('added')
+                nuevos.append((key, numero, mensaje))
+        return nuevos
+
+    def claim_due(self, limit=100, now=None):
+        """Reclama los pendientes cuyo intento ya toca: [(key, numero, mensaje)]"""
+        now = time.time() if now is None else now
+        with self.store.lock:
+            vencidos = sorted((e for e in self.entries.values()
+                               if e['status'] == 'pending' and e['next_attempt_ts'] <= now),
+                              key=lambda e: e['next_attempt_ts'])[:limit]
+            for entry in vencidos:
+                self._put({**entry, 'next_attempt_ts': now + self.claim_seconds})
+        return [(e['key'], e['numero'], e['mensaje']) for e in vencidos]
+
+    def renew(self, keys, now=None):
+        """
+        Renueva el reclamo de mensajes que siguen en la cola de envío de este
+        proceso, para que el barrido no los reenvíe; solo los que ya gastaron
+        la mitad del reclamo. Devuelve cuántos renovó
+        """
+        now = time.time() if now is None else now
+        renovados = 0
+        with self.store.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry and entry['status'] == 'pending' and entry['next_attempt_ts'] < now + self.claim_seconds / 2:
+                    self._put({**entry, 'next_attempt_ts': now + self.claim_seconds})
+                    renovados += 1
+        return renovados
+
+    def delivered(self, key, message_id=None):
+        """Marca un mensaje como entregado (Evolution respondió 2xx)"""
+        now = time.time()
+        with self.store.lock:
+            entry = self.entries.get(key)
+            if not entry or entry['status'] != 'pending':
+                return
+            self._put({**entry, 'status': 'delivered', 'message_id': message_id, 'updated_ts': now,
+                       'attempts': entry['attempts'] + 1})
+        self._count('delivered')
+
+    def failed(self, key, error, retryable=True):
+        """Registra un intento fallido; devuelve el nuevo estado ('pending' o 'dead')"""
+        now = time.time()
+        with self.store.lock:
+            entry = self.entries.get(key)
+            if not entry or entry['status'] != 'pending':
+                return None
+            intentos = entry['attempts'] + 1
+            muerto = not retryable or intentos >= self.max_attempts
+            self._put({**entry, 'attempts': intentos, 'last_error': str(error)[:500], 'updated_ts': now,
+                       'status': 'dead' if muerto else 'pending',
+                       'next_attempt_ts': now if muerto else now + espera_reintento(intentos)})
+        self._count('dead' if muerto else 'retried')
+        return 'dead' if muerto else 'pending'
+
+    def dead_letters(self, limit=100):
+        """Mensajes muertos, los más recientes primero"""
+        with self.store.lock:
+            muertos = [dict(e) for e in self.entries.values() if e['status'] == 'dead']
+        return sorted(muertos, key=lambda e: -e['updated_ts'])[:limit]
+
+    def revive(self, key=None):
+        """Devuelve a la cola un mensaje muerto (o todos); cuántos"""
+        now = time.time()
+        with self.store.lock:
+            muertos = [e for e in self.entries.values()
+                       if e['status'] == 'dead' and (key is None or e['key'] == key)]
+            for entry in muertos:
+                self._put({**entry, 'status': 'pending', 'attempts': 0, 'next_attempt_ts': now, 'updated_ts': now})
+        return len(muertos)
+
+    def purge(self, keep_days=OUTBOX_KEEP_DAYS):
+        """Borra los entregados hace más de `keep_days` días"""
+        limite = time.time() - keep_days * 86400
+        with self.store.lock:
+            viejos = [k for k, e in self.entries.items() if e['status'] == 'delivered' and e['updated_ts'] < limite]
+            for key in viejos:
+                del self.entries[key]
+                self.store.append({'op': 'del', 'key': key})
+        return len(viejos)
+
+    def metrics(self):
+        with self.store.lock:
+            por_estado = {estado: 0 for estado in ESTADOS}
+            for entry in self.entries.values():
+                por_estado[entry['status']] += 1
+        with self._stats_lock:
+            return {**por_estado, 'stats': dict(self.stats)}
+
+
+class SQLiteOutbox:
+    """Outbox en una tabla de la base compartida; los barridos de varios procesos no se pisan"""
+
+    def __init__(self, db, max_attempts=OUTBOX_MAX_ATTEMPTS, claim_seconds=OUTBOX_CLAIM_SECONDS):
+        self.db = db
+        self.max_attempts = max_attempts
+        self.claim_seconds = claim_seconds
+        self.stats = {'added': 0, 'duplicates': 0, 'delivered': 0, 'retried': 0, 'dead': 0}
+        self._stats_lock = Lock()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "key TEXT PRIMARY KEY, numero TEXT NOT NULL, mensaje TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt_ts REAL NOT NULL, "
+                "created_ts REAL NOT NULL, updated_ts REAL NOT NULL, message_id TEXT, last_error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_ts)")
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def add(self, key, numero, mensaje):
+        """Guarda un mensaje nuevo ya reclamado para enviarlo; False si la clave ya existía"""
+        return bool(self.add_many([(key, numero, mensaje)]))
+
+    def add_many(self, mensajes):
+        """Como add para varios [(key, numero, mensaje)] en una transacción; devuelve los que eran nuevos"""
+        now = time.time()
+        nuevos = []
+        with self.db.transaction() as conn:
+            for key, numero, mensaje in mensajes:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO outbox (key, numero, mensaje, status, next_attempt_ts, created_ts, updated_ts) "
+                    "VALUES (?, ?, ?, 'pending', ?, ?, ?)",
+                    (key, numero, mensaje, now + self.claim_seconds, now, now)
+                )
+                if cursor.rowcount == 1:
+                    nuevos.append((key, numero, mensaje))
+        self._count('added', len(nuevos))
+        self._count('duplicates', len(mensajes) - len(nuevos))
+        return nuevos
+
+    def claim_due(self, limit=100, now=None):
+        """Reclama los pendientes cuyo intento ya toca: [(key, numero, mensaje)]"""
+        now = time.time() if now is None else now
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                "SELECT key, numero, mensaje FROM outbox WHERE status = 'pending' AND next_attempt_ts <= ? "
+                "ORDER BY next_attempt_ts LIMIT ?", (now, limit)
+            ).fetchall()
+            conn.executemany("UPDATE outbox SET next_attempt_ts = ? WHERE key = ?",
+                             [(now + self.claim_seconds, row['key']) for row in rows])
+        return [(row['key'], row['numero'], row['mensaje']) for row in rows]
+
+    def renew(self, keys, now=None):
+        """
+        Renueva el reclamo de mensajes que siguen en la cola de envío de este
+        proceso, para que el barrido no los reenvíe; solo los que ya gastaron
+        la mitad del reclamo. Devuelve cuántos renovó
+        """
+        now = time.time() if now is None else now
+        renovados = 0
+        with self.db.transaction() as conn:
+            for key in keys:
+                renovados += conn.execute(
+                    "UPDATE outbox SET next_attempt_ts = ? WHERE key = ? AND status = 'pending' AND next_attempt_ts < ?",
+                    (now + self.claim_seconds, key, now + self.claim_seconds / 2)
+                ).rowcount
+        return renovados
+
+    def delivered(self, key, message_id=None):
+        """Marca un mensaje como entregado (Evolution respondió 2xx)"""
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE outbox SET status = 'delivered', message_id = ?, attempts = attempts + 1, updated_ts = ? "
+                "WHERE key = ? AND status = 'pending'", (message_id, time.time(), key)
+            )
+        if cursor.rowcount:
+            self._count('delivered')
+
+    def failed(self, key, error, retryable=True):
+        """Registra un intento fallido; devuelve el nuevo estado ('pending' o 'dead')"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT attempts FROM outbox WHERE key = ? AND status = 'pending'", (key,)).fetchone()
+            if not row:
+                return None
+            intentos = row['attempts'] + 1
+            muerto = not retryable or intentos >= self.max_attempts
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, last_error = ?, updated_ts = ?, status = ?, next_attempt_ts = ? "
+                "WHERE key = ?",
+                (intentos, str(error)[:500], now, 'dead' if muerto else 'pending',
+                 now if muerto else now + espera_reintento(intentos), key)
+            )
+        self._count('dead' if muerto else 'retried')
+        return 'dead' if muerto else 'pending'
+
+    def dead_letters(self, limit=100):
+        """Mensajes muertos, los más recientes primero"""
+        rows = self.db.connect().execute(
+            "SELECT * FROM outbox WHERE status = 'dead' ORDER BY updated_ts DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def revive(self, key=None):
+        """Devuelve a la cola un mensaje muerto (o todos); cuántos"""
+        now = time.time()
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_ts = ?, updated_ts = ? "
+                "WHERE status = 'dead' AND (? IS NULL OR key = ?)", (now, now, key, key)
+            )
+        return cursor.rowcount
+
+    def purge(self, keep_days=OUTBOX_KEEP_DAYS):
+        """Borra los entregados hace más de `keep_days` días"""
+        with self.db.transaction() as conn:
+            cursor = conn.execute("DELETE FROM outbox WHERE status = 'delivered' AND updated_ts < ?",
+                                  (time.time() - keep_days * 86400,))
+        return cursor.rowcount
+
+    def metrics(self):
+        rows = self.db.connect().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        por_estado = {estado: 0 for estado in ESTADOS}
+        por_estado.update({row[0]: row[1] for row in rows})
+        with self._stats_lock:
+            return {**por_estado, 'stats': dict(self.stats)}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Límite de velocidad de los envíos de WhatsApp (token bucket)
+Un bucket global por instancia de Evolution API y uno por destinatario.
+Los tokens se reservan aunque el bucket quede en negativo: la deuda dice
+cuánto hay que esperar, así que los envíos salen espaciados a la tasa
+configurada en vez de en ráfagas. Un 429 de Evolution vacía el bucket de
+la instancia durante el Retry-After. La espera de la instancia se duerme
+en el worker; la del destinatario solo se reserva y quien envía aparta el
+mensaje hasta su turno (ver delivery.py).
+"""
+
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Mensajes por segundo y ráfaga por instancia (0 = sin límite); en el primer
+# segundo pueden salir ráfaga + tasa, así que la suma no debe pasar del límite real
+WHATSAPP_RATE = float(os.getenv('WHATSAPP_RATE', 10))
+WHATSAPP_BURST = int(os.getenv('WHATSAPP_BURST', 5))
+# Mensajes por minuto y ráfaga por destinatario (0 = sin límite)
+WHATSAPP_RECIPIENT_PER_MINUTE = float(os.getenv('WHATSAPP_RECIPIENT_PER_MINUTE', 20))
+WHATSAPP_RECIPIENT_BURST = int(os.getenv('WHATSAPP_RECIPIENT_BURST', 5))
+# El planificador deja para más tarde los recordatorios que esperarían en la
+# cola de envío más de estos segundos, en vez de encolarlos todos de golpe
+WHATSAPP_MAX_BACKLOG_SECONDS = float(os.getenv('WHATSAPP_MAX_BACKLOG_SECONDS', 30))
+
+# Buckets de destinatarios guardados antes de descartar el usado hace más tiempo
+MAX_BUCKETS_DESTINATARIO = 10000
+
+
+class TokenBucket:
+    """`rate` tokens por segundo hasta `capacity`; los tokens pueden quedar a deber"""
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now):
+        """Toma un token; segundos que hay que esperar antes de usarlo (0 si ya se puede)"""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def delay(self, now, pending=0):
+        """Espera que tendría un envío tras otros `pending` ya en cola, sin tomar nada"""
+        self._refill(now)
+        falta = pending + 1 - self.tokens
+        return max(0.0, falta / self.rate)
+
+    def penalize(self, seconds, now):
+        """Deja el bucket en deuda para que nada salga durante `seconds`"""
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """Buckets por instancia y por destinatario, con métricas de espera"""
+
+    def __init__(self, rate=WHATSAPP_RATE, burst=WHATSAPP_BURST,
+                 recipient_per_minute=WHATSAPP_RECIPIENT_PER_MINUTE, recipient_burst=WHATSAPP_RECIPIENT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.recipient_rate = recipient_per_minute / 60
+        self.recipient_burst = recipient_burst
+        self._instances = {}
+        # Orden de último uso: el primero es el que lleva más tiempo sin enviar
+        self._recipients = OrderedDict()
+        self._lock = Lock()
+        self.stats = {'instance_waits': 0, 'recipient_waits': 0, 'wait_seconds': 0.0,
+                      'rate_limited': 0, 'deferred': 0}
+
+    def _bucket(self, buckets, key, rate, burst, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst, now)
+            if buckets is self._recipients and len(buckets) > MAX_BUCKETS_DESTINATARIO:
+                # El menos usado ya se llenó hace rato: es igual que uno nuevo
+                buckets.popitem(last=False)
+        elif buckets is self._recipients:
+            buckets.move_to_end(key)
+        return bucket
+
+    def _reserve(self, tipo, key):
+        """Reserva un token del bucket de la instancia o del destinatario; segundos de espera"""
+        if tipo == 'instance':
+            if not self.rate:
+                return 0.0
+            buckets, rate, burst = self._instances, self.rate, self.burst
+        else:
+            if not self.recipient_rate:
+                return 0.0
+            buckets, rate, burst = self._recipients, self.recipient_rate, self.recipient_burst
+        now = time.monotonic()
+        with self._lock:
+            espera = self._bucket(buckets, key, rate, burst, now).reserve(now)
+            if espera > 0:
+                self.stats[f'{tipo}_waits'] += 1
+                self.stats['wait_seconds'] += espera
+        return espera
+
+    def reserve_recipient(self, recipient):
+        """
+        Reserva el turno de un mensaje a `recipient` sin bloquear; segundos
+        hasta ese turno. Se reserva antes que la instancia, para no gastar un
+        hueco de la instancia mientras se espera a un destinatario lento.
+        """
+        return self._reserve('recipient', recipient)
+
+    def recipient_delay(self, recipient):
+        """Espera que tendría ahora un mensaje a `recipient`, sin reservar nada"""
+        if not self.recipient_rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._recipients.get(recipient)
+            return bucket.delay(now) if bucket else 0.0
+
+    def wait_instance(self, instance):
+        """Bloquea hasta que `instance` pueda enviar; segundos esperados"""
+        espera = self._reserve('instance', instance)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def backlog_seconds(self, instances, pending=0):
+        """Cuánto tardaría en salir un mensaje nuevo con `pending` mensajes en cola repartidos entre `instances`"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._bucket(self._instances, i, self.rate, self.burst, now) for i in instances]
+            for bucket in buckets:
+                bucket._refill(now)
+            falta = pending + 1 - sum(bucket.tokens for bucket in buckets)
+        return max(0.0, falta / (self.rate * len(buckets)))
+
+    def interval(self, instances=1):
+        """Separación media entre envíos repartidos entre `instances` instancias a la tasa configurada"""
+        return 1 / (self.rate * max(instances, 1)) if self.rate else 0.0
+
+    def rate_limited(self, instance, retry_after):
+        """Evolution respondió 429: la instancia no envía nada durante `retry_after` segundos"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats['rate_limited'] += 1
+            if self.rate:
+                self._bucket(self._instances, instance, self.rate, self.burst, now).penalize(retry_after, now)
+
+    def defer(self, count=1):
+        """El planificador dejó `count` recordatorios para más tarde por la cola llena"""
+        with self._lock:
+            self.stats['deferred'] += count
+
+    def metrics(self):
+        now = time.monotonic()
+        with self._lock:
+            instancias = {}
+            for instance, bucket in self._instances.items():
+                bucket._refill(now)
+                instancias[instance] = round(bucket.tokens, 2)
+            return {**self.stats, 'wait_seconds': round(self.stats['wait_seconds'], 2),
+                    'rate': self.rate, 'burst': self.burst,
+                    'recipient_per_minute': round(self.recipient_rate * 60, 2),
+                    'recipient_burst': self.recipient_burst,
+                    'instance_tokens': instancias, 'recipients': len(self._recipients)}
@@ -5,7 +5,6 @@ Funciona en WhatsApp y con interfaz web responsive
 """
 
 import os
-import json
 import time
 import schedule
 from datetime import datetime
@@ -17,6 +16,10 @@ from threading import Thread
 # Cargar variables de entorno
 load_dotenv()
 
+# Después de load_dotenv: lee su configuración del entorno
+from journal import JournaledStore
+from versions import ChangeTracker
+
 # Configuración de Twilio (opcional)
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
@@ -35,64 +38,81 @@ if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
 
 # Archivo de tareas
 TASKS_FILE = 'tasks.json'
+# Clave única de versión: esta versión del bot tiene una sola lista de tareas
+VERSION_KEY = 'tasks'
 
 # Configuración de Flask
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
 
+def aplicar_registro_tareas(tasks, record):
+    """Reproduce una mutación del log de tareas sobre la lista en memoria"""
+    if record['op'] == 'put':
+        task = record['task']
+        for i, t in enumerate(tasks):
+            if t['id'] == task['id']:
+                tasks[i] = task
+                return
+        tasks.append(task)
+    elif record['op'] == 'del':
+        tasks[:] = [t for t in tasks if t['id'] != record['id']]
+
 class TaskManager:
     """Gestor de tareas pendientes"""
 
     def __init__(self):
+        self.store = JournaledStore(TASKS_FILE, empty=list, apply=aplicar_registro_tareas)
         self.tasks = self.load_tasks()
+        # Versión de la lista para las respuestas incrementales de /api/tasks
+        self.versions = ChangeTracker()
 
     def load_tasks(self):
-        """Carga las tareas desde el archivo JSON"""
-        if os.path.exists(TASKS_FILE):
-            try:
-                with open(TASKS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        """Carga las tareas desde snapshot + log de mutaciones"""
+        return self.store.load()
 
     def save_tasks(self):
-        """Guarda las tareas en el archivo JSON"""
-        with open(TASKS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+        """Guarda un snapshot completo y vacía el log"""
+        self.store.compact()
 
     def add_task(self, description, interval_minutes=30):
         """Agrega una nueva tarea"""
-        # Obtener el ID más alto y sumar 1
-        max_id = max([t['id'] for t in self.tasks], default=0)
-        task = {
-            'id': max_id + 1,
-            'description': description,
-            'completed': False,
-            'interval_minutes': interval_minutes,
-            'created_at': datetime.now().isoformat()
-        }
-        self.tasks.append(task)
-        self.save_tasks()
+        with self.store.lock:
+            # Obtener el ID más alto y sumar 1
+            max_id = max([t['id'] for t in self.tasks], default=0)
+            task = {
+                'id': max_id + 1,
+                'description': description,
+                'completed': False,
+                'interval_minutes': interval_minutes,
+                'created_at': datetime.now().isoformat()
+            }
+            self.tasks.append(task)
+            self.store.append({'op': 'put', 'task': task})
+            self.versions.bump(VERSION_KEY, task['id'])
         return task
 
     def complete_task(self, task_id):
         """Marca una tarea como completada"""
-        for task in self.tasks:
-            if task['id'] == task_id and not task['completed']:
-                task['completed'] = True
-                task['completed_at'] = datetime.now().isoformat()
-                self.save_tasks()
-                return task
+        with self.store.lock:
+            for task in self.tasks:
+                if task['id'] == task_id and not task['completed']:
+                    task['completed'] = True
+                    task['completed_at'] = datetime.now().isoformat()
+                    self.store.append({'op': 'put', 'task': task})
+                    self.versions.bump(VERSION_KEY, task_id)
+                    return task
         return None
 
     def delete_task(self, task_id):
         """Elimina una tarea"""
-        task = next((t for t in self.tasks if t['id'] == task_id), None)
-        if task:
-            self.tasks = [t for t in self.tasks if t['id'] != task_id]
-            self.save_tasks()
-            return True
+        with self.store.lock:
+            task = next((t for t in self.tasks if t['id'] == task_id), None)
+            if task:
+                # Se modifica en sitio: el store conserva la misma lista
+                self.tasks[:] = [t for t in self.tasks if t['id'] != task_id]
+                self.store.append({'op': 'del', 'id': task_id})
+                self.versions.bump(VERSION_KEY, task_id)
+                return True
         return False
 
     def get_pending_tasks(self):
@@ -103,6 +123,22 @@ class TaskManager:
         """Obtiene todas las tareas"""
         return self.tasks
 
+    def get_version(self):
+        """Versión actual de la lista de tareas"""
+        return self.versions.version(VERSION_KEY)
+
+    def get_changes(self, since):
+        """(versión, tareas cambiadas, ids eliminados) desde `since`; None si hay que enviar todo"""
+        with self.store.lock:
+            cambios = self.versions.changed_since(VERSION_KEY, since)
+            if cambios is None:
+                return None
+            version, ids = cambios
+            por_id = {t['id']: t for t in self.tasks}
+            changed = [dict(por_id[task_id]) for task_id in sorted(ids) if task_id in por_id]
+            deleted = [task_id for task_id in ids if task_id not in por_id]
+        return version, changed, deleted
+
 # Inicializar gestor de tareas
 task_manager = TaskManager()
 
@@ -115,12 +151,34 @@ def index():
 
 @app.route('/api/tasks', methods=['GET'])
 def get_tasks():
-    """Obtiene todas las tareas"""
-    return jsonify({
-        'success': True,
-        'tasks': task_manager.get_all_tasks(),
-        'pending_count': len(task_manager.get_pending_tasks())
-    })
+    """Obtiene todas las tareas (o solo los cambios con ?since=; 304 con If-None-Match)"""
+    version = task_manager.get_version()
+    if request.if_none_match.contains(version):
+        response = app.response_class(status=304)
+    else:
+        since = request.args.get('since')
+        changes = task_manager.get_changes(since) if since else None
+        if changes is not None:
+            version, changed, deleted = changes
+            response = jsonify({
+                'success': True,
+                'full': False,
+                'version': version,
+                'changed': changed,
+                'deleted': deleted,
+                'pending_count': len(task_manager.get_pending_tasks())
+            })
+        else:
+            response = jsonify({
+                'success': True,
+                'full': True,
+                'version': version,
+                'tasks': task_manager.get_all_tasks(),
+                'pending_count': len(task_manager.get_pending_tasks())
+            })
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/tasks', methods=['POST'])
 def add_task():
@@ -5,6 +5,8 @@ Sistema multi-usuario con login
 """
 
 import os
+# Primero: con STARTUP_PROFILE=1 mide los imports que vienen detrás
+import startup
 import json
 import time
 import schedule
@@ -12,21 +14,73 @@ import hashlib
 import secrets
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, session, redirect, url_for
 from flask_cors import CORS
-from threading import Thread
+from threading import Thread, Lock, RLock, Event
 from functools import wraps
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Módulos locales (después de load_dotenv: leen su configuración del entorno)
+from journal import JournaledStore
+from archive import TaskArchive, archivar_completadas
+from delivery import WhatsAppSender, instancias_configuradas, normalizar_destino, normalizar_e164
+from ratelimit import WHATSAPP_MAX_BACKLOG_SECONDS
+from outbox import JournalOutbox, SQLiteOutbox, clave_recordatorio, OUTBOX_SWEEP_SECONDS, OUTBOX_SWEEP_BATCH
+from workers import KeyedWorkerPool
+from scheduler import ReminderScheduler, parse_due_ts, calcular_due_ts
+from reminder_policy import ReminderPolicy, componer_resumen, urgencia, parse_backoff
+from intents import clasificar_local, registrar, intent_stats
+from ai_cache import ResponseCache
+from ai_client import completar, construir_prompt, limpiar_json
+from ai_batch import IntentBatcher
+from time_parser import extraer_hora_fecha, limpiar_descripcion
+from coordination import (FileLease, SQLiteLease, ShardLeases, shard_de,
+                          SCHEDULER_LEASE_SECONDS, SCHEDULER_SHARDS)
+from versions import ChangeTracker
+from task_index import TaskIndex, normalizar_filtros, formatear_cursor, parsear_cursor
+from events import EventBus, SSE_HEARTBEAT_SECONDS, SSE_MAX_SECONDS, SSE_RETRY_MS
+import ai_client
+import time_parser
+
+startup.marcar('imports')
+
 # Archivos de datos
 USERS_FILE = 'users.json'
 TASKS_FILE = 'tasks_auth.json'
 
+# Procesamiento de mensajes entrantes de WhatsApp
+INBOUND_WORKERS = int(os.getenv('INBOUND_WORKERS', 8))
+INBOUND_QUEUE_SIZE = int(os.getenv('INBOUND_QUEUE_SIZE', 200))
+
+SECRET_KEY_FILE = '.secret_key'
+
+# Token de las rutas de operación /api/admin (Authorization: Bearer <token>); sin él, deshabilitadas
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def cargar_secret_key():
+    """SECRET_KEY del entorno; si falta, una clave generada una vez y compartida por todos los workers"""
+    key = os.getenv('SECRET_KEY')
+    if key:
+        return key
+    if not os.path.exists(SECRET_KEY_FILE):
+        tmp = f"{SECRET_KEY_FILE}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            # link falla si otro proceso la creó primero: gana la primera
+            os.link(tmp, SECRET_KEY_FILE)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(SECRET_KEY_FILE) as f:
+        return f.read().strip()
+
 # Configuración de Flask
 app = Flask(__name__, static_folder='static', template_folder='templates')
-app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
+app.secret_key = cargar_secret_key()
 app.permanent_session_lifetime = timedelta(days=7)
 CORS(app)
 
@@ -35,6 +89,24 @@ class UserManager:
 
     def __init__(self):
         self.users = self.load_users()
+        self._lock = Lock()
+        self._reindex()
+
+    def _reindex(self):
+        """Índices por id, nombre y número E.164 (O(1) por consulta)"""
+        self.by_id = {}
+        self.by_username = {}
+        self.by_number = {}
+        for user in self.users:
+            self._index(user)
+
+    def _index(self, user):
+        self.by_id[user['id']] = user
+        self.by_username[user['username']] = user
+        numero = normalizar_e164(user.get('whatsapp_number') or '')
+        if numero:
+            # Si un número se repite, gana el primer usuario registrado
+            self.by_number.setdefault(numero, user)
 
     def load_users(self):
         """Carga usuarios desde archivo"""
@@ -47,9 +119,12 @@ class UserManager:
         return []
 
     def save_users(self):
-        """Guarda usuarios en archivo"""
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.users, f, ensure_ascii=False, indent=2)
+        """Guarda usuarios en archivo (escritura atómica)"""
+        with self._lock:
+            tmp_path = USERS_FILE + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.users, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, USERS_FILE)
 
     def hash_password(self, password):
         """Hash de contraseña"""
@@ -57,18 +132,20 @@ class UserManager:
 
     def register(self, username, password, whatsapp_number):
         """Registra un nuevo usuario"""
-        if self.get_user(username):
-            return None, "El usuario ya existe"
-
-        user = {
-            'id': len(self.users) + 1,
-            'username': username,
-            'password': self.hash_password(password),
-            'whatsapp_number': whatsapp_number,
-            'created_at': datetime.now().isoformat()
-        }
-
-        self.users.append(user)
+        with self._lock:
+            if self.get_user(username):
+                return None, "El usuario ya existe"
+
+            user = {
+                'id': len(self.users) + 1,
+                'username': username,
+                'password': self.hash_password(password),
+                'whatsapp_number': whatsapp_number,
+                'created_at': datetime.now().isoformat()
+            }
+
+            self.users.append(user)
+            self._index(user)
         self.save_users()
         return user, None
 
@@ -81,86 +158,333 @@ class UserManager:
 
     def get_user(self, username):
         """Obtiene un usuario por nombre"""
-        for user in self.users:
-            if user['username'] == username:
-                return user
-        return None
+        return self.by_username.get(username)
+
+    def get_user_by_id(self, user_id):
+        """Obtiene un usuario por id"""
+        return self.by_id.get(int(user_id))
+
+    def find_by_whatsapp(self, numero):
+        """Busca un usuario por número de WhatsApp (coincidencia exacta en E.164)"""
+        numero = normalizar_e164(numero)
+        return self.by_number.get(numero) if numero else None
+
+    def count_users(self):
+        """Número de usuarios registrados"""
+        return len(self.users)
+
+# Clave del snapshot con el último id asignado por usuario
+LAST_IDS_KEY = '_last_ids'
+
+def indexar_tareas(user_tasks):
+    """Lista de tareas (formato del archivo) -> dict id -> tarea, en orden"""
+    if isinstance(user_tasks, dict):
+        return user_tasks
+    return {t['id']: t for t in user_tasks or []}
+
+def aplicar_registro_tareas(tasks, record):
+    """Reproduce una mutación del log de tareas sobre el estado en memoria"""
+    user_id = record['user']
+    user_tasks = tasks[user_id] = indexar_tareas(tasks.get(user_id))
+    if record['op'] == 'put':
+        task = record['task']
+        user_tasks[task['id']] = task
+        last_ids = tasks.setdefault(LAST_IDS_KEY, {})
+        last_ids[user_id] = max(last_ids.get(user_id, 0), task['id'])
+    elif record['op'] == 'del':
+        user_tasks.pop(record['id'], None)
+
+def leer_tareas_json():
+    """
+    Tareas ({user_id: [tarea]}) y últimos ids del almacenamiento JSON, leídos
+    de snapshot + log sin abrir el log ni arrancar el compactador (para migrar)
+    """
+    tasks = JournaledStore(TASKS_FILE, empty=dict, apply=aplicar_registro_tareas).read()
+    last_ids = tasks.pop(LAST_IDS_KEY, {})
+    tareas = {user_id: list(indexar_tareas(user_tasks).values()) for user_id, user_tasks in tasks.items()}
+    for user_tasks in tareas.values():
+        for task in user_tasks:
+            if 'due_ts' not in task:
+                task['due_ts'] = calcular_due_ts(task)
+    return tareas, last_ids
 
 class TaskManager:
     """Gestor de tareas por usuario"""
 
     def __init__(self):
+        # Un lock por usuario: las mutaciones de usuarios distintos no se bloquean
+        self._user_locks = {}
+        self._user_locks_lock = Lock()
+        self.store = JournaledStore(TASKS_FILE, empty=dict, apply=aplicar_registro_tareas, snapshot=self.snapshot)
         self.tasks = self.load_tasks()
+        # Índices ordenados por usuario para paginar, filtrar y contar
+        self.indexes = {user_id: TaskIndex(user_tasks.values()) for user_id, user_tasks in self.tasks.items()}
+        # Versión por usuario para las respuestas incrementales de /api/tasks
+        self.versions = ChangeTracker()
+        # Funciones listener(user_id, task_id, task) avisadas en cada cambio;
+        # task es None cuando la tarea se eliminó
+        self.listeners = []
+
+    def _notify(self, user_id, task_id, task):
+        for listener in self.listeners:
+            listener(str(user_id), task_id, task)
+
+    def user_lock(self, user_id):
+        """Lock que protege la lista de tareas de un usuario"""
+        user_id = str(user_id)
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            with self._user_locks_lock:
+                lock = self._user_locks.setdefault(user_id, RLock())
+        return lock
+
+    def snapshot(self, tasks):
+        """Copia consistente de todas las tareas, usuario por usuario"""
+        copia = {}
+        last_ids = {}
+        for user_id in list(tasks.keys()):
+            with self.user_lock(user_id):
+                copia[user_id] = [dict(t) for t in tasks.get(user_id, {}).values()]
+                last_ids[user_id] = self.last_ids.get(user_id, 0)
+        copia[LAST_IDS_KEY] = last_ids
+        return copia
 
     def load_tasks(self):
-        """Carga tareas desde archivo"""
-        if os.path.exists(TASKS_FILE):
-            try:
-                with open(TASKS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+        """Carga tareas desde snapshot + log de mutaciones"""
+        tasks = self.store.load()
+
+        # En memoria cada usuario tiene un dict id -> tarea (orden de creación)
+        # y un contador persistente del último id, para operar en O(1)
+        self.last_ids = tasks.pop(LAST_IDS_KEY, {})
+        for user_id in list(tasks.keys()):
+            tasks[user_id] = indexar_tareas(tasks[user_id])
+            self.last_ids[user_id] = max(self.last_ids.get(user_id, 0), max(tasks[user_id], default=0))
+
+        # Migración: calcular una sola vez el vencimiento de tareas antiguas
+        migradas = 0
+        for user_tasks in tasks.values():
+            for task in user_tasks.values():
+                if 'due_ts' not in task:
+                    task['due_ts'] = calcular_due_ts(task)
+                    migradas += 1
+        if migradas:
+            print(f"🗓️ {migradas} tarea(s) migradas con due_ts")
+            self.store.compact()
+
+        return tasks
 
     def save_tasks(self):
-        """Guarda tareas en archivo"""
-        with open(TASKS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+        """Guarda un snapshot completo y vacía el log"""
+        self.store.compact()
+
+    def update_task(self, user_id, task):
+        """Registra en el log los cambios hechos a una tarea"""
+        self.store.append({'op': 'put', 'user': str(user_id), 'task': task})
+        self._index(user_id).put(task)
+        self.versions.bump(str(user_id), task['id'])
+
+    def _index(self, user_id):
+        """Índice de las tareas del usuario (se llama con su lock tomado)"""
+        user_id = str(user_id)
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = self.indexes[user_id] = TaskIndex()
+        return index
+
+    def get_user_ids(self):
+        """Ids (str) de los usuarios que tienen tareas"""
+        return list(self.tasks.keys())
+
+    def get_scheduled_tasks(self, shards=None, total_shards=1):
+        """
+        (user_id, task_id, task) de las tareas pendientes con fecha, solo de los
+        usuarios de `shards` (user_id % total_shards) si se indican; de la
+        tarea basta con due_ts y los campos de recordatorio (ver ReminderPolicy)
+        """
+        scheduled = []
+        for user_id in self.get_user_ids():
+            if shards is not None and shard_de(user_id, total_shards) not in shards:
+                continue
+            for task in self.get_user_tasks(user_id):
+                if not task['completed'] and task.get('due_ts') is not None:
+                    scheduled.append((user_id, task['id'], task))
+        return scheduled
 
     def get_user_tasks(self, user_id):
         """Obtiene tareas de un usuario"""
-        return self.tasks.get(str(user_id), [])
-
-    def add_task(self, user_id, description, due_date=None, due_time=None):
+        with self.user_lock(user_id):
+            return list(self.tasks.get(str(user_id), {}).values())
+
+    def get_task(self, user_id, task_id):
+        """Obtiene una tarea de un usuario por id"""
+        return self.tasks.get(str(user_id), {}).get(task_id)
+
+    def get_pending_tasks_many(self, ids_by_user):
+        """Tareas aún pendientes de varios usuarios {user_id: [task_id]}: {user_id: [tarea]}"""
+        pendientes = {}
+        for user_id, task_ids in ids_by_user.items():
+            tasks = [t for t in (self.get_task(user_id, task_id) for task_id in task_ids) if t and not t['completed']]
+            if tasks:
+                pendientes[user_id] = tasks
+        return pendientes
+
+    def add_task(self, user_id, description, due_date=None, due_time=None, reminder_backoff=None):
         """Agrega una tarea para un usuario con fecha/hora programada"""
         user_id = str(user_id)
-        if user_id not in self.tasks:
-            self.tasks[user_id] = []
-
-        user_tasks = self.tasks[user_id]
-        max_id = max([t['id'] for t in user_tasks], default=0)
-
-        task = {
-            'id': max_id + 1,
-            'description': description,
-            'completed': False,
-            'due_date': due_date,  # Formato: YYYY-MM-DD
-            'due_time': due_time,  # Formato: HH:MM
-            'reminder_count': 0,   # Contador de recordatorios enviados
-            'created_at': datetime.now().isoformat()
-        }
-
-        self.tasks[user_id].append(task)
-        self.save_tasks()
+        due_ts = parse_due_ts(due_date, due_time)
+        with self.user_lock(user_id):
+            user_tasks = self.tasks.setdefault(user_id, {})
+            task_id = self.last_ids[user_id] = self.last_ids.get(user_id, 0) + 1
+
+            task = {
+                'id': task_id,
+                'description': description,
+                'completed': False,
+                'due_date': due_date,  # Formato: YYYY-MM-DD
+                'due_time': due_time,  # Formato: HH:MM
+                'due_ts': due_ts,      # Epoch de vencimiento (None sin fecha)
+                'reminder_count': 0,   # Contador de recordatorios enviados
+                'created_at': datetime.now().isoformat()
+            }
+            if reminder_backoff:
+                task['reminder_backoff'] = reminder_backoff  # Backoff propio, p. ej. "10m,1h"
+
+            user_tasks[task_id] = task
+            self.update_task(user_id, task)
+        self._notify(user_id, task['id'], task)
         return task
 
     def complete_task(self, user_id, task_id):
         """Marca una tarea como completada"""
-        user_tasks = self.get_user_tasks(user_id)
-        for task in user_tasks:
-            if task['id'] == task_id and not task['completed']:
-                task['completed'] = True
-                task['completed_at'] = datetime.now().isoformat()
-                self.save_tasks()
-                return task
-        return None
+        with self.user_lock(user_id):
+            task = self.get_task(user_id, task_id)
+            if not task or task['completed']:
+                return None
+            task['completed'] = True
+            task['completed_at'] = datetime.now().isoformat()
+            self.update_task(user_id, task)
+        self._notify(user_id, task_id, task)
+        return task
+
+    def increment_reminder_count(self, user_id, task_id):
+        """Suma un recordatorio enviado; None si la tarea ya no está pendiente"""
+        with self.user_lock(user_id):
+            task = self.get_task(user_id, task_id)
+            if not task or task['completed']:
+                return None
+            task['reminder_count'] = task.get('reminder_count', 0) + 1
+            task['last_reminder_ts'] = int(time.time())
+            self.update_task(user_id, task)
+        return task
+
+    def increment_reminder_counts(self, user_id, task_ids):
+        """Como increment_reminder_count para varias tareas del usuario"""
+        tasks = []
+        with self.user_lock(user_id):
+            for task_id in task_ids:
+                task = self.increment_reminder_count(user_id, task_id)
+                if task:
+                    tasks.append(task)
+        return tasks
+
+    def increment_reminder_counts_many(self, ids_by_user):
+        """increment_reminder_counts para varios usuarios {user_id: [task_id]}: {user_id: [tarea]}"""
+        recordados = {}
+        for user_id, task_ids in ids_by_user.items():
+            tasks = self.increment_reminder_counts(user_id, task_ids)
+            if tasks:
+                recordados[user_id] = tasks
+        return recordados
 
     def delete_task(self, user_id, task_id):
         """Elimina una tarea"""
         user_id = str(user_id)
-        if user_id in self.tasks:
-            self.tasks[user_id] = [t for t in self.tasks[user_id] if t['id'] != task_id]
-            self.save_tasks()
-            return True
-        return False
+        with self.user_lock(user_id):
+            if user_id not in self.tasks:
+                return False
+            self.tasks[user_id].pop(task_id, None)
+            self.store.append({'op': 'del', 'user': user_id, 'id': task_id})
+            self._index(user_id).remove(task_id)
+            self.versions.bump(user_id, task_id)
+        self._notify(user_id, task_id, None)
+        return True
+
+    def remove_tasks(self, user_id, task_ids):
+        """Quita tareas del conjunto activo (p. ej. al archivarlas)"""
+        user_id = str(user_id)
+        with self.user_lock(user_id):
+            user_tasks = self.tasks.get(user_id, {})
+            for task_id in task_ids:
+                if user_tasks.pop(task_id, None) is not None:
+                    self.store.append({'op': 'del', 'user': user_id, 'id': task_id})
+                    self._index(user_id).remove(task_id)
+                    self.versions.bump(user_id, task_id)
+        for task_id in task_ids:
+            self._notify(user_id, task_id, None)
 
     def get_pending_tasks(self, user_id):
         """Obtiene tareas pendientes de un usuario"""
         return [t for t in self.get_user_tasks(user_id) if not t['completed']]
 
-# Inicializar gestores
-user_manager = UserManager()
-task_manager = TaskManager()
+    def count_tasks(self, user_id, now=None):
+        """Contadores total/pending/completed/overdue del usuario, sin recorrer sus tareas"""
+        with self.user_lock(user_id):
+            return self._index(user_id).counts(now or time.time())
+
+    def query_tasks(self, user_id, status=None, due_from=None, due_to=None, sort='created', cursor=None, limit=50):
+        """
+        Página de tareas filtrada por estado (all/pending/completed/overdue) y
+        rango de vencimiento [due_from, due_to) en epoch, en el orden pedido
+        (created, -created, due, -due). Devuelve (tareas, cursor siguiente o None).
+        ValueError si el filtro, el orden o el cursor no son válidos.
+        """
+        user_id = str(user_id)
+        estados, desde, hasta = normalizar_filtros(status, due_from, due_to, time.time())
+        clave = parsear_cursor(sort, cursor)
+        with self.user_lock(user_id):
+            ids = self._index(user_id).query(estados, desde, hasta, sort, clave, limit + 1)
+            user_tasks = self.tasks.get(user_id, {})
+            tasks = [dict(user_tasks[task_id]) for task_id in ids]
+        if len(tasks) > limit:
+            return tasks[:limit], formatear_cursor(sort, tasks[limit - 1])
+        return tasks, None
+
+    def get_version(self, user_id):
+        """Versión actual de las tareas de un usuario"""
+        return self.versions.version(str(user_id))
+
+    def get_changes(self, user_id, since):
+        """(versión, tareas cambiadas, ids eliminados) desde `since`; None si hay que enviar todo"""
+        user_id = str(user_id)
+        with self.user_lock(user_id):
+            cambios = self.versions.changed_since(user_id, since)
+            if cambios is None:
+                return None
+            version, ids = cambios
+            user_tasks = self.tasks.get(user_id, {})
+            changed = [dict(user_tasks[task_id]) for task_id in sorted(ids) if task_id in user_tasks]
+            deleted = [task_id for task_id in ids if task_id not in user_tasks]
+        return version, changed, deleted
+
+# Inicializar gestores (STORAGE_BACKEND=json|sqlite)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+
+if STORAGE_BACKEND == 'sqlite':
+    from sqlite_store import SQLiteDatabase, SQLiteUserManager, SQLiteTaskManager, migrar_desde_json
+
+    db = SQLiteDatabase()
+    user_manager = SQLiteUserManager(db)
+    task_manager = SQLiteTaskManager(db)
+
+    # Migración única: solo si la base está vacía y existen los JSON
+    if user_manager.count_users() == 0 and os.path.exists(USERS_FILE):
+        if migrar_desde_json(db, UserManager().users, *leer_tareas_json()):
+            print(f"📦 Datos migrados de {USERS_FILE}/{TASKS_FILE} a {db.path}")
+else:
+    user_manager = UserManager()
+    task_manager = TaskManager()
+
+startup.marcar('carga de datos')
 
 # Decorador para rutas protegidas
 def login_required(f):
@@ -171,6 +495,18 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Decorador para rutas de operación (ADMIN_TOKEN)
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'error': 'Rutas de administración deshabilitadas (ADMIN_TOKEN)'}), 404
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 # ========== RUTAS DE AUTENTICACIÓN ==========
 
 @app.route('/')
@@ -235,19 +571,96 @@ def logout():
 
 # ========== RUTAS DE TAREAS (PROTEGIDAS) ==========
 
-@app.route('/api/tasks', methods=['GET'])
-@login_required
-def get_tasks():
-    """Obtiene tareas del usuario actual"""
-    user_id = session['user_id']
-    tasks = task_manager.get_user_tasks(user_id)
-    pending = task_manager.get_pending_tasks(user_id)
+# Parámetros que activan la respuesta paginada de GET /api/tasks
+PARAMETROS_PAGINA = ('status', 'sort', 'limit', 'cursor', 'due_from', 'due_to')
 
-    return jsonify({
+def inicio_del_dia(fecha, dias=0):
+    """Epoch del inicio del día YYYY-MM-DD (más `dias`); None sin fecha"""
+    if not fecha:
+        return None
+    return int((datetime.strptime(fecha, '%Y-%m-%d') + timedelta(days=dias)).timestamp())
+
+def get_tasks_page(user_id):
+    """
+    Página de tareas: ?status=all|pending|completed|overdue, ?due_from= y
+    ?due_to= (YYYY-MM-DD, ambos incluidos), ?sort=created|-created|due|-due,
+    ?limit= (máx. 200) y ?cursor=<next_cursor>. Incluye los contadores.
+    """
+    # Antes que la página: lo que cambie entre medias llegará por ?since=
+    version = task_manager.get_version(user_id)
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        tasks, next_cursor = task_manager.query_tasks(
+            user_id,
+            status=request.args.get('status'),
+            due_from=inicio_del_dia(request.args.get('due_from')),
+            due_to=inicio_del_dia(request.args.get('due_to'), dias=1),
+            sort=request.args.get('sort', 'created'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+
+    response = jsonify({
         'success': True,
+        'version': version,
         'tasks': tasks,
-        'pending_count': len(pending)
+        'next_cursor': next_cursor,
+        'counts': task_manager.count_tasks(user_id)
     })
+    # Las vencidas dependen de la hora: sin ETag
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@app.route('/api/tasks', methods=['GET'])
+@login_required
+def get_tasks():
+    """
+    Obtiene tareas del usuario actual. La versión va en el ETag: con
+    If-None-Match igual responde 304, y con ?since=<versión> solo devuelve
+    las tareas cambiadas y los ids eliminados desde esa versión. Con
+    parámetros de página ver get_tasks_page
+    """
+    user_id = session['user_id']
+    if any(parametro in request.args for parametro in PARAMETROS_PAGINA):
+        return get_tasks_page(user_id)
+
+    # La versión se lee antes que las tareas: si algo cambia entre medias,
+    # el cliente recibirá ese cambio otra vez en la siguiente consulta
+    version = task_manager.get_version(user_id)
+    if request.if_none_match.contains(version):
+        response = app.response_class(status=304)
+    else:
+        since = request.args.get('since')
+        changes = task_manager.get_changes(user_id, since) if since else None
+        # Sin 'overdue': depende de la hora y esta respuesta se revalida por ETag
+        counts = task_manager.count_tasks(user_id)
+        counts.pop('overdue')
+        if changes is not None:
+            version, changed, deleted = changes
+            response = jsonify({
+                'success': True,
+                'full': False,
+                'version': version,
+                'changed': changed,
+                'deleted': deleted,
+                'counts': counts,
+                'pending_count': counts['pending']
+            })
+        else:
+            response = jsonify({
+                'success': True,
+                'full': True,
+                'version': version,
+                'tasks': task_manager.get_user_tasks(user_id),
+                'counts': counts,
+                'pending_count': counts['pending']
+            })
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Cookie'
+    return response
 
 @app.route('/api/tasks', methods=['POST'])
 @login_required
@@ -258,13 +671,43 @@ def add_task():
     description = data.get('description', '').strip()
     due_date = data.get('due_date')
     due_time = data.get('due_time')
+    reminder_backoff = data.get('reminder_backoff')
 
     if not description:
         return jsonify({'success': False, 'error': 'Descripción requerida'}), 400
 
-    task = task_manager.add_task(user_id, description, due_date, due_time)
+    try:
+        parse_due_ts(due_date, due_time)
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'error': 'Fecha u hora inválida (formato YYYY-MM-DD y HH:MM)'}), 400
+
+    if reminder_backoff:
+        try:
+            parse_backoff(reminder_backoff)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Backoff inválido (p. ej. "10m,1h,1d")'}), 400
+
+    task = task_manager.add_task(user_id, description, due_date, due_time, reminder_backoff)
     return jsonify({'success': True, 'task': task})
 
+@app.route('/api/tasks/archive', methods=['GET'])
+@login_required
+def get_archived_tasks():
+    """Tareas archivadas del usuario actual, paginadas (más recientes primero)"""
+    user_id = session['user_id']
+    cursor = request.args.get('cursor')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        tasks, next_cursor = task_archive.page(user_id, cursor, limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+
+    return jsonify({
+        'success': True,
+        'tasks': tasks,
+        'next_cursor': next_cursor
+    })
+
 @app.route('/api/tasks/<int:task_id>/complete', methods=['POST'])
 @login_required
 def complete_task(task_id):
@@ -297,208 +740,270 @@ def get_user():
         }
     })
 
+# ========== EVENTOS (SSE) ==========
+
+event_bus = EventBus()
+task_manager.listeners.append(lambda user_id, task_id, task: event_bus.publish(user_id))
+
+def evento_tareas(version):
+    """Mensaje SSE con la versión actual de las tareas"""
+    return f"id: {version}\nevent: tasks\ndata: {json.dumps({'version': version})}\n\n"
+
+@app.route('/api/events', methods=['GET'])
+@login_required
+def task_events():
+    """
+    Stream SSE que avisa de cada cambio en las tareas del usuario actual con
+    su nueva versión; el cliente pide los cambios con ?since=. Si se supera el
+    límite de streams responde 503 y el cliente vuelve a consultar cada 10 s.
+    """
+    user_id = str(session['user_id'])
+    subscription = event_bus.subscribe(user_id)
+    if subscription is None:
+        return jsonify({'success': False, 'error': 'Demasiadas conexiones abiertas'}), 503
+
+    def stream():
+        try:
+            version = task_manager.get_version(user_id)
+            yield f"retry: {SSE_RETRY_MS}\n\n" + evento_tareas(version)
+            fin = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < fin:
+                subscription.wait(SSE_HEARTBEAT_SECONDS)
+                if event_bus.closed:
+                    return
+                # También al vencer la espera: la tarea pudo cambiar en otro proceso
+                actual = task_manager.get_version(user_id)
+                if actual != version:
+                    version = actual
+                    yield evento_tareas(version)
+                else:
+                    yield ": ping\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # ========== RECORDATORIOS ==========
 
+task_archive = TaskArchive()
+
+def archivar_tareas():
+    """Mueve al archivo las tareas completadas hace tiempo"""
+    # Con shards, solo el proceso que tiene el shard 0 archiva (una vez para todos)
+    if shards_propios is not None and 0 not in shards_propios:
+        return
+    total = archivar_completadas(task_manager, task_archive)
+    if total:
+        print(f"🗄️ {total} tarea(s) completadas movidas al archivo")
+
+reminder_scheduler = ReminderScheduler()
+reminder_policy = ReminderPolicy()
+
+# Con SQLite y SCHEDULER_SHARDS > 1 cada proceso planificador dispara solo los
+# usuarios de sus shards (ver ShardLeases); None = todos los usuarios. Hasta
+# tomar el lease no dispara ninguno, y su heap queda vacío (un worker web
+# con el planificador en otro proceso no guarda recordatorios que no usa)
+PLANIFICADOR_POR_SHARDS = STORAGE_BACKEND == 'sqlite' and SCHEDULER_SHARDS > 1
+shards_propios = frozenset()
+
+def programar_recordatorio(user_id, task_id, task):
+    """Mantiene el planificador al día con los cambios de tareas"""
+    if shards_propios is not None and shard_de(user_id, SCHEDULER_SHARDS) not in shards_propios:
+        return
+    fire_ts = None if task is None or task['completed'] else reminder_policy.next_fire_ts(task)
+    if fire_ts is None:
+        reminder_scheduler.cancel(user_id, task_id)
+    else:
+        reminder_scheduler.schedule(user_id, task_id, fire_ts)
+
+task_manager.listeners.append(programar_recordatorio)
+
+def cargar_recordatorios():
+    """Alinea el planificador con las tareas pendientes con fecha (de sus shards) del almacenamiento"""
+    programados = ((user_id, task_id, reminder_policy.next_fire_ts(task))
+                   for user_id, task_id, task in task_manager.get_scheduled_tasks(shards_propios, SCHEDULER_SHARDS))
+    return reminder_scheduler.sync([p for p in programados if p[2] is not None])
+
+# Usuarios por lote en cada pasada del planificador: las tareas se leen y el
+# outbox y los contadores se escriben una vez por lote, no por usuario
+SCHEDULER_BATCH_USERS = int(os.getenv('SCHEDULER_BATCH_USERS', 500))
+
 def enviar_recordatorios():
-    """Envía recordatorios para todos los usuarios con tareas vencidas o próximas"""
+    """
+    Envía recordatorios de las tareas cuyo momento de disparo ya llegó: un
+    solo mensaje por usuario con todas sus tareas vencidas, como mucho uno por
+    ventana (REMINDER_DIGEST_SECONDS), y cada tarea se repite según su backoff
+    """
     now = datetime.now()
-    print(f"\n⏰ [{now.strftime('%H:%M')}] Verificando recordatorios...")
+    now_ts = now.timestamp()
+    due = reminder_scheduler.pop_due(now_ts)
+    if not due:
+        return
+
+    print(f"\n⏰ [{now.strftime('%H:%M')}] Enviando recordatorios...")
+
+    due_by_user = {}
+    for user_id, task_id in due:
+        due_by_user.setdefault(user_id, []).append(task_id)
+
+    # Lo que ya espera en la cola de envío, en segundos a la tasa de las instancias
+    retraso = whatsapp_sender.backlog_seconds()
+
+    lote = {}
+    for user_id, task_ids in due_by_user.items():
+        # Ya se le escribió dentro de la ventana: esperan al siguiente resumen
+        espera = reminder_policy.digest_wait(user_id, now_ts)
+        if espera > 0:
+            for task_id in task_ids:
+                reminder_scheduler.schedule(user_id, task_id, now_ts + espera)
+            reminder_policy.defer(len(task_ids))
+            continue
 
-    for user_id in task_manager.tasks.keys():
-        user_tasks = task_manager.get_user_tasks(user_id)
-        user = next((u for u in user_manager.users if u['id'] == int(user_id)), None)
+        user = user_manager.get_user_by_id(user_id)
 
         if not user:
             continue
 
-        tasks_to_remind = []
-
-        for task in user_tasks:
-            if task['completed']:
+        # Sin ráfagas: si la cola ya tiene más de WHATSAPP_MAX_BACKLOG_SECONDS
+        # de envíos, el resumen se reprograma para cuando haya bajado a la mitad;
+        # si es el usuario el que agotó su límite (chat), para cuando le toque
+        if user.get('whatsapp_number'):
+            turno_destinatario = whatsapp_sender.recipient_delay(user['whatsapp_number'])
+            if turno_destinatario > 0:
+                for task_id in task_ids:
+                    reminder_scheduler.schedule(user_id, task_id, now_ts + turno_destinatario)
+                whatsapp_sender.limiter.defer(len(task_ids))
                 continue
-
-            # Si la tarea tiene fecha/hora programada
-            if task.get('due_date') and task.get('due_time'):
-                try:
-                    due_datetime_str = f"{task['due_date']} {task['due_time']}"
-                    due_datetime = datetime.strptime(due_datetime_str, '%Y-%m-%d %H:%M')
-
-                    # Si ya pasó la fecha/hora y no se ha completado
-                    if now >= due_datetime:
-                        tasks_to_remind.append(task)
-                        task['reminder_count'] = task.get('reminder_count', 0) + 1
-
-                except:
-                    pass
-
-            # Si solo tiene fecha (sin hora)
-            elif task.get('due_date'):
-                try:
-                    due_date = datetime.strptime(task['due_date'], '%Y-%m-%d').date()
-                    if now.date() >= due_date:
-                        tasks_to_remind.append(task)
-                        task['reminder_count'] = task.get('reminder_count', 0) + 1
-                except:
-                    pass
-
-        if tasks_to_remind:
-            task_manager.save_tasks()
-            print(f"📋 Usuario '{user['username']}': {len(tasks_to_remind)} recordatorio(s) enviado(s)")
-
-            # Preparar mensaje de WhatsApp
-            mensaje_whatsapp = f"⏰ *RECORDATORIOS - {user['username']}*\n\n"
-
-            for task in tasks_to_remind:
-                urgency = ""
-                urgency_text = ""
-                count = task.get('reminder_count', 1)
-
-                if count > 5:
-                    urgency = "🔴 MUY URGENTE "
-                    urgency_text = "MUY URGENTE"
-                elif count > 3:
-                    urgency = "🟠 URGENTE "
-                    urgency_text = "URGENTE"
-                elif count > 1:
-                    urgency = "🟡 IMPORTANTE "
-                    urgency_text = "IMPORTANTE"
-
-                print(f"  {urgency}#{task['id']}: {task['description']} (recordatorio #{count})")
-
-                # Agregar al mensaje de WhatsApp
-                if urgency_text:
-                    mensaje_whatsapp += f"{urgency}*{urgency_text}*\n"
-                mensaje_whatsapp += f"#{task['id']}: {task['description']}\n"
-
-                if task.get('due_date'):
-                    mensaje_whatsapp += f"📅 {task['due_date']}"
-                    if task.get('due_time'):
-                        mensaje_whatsapp += f" ⏰ {task['due_time']}"
-                    mensaje_whatsapp += "\n"
-
-                mensaje_whatsapp += f"(Recordatorio #{count})\n\n"
-
-            mensaje_whatsapp += f"📊 Total: {len(tasks_to_remind)} tarea(s) pendiente(s)\n\n"
-            mensaje_whatsapp += "💡 Completa las tareas en la app para dejar de recibir recordatorios."
-
-            # Enviar por WhatsApp
-            if user.get('whatsapp_number'):
-                enviar_whatsapp(user['whatsapp_number'], mensaje_whatsapp)
-
-def enviar_whatsapp(numero, mensaje):
-    """Envía un mensaje por WhatsApp usando Evolution API"""
-    import requests
-
-    # Configuración Evolution API
-    EVOLUTION_API_URL = os.getenv('EVOLUTION_API_URL', 'https://devevoapi.tuagenteia.click')
-    EVOLUTION_API_KEY = os.getenv('EVOLUTION_API_KEY', 'e50bdaf76404943a4e2d13d7ff7a49a2')
-    EVOLUTION_INSTANCE = os.getenv('EVOLUTION_INSTANCE', 'reminderbot')
-
-    if not EVOLUTION_API_URL or not EVOLUTION_API_KEY:
-        print("⚠️  Evolution API no configurado")
+            if retraso > WHATSAPP_MAX_BACKLOG_SECONDS:
+                turno = now_ts + retraso - WHATSAPP_MAX_BACKLOG_SECONDS / 2
+                for task_id in task_ids:
+                    reminder_scheduler.schedule(user_id, task_id, turno)
+                whatsapp_sender.limiter.defer(len(task_ids))
+                retraso += whatsapp_sender.send_interval()
+                continue
+            retraso += whatsapp_sender.send_interval()
+
+        lote[user_id] = (user, task_ids)
+        if len(lote) >= SCHEDULER_BATCH_USERS:
+            enviar_lote(lote, now_ts)
+            lote = {}
+    if lote:
+        enviar_lote(lote, now_ts)
+
+def enviar_lote(lote, now_ts):
+    """
+    Resúmenes de un lote {user_id: (user, task_ids)}: una lectura de las
+    tareas, una escritura en el outbox y otra de contadores para todo el lote
+    """
+    pendientes = task_manager.get_pending_tasks_many({user_id: task_ids for user_id, (_, task_ids) in lote.items()})
+    if not pendientes:
+        return
+
+    # Primero el outbox y después los contadores: si el proceso muere en
+    # medio, las tareas vuelven a dispararse con la misma clave y el
+    # mensaje no se duplica; si el envío falla, el barrido lo reintenta
+    resumenes = []
+    for user_id, tasks in pendientes.items():
+        user = lote[user_id][0]
+        if user.get('whatsapp_number'):
+            resumen = [{**t, 'reminder_count': (t.get('reminder_count') or 0) + 1} for t in tasks]
+            resumenes.append((clave_recordatorio(user_id, resumen), user['whatsapp_number'],
+                              componer_resumen(user['username'], resumen)))
+    enviar_resumenes(resumenes)
+
+    # Las completadas entretanto no vuelven
+    recordados = task_manager.increment_reminder_counts_many(
+        {user_id: [t['id'] for t in tasks] for user_id, tasks in pendientes.items()})
+
+    for user_id, tasks_to_remind in recordados.items():
+        for task in tasks_to_remind:
+            # Las tareas vencidas se vuelven a recordar hasta que se completen
+            next_fire_ts = reminder_policy.next_fire_ts(task)
+            if next_fire_ts is not None:
+                reminder_scheduler.schedule(user_id, task['id'], next_fire_ts)
+
+        reminder_policy.sent(user_id, now_ts, len(tasks_to_remind))
+        # El contador de recordatorios se ve en la web
+        event_bus.publish(user_id)
+        print(f"📋 Usuario '{lote[user_id][0]['username']}': {len(tasks_to_remind)} recordatorio(s) enviado(s)")
+        for task in tasks_to_remind:
+            count = task.get('reminder_count', 1)
+            print(f"  {urgencia(count)[0]}#{task['id']}: {task['description']} (recordatorio #{count})")
+
+whatsapp_sender = WhatsAppSender(instances=instancias_configuradas())
+outbox = SQLiteOutbox(db) if STORAGE_BACKEND == 'sqlite' else JournalOutbox()
+
+def enviar_whatsapp(numero, mensaje, clave=None):
+    """
+    Encola un mensaje de WhatsApp para enviarlo por Evolution API. Con clave
+    pasa antes por el outbox: queda guardado hasta que se entrega y una
+    clave repetida no se vuelve a enviar
+    """
+    if clave is None:
+        return whatsapp_sender.enqueue(numero, mensaje)
+    if not outbox.add(clave, numero, mensaje):
         return False
-
-    try:
-        # Limpiar número (quitar + y espacios)
-        numero_limpio = numero.replace('+', '').replace(' ', '').replace('-', '')
-
-        # Agregar @s.whatsapp.net si no lo tiene
-        if '@' not in numero_limpio:
-            numero_limpio = f"{numero_limpio}@s.whatsapp.net"
-
-        # Preparar el payload
-        payload = {
-            "number": numero_limpio,
-            "text": mensaje
-        }
-
-        # Headers con API key
-        headers = {
-            'Content-Type': 'application/json',
-            'apikey': EVOLUTION_API_KEY
-        }
-
-        # URL del endpoint
-        url = f"{EVOLUTION_API_URL}/message/sendText/{EVOLUTION_INSTANCE}"
-
-        # Enviar mensaje
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-
-        if response.status_code == 201 or response.status_code == 200:
-            print(f"✅ WhatsApp enviado a {numero}: {response.json().get('key', {}).get('id', 'OK')}")
-            return True
-        else:
-            print(f"❌ Error al enviar WhatsApp a {numero}: {response.status_code} - {response.text}")
-            return False
-
-    except Exception as e:
-        print(f"❌ Error al enviar WhatsApp a {numero}: {str(e)}")
+    return despachar_outbox(clave, numero, mensaje)
+
+def enviar_resumenes(mensajes):
+    """
+    Guarda en el outbox varios mensajes [(clave, numero, mensaje)] en una
+    sola escritura y encola los nuevos; las claves repetidas no se reenvían
+    """
+    for clave, numero, mensaje in outbox.add_many(mensajes):
+        despachar_outbox(clave, numero, mensaje)
+
+# Claves del outbox que están en la cola de envío de este proceso: el barrido
+# renueva su reclamo mientras esperan, así no se reenvían por haber caducado
+outbox_en_vuelo = set()
+outbox_en_vuelo_lock = Lock()
+
+def despachar_outbox(clave, numero, mensaje):
+    """Envía un mensaje del outbox y anota el resultado al terminar"""
+    with outbox_en_vuelo_lock:
+        outbox_en_vuelo.add(clave)
+
+    def al_terminar(ok, detalle, reintentable):
+        with outbox_en_vuelo_lock:
+            outbox_en_vuelo.discard(clave)
+        if ok:
+            outbox.delivered(clave, detalle)
+        elif outbox.failed(clave, detalle, reintentable) == 'dead':
+            print(f"☠️ Mensaje {clave} a {numero} descartado: {detalle}")
+
+    if not whatsapp_sender.enqueue(numero, mensaje, al_terminar):
+        al_terminar(False, 'Evolution API no configurado', True)
         return False
+    return True
+
+def barrer_outbox():
+    """Reenvía los mensajes del outbox cuyo reintento ya toca o cuyo envío quedó huérfano"""
+    with outbox_en_vuelo_lock:
+        en_vuelo = list(outbox_en_vuelo)
+    if en_vuelo:
+        outbox.renew(en_vuelo)
+    pendientes = outbox.claim_due(OUTBOX_SWEEP_BATCH)
+    for clave, numero, mensaje in pendientes:
+        despachar_outbox(clave, numero, mensaje)
+    if pendientes:
+        print(f"📮 {len(pendientes)} mensaje(s) del outbox reenviados")
+    return len(pendientes)
 
 # ========== PROCESAMIENTO DE MENSAJES DE WHATSAPP ==========
 
 def procesar_con_ia(mensaje, tareas_usuario=[]):
     """Usa OpenAI para interpretar el mensaje del usuario de forma natural"""
     try:
-        from openai import OpenAI
-        import json
-        from datetime import datetime
-
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
+        if not os.getenv('OPENAI_API_KEY'):
             print("❌ ERROR CRÍTICO: OPENAI_API_KEY no encontrada en variables de entorno")
             print(f"📋 Variables disponibles: {', '.join(sorted(os.environ.keys()))}")
             return None
 
-        client = OpenAI(api_key=api_key)
-
-        # Contexto de tareas existentes
-        tareas_context = ""
-        if tareas_usuario:
-            tareas_context = "\n\nTareas actuales del usuario:\n"
-            for i, t in enumerate(tareas_usuario, 1):
-                tareas_context += f"{i}. {t['description']}"
-                if t.get('due_time'):
-                    tareas_context += f" - {t['due_time']}"
-                tareas_context += "\n"
-
-        prompt = f"""Eres un asistente de recordatorios por WhatsApp. Analiza el siguiente mensaje del usuario y extrae la información.
-
-Mensaje: "{mensaje}"
-Hora actual: {datetime.now().strftime('%Y-%m-%d %H:%M')}{tareas_context}
-
-Responde SOLO con un JSON con este formato:
-{{
-  "accion": "crear_tarea" | "ver_lista" | "completar_tarea" | "ayuda" | "desconocido",
-  "descripcion": "descripción de la tarea (sin la hora)",
-  "fecha": "YYYY-MM-DD o null",
-  "hora": "HH:MM o null",
-  "numero_tarea": número o null
-}}
-
-Ejemplos:
-- "Comprar pan a las 8:17" -> {{"accion": "crear_tarea", "descripcion": "Comprar pan", "fecha": "2025-11-26", "hora": "20:17", "numero_tarea": null}}
-- "llamar al doctor mañana 3pm" -> {{"accion": "crear_tarea", "descripcion": "llamar al doctor", "fecha": "2025-11-27", "hora": "15:00", "numero_tarea": null}}
-- "lista" -> {{"accion": "ver_lista", "descripcion": null, "fecha": null, "hora": null, "numero_tarea": null}}
-- "completar 1" -> {{"accion": "completar_tarea", "descripcion": null, "fecha": null, "hora": null, "numero_tarea": 1}}
-- "ayuda" -> {{"accion": "ayuda", "descripcion": null, "fecha": null, "hora": null, "numero_tarea": null}}
-
-Responde SOLO el JSON, nada más."""
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=500
-        )
-
-        respuesta = response.choices[0].message.content.strip()
-        # Limpiar markdown si lo tiene
-        if respuesta.startswith('```'):
-            respuesta = respuesta.split('\n', 1)[1]
-            respuesta = respuesta.rsplit('\n```', 1)[0]
-
-        return json.loads(respuesta)
+        respuesta = completar(construir_prompt(mensaje, tareas_usuario))
+        return json.loads(limpiar_json(respuesta))
 
     except Exception as e:
         print(f"⚠️ Error en IA: {str(e)}")
@@ -506,49 +1011,23 @@ Responde SOLO el JSON, nada más."""
         traceback.print_exc()
         return None
 
-def extraer_hora_fecha(texto):
-    """Extrae hora y fecha de un texto usando expresiones regulares y dateparser"""
-    import re
-    from dateutil import parser as date_parser
-    import dateparser
-
-    # Patrones de hora comunes
-    patrones_hora = [
-        r'(\d{1,2}):(\d{2})\s*(am|pm)?',  # 3:00pm, 15:30
-        r'(\d{1,2})\s*(am|pm)',            # 3pm, 3 pm
-        r'a las (\d{1,2})',                # a las 3
-        r'(\d{1,2})h',                     # 15h
-    ]
-
-    hora_encontrada = None
-    fecha_encontrada = None
-
-    # Buscar hora en el texto
-    for patron in patrones_hora:
-        match = re.search(patron, texto.lower())
-        if match:
-            try:
-                hora_str = match.group(0)
-                # Intentar parsear la hora
-                fecha_hora = dateparser.parse(hora_str, settings={'PREFER_DATES_FROM': 'future'})
-                if fecha_hora:
-                    hora_encontrada = fecha_hora.strftime('%H:%M')
-                    fecha_encontrada = fecha_hora.strftime('%Y-%m-%d')
-                    break
-            except:
-                continue
+ai_cache = ResponseCache()
 
-    # Si no encontró hora, intentar con dateparser en todo el texto
-    if not hora_encontrada:
-        try:
-            fecha_hora = dateparser.parse(texto, settings={'PREFER_DATES_FROM': 'future', 'PREFER_DAY_OF_MONTH': 'current'})
-            if fecha_hora:
-                hora_encontrada = fecha_hora.strftime('%H:%M')
-                fecha_encontrada = fecha_hora.strftime('%Y-%m-%d')
-        except:
-            pass
+# Con AI_BATCH_WINDOW_MS > 0 los mensajes simultáneos se interpretan en una sola petición
+ai_batcher = IntentBatcher(procesar_con_ia)
+
+# Las respuestas cacheadas de un usuario dejan de valer cuando cambian sus tareas
+task_manager.listeners.append(lambda user_id, task_id, task: ai_cache.invalidate(user_id))
 
-    return fecha_encontrada, hora_encontrada
+def procesar_con_ia_cache(user_id, mensaje, tareas_usuario):
+    """procesar_con_ia con caché por mensaje normalizado, minuto y tareas pendientes"""
+    key = ai_cache.key(user_id, mensaje, tareas_usuario)
+    respuesta = ai_cache.get(key)
+    if respuesta is None:
+        respuesta = ai_batcher.submit(mensaje, tareas_usuario)
+        if respuesta:
+            ai_cache.put(key, respuesta)
+    return dict(respuesta) if respuesta else None
 
 def procesar_mensaje_whatsapp(numero_remitente, mensaje):
     """Procesa mensajes entrantes de WhatsApp"""
@@ -556,12 +1035,7 @@ def procesar_mensaje_whatsapp(numero_remitente, mensaje):
     numero_limpio = numero_remitente.replace('@s.whatsapp.net', '').replace('@c.us', '')
 
     # Buscar usuario por número de WhatsApp
-    user = None
-    for u in user_manager.users:
-        user_number = u.get('whatsapp_number', '').replace('+', '').replace(' ', '').replace('-', '')
-        if numero_limpio in user_number or user_number in numero_limpio:
-            user = u
-            break
+    user = user_manager.find_by_whatsapp(numero_limpio)
 
     # Si no existe el usuario, crear uno automáticamente
     if not user:
@@ -574,10 +1048,7 @@ def procesar_mensaje_whatsapp(numero_remitente, mensaje):
 
         if error:
             # Si ya existe (no debería pasar), buscar por número
-            for u in user_manager.users:
-                if u.get('username') == numero_limpio:
-                    user = u
-                    break
+            user = user_manager.get_user(numero_limpio)
 
         # Enviar mensaje de bienvenida
         enviar_whatsapp(numero_remitente, """👋 ¡Bienvenido al bot de recordatorios!
@@ -600,19 +1071,28 @@ Escribe "ayuda" para más comandos.""")
         # Continuar procesando el mensaje
         pass
 
-    # ===== INTENTAR PROCESAR CON IA PRIMERO =====
+    # ===== COMANDOS INEQUÍVOCOS EN LOCAL, EL RESTO CON IA =====
     tareas_usuario = task_manager.get_pending_tasks(user['id'])
-    ia_response = procesar_con_ia(mensaje, tareas_usuario)
+    ia_response = clasificar_local(mensaje)
+    if ia_response:
+        registrar('local')
+    else:
+        registrar('remote')
+        ia_response = procesar_con_ia_cache(user['id'], mensaje, tareas_usuario)
+        if ia_response:
+            print(f"🤖 IA procesó: {ia_response}")
 
     if ia_response:
-        print(f"🤖 IA procesó: {ia_response}")
 
         # Crear tarea
         if ia_response['accion'] == 'crear_tarea' and ia_response['descripcion']:
             if not ia_response['hora']:
                 return enviar_whatsapp(numero_remitente, "❌ No pude detectar la hora. Por favor incluye una hora clara.\nEjemplo: Comprar pan a las 3pm")
 
-            task = task_manager.add_task(user['id'], ia_response['descripcion'], ia_response['fecha'], ia_response['hora'])
+            try:
+                task_manager.add_task(user['id'], ia_response['descripcion'], ia_response['fecha'], ia_response['hora'])
+            except ValueError:
+                return enviar_whatsapp(numero_remitente, "❌ La fecha u hora no es válida. Ejemplo: Comprar pan a las 3pm")
 
             respuesta = f"✅ *Tarea creada:*\n\n"
             respuesta += f"📝 {ia_response['descripcion']}\n"
@@ -737,16 +1217,14 @@ Escribe: ayuda"""
         if not hora:
             return enviar_whatsapp(numero_remitente, "❌ No pude detectar la hora. Por favor incluye una hora clara.\nEjemplo: Comprar pan a las 3pm listo")
 
-        # Crear la tarea sin la hora en la descripción
-        descripcion_limpia = texto_tarea
-        # Intentar limpiar la descripción eliminando patrones de hora
-        import re
-        descripcion_limpia = re.sub(r'\s*(a las|a la|al|en)\s*\d{1,2}(:\d{2})?\s*(am|pm|h)?\s*', ' ', descripcion_limpia, flags=re.IGNORECASE)
-        descripcion_limpia = re.sub(r'\d{1,2}:\d{2}', '', descripcion_limpia)
-        descripcion_limpia = descripcion_limpia.strip()
+        # Crear la tarea sin la fecha ni la hora en la descripción
+        descripcion_limpia = limpiar_descripcion(texto_tarea) or texto_tarea
 
         # Crear la tarea
-        task = task_manager.add_task(user['id'], descripcion_limpia, fecha, hora)
+        try:
+            task_manager.add_task(user['id'], descripcion_limpia, fecha, hora)
+        except ValueError:
+            return enviar_whatsapp(numero_remitente, "❌ La fecha u hora no es válida. Ejemplo: Comprar pan a las 3pm listo")
 
         respuesta = f"✅ *Tarea creada:*\n\n"
         respuesta += f"📝 {descripcion_limpia}\n"
@@ -774,6 +1252,9 @@ completar 1
 Escribe "ayuda" para más info."""
     return enviar_whatsapp(numero_remitente, respuesta)
 
+# Un mismo remitente siempre cae en el mismo worker: sus mensajes se procesan en orden
+inbound_pool = KeyedWorkerPool(procesar_mensaje_whatsapp, INBOUND_WORKERS, INBOUND_QUEUE_SIZE, name='webhook')
+
 @app.route('/webhook/whatsapp', methods=['POST'])
 def webhook_whatsapp():
     """Webhook para recibir mensajes de WhatsApp desde Evolution API"""
@@ -803,10 +1284,13 @@ def webhook_whatsapp():
 
         print(f"📱 Mensaje de {numero_remitente}: {texto_mensaje}")
 
-        # Procesar el mensaje en un thread separado para no bloquear el webhook
-        from threading import Thread
-        thread = Thread(target=procesar_mensaje_whatsapp, args=(numero_remitente, texto_mensaje))
-        thread.start()
+        # Con varias instancias, las respuestas salen por la que recibió el mensaje
+        whatsapp_sender.instances.pin(normalizar_destino(numero_remitente), data.get('instance'))
+
+        # Encolar para no bloquear el webhook; si la cola está llena, que Evolution reintente
+        if not inbound_pool.submit(numero_remitente, numero_remitente, texto_mensaje, block=False):
+            print(f"⚠️ Cola de mensajes llena, rechazando mensaje de {numero_remitente}")
+            return jsonify({'success': False, 'error': 'Too many messages'}), 429, {'Retry-After': '5'}
 
         return jsonify({'success': True, 'message': 'Processing'}), 200
 
@@ -832,50 +1316,264 @@ def health_openai():
         'openai_key_configured': has_key,
         'openai_library_installed': has_lib,
         'key_preview': api_key[:20] + '...' if api_key else None,
+        'intents': dict(intent_stats),
+        'cache': ai_cache.metrics(),
+        'batching': ai_batcher.metrics(),
         'status': 'OK' if (has_key and has_lib) else 'ERROR'
     })
 
+@app.route('/api/health/queues', methods=['GET'])
+def health_queues():
+    """Métricas de las colas de mensajes entrantes y salientes"""
+    return jsonify({
+        'inbound': inbound_pool.metrics(),
+        'outbound': {**whatsapp_sender.pool.metrics(), **whatsapp_sender.stats, 'delayed': whatsapp_sender.delayed()},
+        'outbox': outbox.metrics(),
+        'throttle': whatsapp_sender.limiter.metrics(),
+        'instances': whatsapp_sender.instances.metrics(),
+        'events': event_bus.metrics(),
+        'reminders': reminder_policy.metrics()
+    })
+
+@app.route('/api/admin/outbox/dead', methods=['GET'])
+@admin_required
+def admin_outbox_dead():
+    """Mensajes del outbox que agotaron sus intentos, los más recientes primero"""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    return jsonify({'success': True, 'dead': outbox.dead_letters(limit)})
+
+@app.route('/api/admin/outbox/revive', methods=['POST'])
+@admin_required
+def admin_outbox_revive():
+    """Devuelve a la cola un mensaje muerto ({"key": ...}) o todos (sin key)"""
+    data = request.get_json(silent=True) or {}
+    revividos = outbox.revive(data.get('key'))
+    print(f"📮 {revividos} mensaje(s) muertos devueltos al outbox")
+    return jsonify({'success': True, 'revived': revividos})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """
+    Listo para recibir tráfico HTTP: 200 cuando el servidor acepta peticiones,
+    503 mientras tanto. El planificador no cuenta (puede correr en otro
+    proceso o esperar su lease); su estado va aparte, en 'scheduler'
+    """
+    estado = startup.estado()
+    return jsonify(estado), 200 if estado['ready'] else 503
+
 # ========== SERVIDOR ==========
 
+servidor_escuchando = Event()
+
 def iniciar_servidor():
-    """Inicia el servidor Flask"""
+    """Inicia el servidor Flask y avisa en cuanto el puerto está abierto"""
+    from werkzeug.serving import make_server
+
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    server = make_server('0.0.0.0', port, app, threaded=True)
+    servidor_escuchando.set()
+    server.serve_forever()
+
+# ========== PROCESOS: WEB, PLANIFICADOR O AMBOS ==========
+
+# auto: con JSON el planificador corre dentro del proceso web (los datos viven en
+# su memoria); con SQLite corre aparte: python reminder_bot_auth.py --scheduler
+RUN_SCHEDULER = os.getenv('RUN_SCHEDULER', 'auto')
+# Cada cuánto relee la base el planificador para ver tareas creadas por otros procesos
+SCHEDULER_SYNC_SECONDS = int(os.getenv('SCHEDULER_SYNC_SECONDS', 15))
+# Procesos planificadores que lanza --scheduler (con SQLite); se reparten los shards
+SCHEDULER_PROCESSES = int(os.getenv('SCHEDULER_PROCESSES', 1))
+
+def crear_lease():
+    """Lease del planificador sobre el almacenamiento compartido"""
+    if PLANIFICADOR_POR_SHARDS:
+        return ShardLeases(db, SCHEDULER_SHARDS)
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteLease(db)
+    return FileLease(TASKS_FILE + '.scheduler.lock')
+
+def bucle_recordatorios():
+    """
+    Dispara recordatorios mientras este proceso tenga el lease del planificador
+    (o alguno de sus shards); si otro proceso lo tiene, espera a que quede libre.
+    """
+    global shards_propios
+    lease = crear_lease()
+    sincronizar = STORAGE_BACKEND == 'sqlite'
+    espera = min(SCHEDULER_SYNC_SECONDS, SCHEDULER_LEASE_SECONDS / 3)
+    activo = False
+    proxima_sync = 0
+    proximo_barrido = 0
+
+    # Archivar tareas completadas antiguas una vez al día
+    schedule.every().day.at("03:00").do(archivar_tareas)
+    schedule.every().hour.do(outbox.purge)
+
+    startup.marcar_planificador('waiting')
+    try:
+        while True:
+            tomado = lease.acquire()
+            if not tomado:
+                if activo:
+                    print("⏸️ Otro proceso tomó el planificador")
+                    startup.marcar_planificador('waiting')
+                    activo = False
+                shards_propios = frozenset()
+                reminder_scheduler.clear()
+                time.sleep(espera)
+                continue
+            propios = tomado if PLANIFICADOR_POR_SHARDS else None
+            if propios != shards_propios:
+                # Antes de disparar nada: fuera los recordatorios de shards perdidos
+                shards_propios = propios
+                activo = False
+
+            if not activo or (sincronizar and time.time() >= proxima_sync):
+                nuevas = cargar_recordatorios()
+                proxima_sync = time.time() + SCHEDULER_SYNC_SECONDS
+                if not activo:
+                    shards = f" (shards {sorted(shards_propios)} de {SCHEDULER_SHARDS})" if PLANIFICADOR_POR_SHARDS else ""
+                    print(f"📌 Planificador activo en este proceso{shards}: "
+                          f"{len(reminder_scheduler)} recordatorio(s) programados")
+                    startup.marcar_planificador('active', len(reminder_scheduler))
+                    activo = True
+                elif nuevas:
+                    print(f"📌 {nuevas} recordatorio(s) nuevos desde la base")
+
+            reminder_scheduler.wait_next(max_wait=min(espera, OUTBOX_SWEEP_SECONDS))
+            enviar_recordatorios()
+            if time.time() >= proximo_barrido:
+                barrer_outbox()
+                proximo_barrido = time.time() + OUTBOX_SWEEP_SECONDS
+            schedule.run_pending()
+    finally:
+        # Parada ordenada: los demás procesos retoman sus shards sin esperar a que caduquen
+        lease.release()
+
+def supervisar_planificadores(procesos):
+    """
+    Lanza `procesos` planificadores hijos, que se reparten los shards, y
+    relanza los que mueren; mientras tanto los demás retoman sus shards
+    cuando caduca el lease (SCHEDULER_LEASE_SECONDS)
+    """
+    import sys
+    import signal
+    import subprocess
+
+    comando = [sys.executable, os.path.abspath(sys.argv[0]), '--scheduler']
+    entorno = {**os.environ, 'SCHEDULER_PROCESSES': '1'}
+    hijos = [None] * procesos
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            for n, hijo in enumerate(hijos):
+                if hijo is not None and hijo.poll() is None:
+                    continue
+                if hijo is not None:
+                    print(f"⚠️ Planificador {n} (pid {hijo.pid}) terminó con código {hijo.returncode}; se relanza")
+                hijos[n] = subprocess.Popen(comando, env=entorno)
+            time.sleep(1)
+    finally:
+        for hijo in hijos:
+            if hijo is not None and hijo.poll() is None:
+                hijo.terminate()
+        for hijo in hijos:
+            if hijo is not None:
+                hijo.wait(timeout=SCHEDULER_LEASE_SECONDS)
+
+def precalentar():
+    """Carga openai y dateparser en segundo plano antes del primer mensaje"""
+    startup.calentar([
+        ('openai', ai_client.precalentar),
+        ('dateparser', time_parser.precalentar)
+    ])
+
+def create_app():
+    """
+    Aplicación WSGI para gunicorn (ver wsgi.py). El planificador corre en un
+    hilo de este proceso según RUN_SCHEDULER; con varios workers el lease
+    garantiza que solo uno dispare recordatorios.
+    """
+    if RUN_SCHEDULER == '1' or (RUN_SCHEDULER == 'auto' and STORAGE_BACKEND != 'sqlite'):
+        Thread(target=bucle_recordatorios, daemon=True, name='scheduler').start()
+    precalentar()
+    startup.marcar('app creada')
+    startup.listo.set()
+    return app
+
+def main_scheduler():
+    """Proceso que solo dispara recordatorios, junto a los workers web de gunicorn"""
+    import sys
+    import signal
+
+    if STORAGE_BACKEND != 'sqlite':
+        print("❌ --scheduler requiere STORAGE_BACKEND=sqlite y la misma base que el proceso web.\n"
+              "   Con JSON las tareas viven en la memoria del proceso web y el planificador corre\n"
+              "   dentro de él (RUN_SCHEDULER=auto); no hace falta un proceso aparte.", file=sys.stderr)
+        return 1
+
+    print("=" * 60)
+    print("⏰ PLANIFICADOR DE RECORDATORIOS")
+    print("=" * 60)
+    print(f"🗄️ Base: {os.path.abspath(db.path)} ({user_manager.count_users()} usuario(s))")
+    if not user_manager.count_users():
+        # Un worker en otro contenedor (Heroku, Render) abre su propia base vacía
+        print("⚠️ La base no tiene usuarios: el proceso web debe usar este mismo archivo "
+              "(mismo disco o volumen); si no, usa RUN_SCHEDULER=1 en el proceso web")
+    print(f"⏰ Recordatorios: a la hora de cada tarea; {reminder_policy.describir()}")
+    print(f"🔄 Sincronización con la base cada {SCHEDULER_SYNC_SECONDS} s")
+    if PLANIFICADOR_POR_SHARDS:
+        procesos = f" repartidos entre {SCHEDULER_PROCESSES} procesos" if SCHEDULER_PROCESSES > 1 else ""
+        print(f"🧩 {SCHEDULER_SHARDS} shards de usuarios{procesos}")
+    print()
+
+    try:
+        if SCHEDULER_PROCESSES > 1:
+            supervisar_planificadores(SCHEDULER_PROCESSES)
+        else:
+            # terminate() del supervisor o de systemd: salir soltando los leases
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            bucle_recordatorios()
+    except KeyboardInterrupt:
+        print("\n\n👋 Planificador detenido.")
+    return 0
 
 def main():
-    """Función principal"""
+    """Función principal: servidor de desarrollo y planificador en un solo proceso"""
     import sys
     import io
 
     if sys.platform == 'win32':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+    if '--scheduler' in sys.argv:
+        sys.exit(main_scheduler())
+
     print("=" * 60)
     print("🔐 BOT DE RECORDATORIOS CON AUTENTICACIÓN")
     print("=" * 60)
 
-    print(f"\n👥 Usuarios registrados: {len(user_manager.users)}")
-    print(f"⏰ Frecuencia de recordatorios: Cada 30 minutos")
+    print(f"\n👥 Usuarios registrados: {user_manager.count_users()}")
+    print(f"⏰ Recordatorios: a la hora de cada tarea; {reminder_policy.describir()}")
     print("\n🚀 Servidor iniciado. Presiona Ctrl+C para detener.\n")
 
     # Iniciar servidor en thread separado
     server_thread = Thread(target=iniciar_servidor, daemon=True)
     server_thread.start()
 
-    time.sleep(2)
+    precalentar()
 
-    # Programar recordatorios cada 5 minutos (para pruebas rápidas)
-    # Puedes cambiar a 30 minutos con: schedule.every(30).minutes.do(enviar_recordatorios)
-    schedule.every(5).minutes.do(enviar_recordatorios)
+    if not servidor_escuchando.wait(timeout=30):
+        print("⚠️ El servidor no abrió el puerto en 30 segundos")
+        return
+    startup.marcar('servidor escuchando')
+    startup.listo.set()
+    print(f"✅ Listo en {startup.segundos_desde_inicio():.2f} s")
+    startup.informe()
 
-    # Enviar recordatorio inicial después de 30 segundos
-    schedule.every(30).seconds.do(enviar_recordatorios)
-
-    # Bucle principal
+    # Bucle principal: dormir hasta el próximo vencimiento
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        bucle_recordatorios()
     except KeyboardInterrupt:
         print("\n\n👋 Bot detenido. ¡Hasta luego!")
 
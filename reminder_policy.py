@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Política de recordatorios: escalado con backoff y resúmenes por usuario
+Cada tarea vencida se vuelve a recordar con esperas crecientes (5m, 15m,
+1h, 4h, 1d... el último paso se repite) en vez de cada 5 minutos para
+siempre. Además cada usuario recibe como mucho un mensaje por ventana:
+lo que vence dentro de la ventana espera y sale junto en el siguiente.
+"""
+
+import os
+import re
+from functools import lru_cache
+from threading import Lock
+
+# Esperas tras cada recordatorio; el último paso se repite
+REMINDER_BACKOFF = os.getenv('REMINDER_BACKOFF', '5m,15m,1h,4h,1d')
+# Recordatorios como máximo por tarea (0 = sin límite)
+REMINDER_MAX_COUNT = int(os.getenv('REMINDER_MAX_COUNT', 0))
+# Separación mínima entre dos mensajes de recordatorio al mismo usuario
+REMINDER_DIGEST_SECONDS = int(os.getenv('REMINDER_DIGEST_SECONDS', 300))
+# Tareas listadas en un resumen; el resto se resume en una línea
+REMINDER_DIGEST_MAX_TASKS = int(os.getenv('REMINDER_DIGEST_MAX_TASKS', 20))
+
+UNIDADES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+PATRON_PASO = re.compile(r'^\s*(\d+)\s*([smhd]?)\s*$', re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def parse_backoff(texto):
+    """'5m,15m,1h,1d' -> (300, 900, 3600, 86400); sin unidad son minutos. ValueError si no es válido"""
+    pasos = []
+    for parte in str(texto).split(','):
+        match = PATRON_PASO.match(parte)
+        if not match or int(match.group(1)) <= 0:
+            raise ValueError(f"Paso de backoff inválido: {parte!r}")
+        pasos.append(int(match.group(1)) * UNIDADES[(match.group(2) or 'm').lower()])
+    return tuple(pasos)
+
+
+def describir_backoff(pasos):
+    """(300, 900, 3600) -> '5m, 15m, 1h'"""
+    def paso(segundos):
+        for unidad in ('d', 'h', 'm'):
+            if segundos % UNIDADES[unidad] == 0:
+                return f"{segundos // UNIDADES[unidad]}{unidad}"
+        return f"{segundos}s"
+    return ', '.join(paso(s) for s in pasos)
+
+
+def urgencia(count):
+    """Etiqueta de urgencia según los recordatorios ya enviados"""
+    if count > 5:
+        return "🔴 MUY URGENTE ", "MUY URGENTE"
+    if count > 3:
+        return "🟠 URGENTE ", "URGENTE"
+    if count > 1:
+        return "🟡 IMPORTANTE ", "IMPORTANTE"
+    return "", ""
+
+
+def componer_resumen(username, tasks, max_tasks=REMINDER_DIGEST_MAX_TASKS):
+    """Mensaje de WhatsApp con los recordatorios de un usuario, los más urgentes primero"""
+    ordenadas = sorted(tasks, key=lambda t: (-t.get('reminder_count', 1), t['id']))
+    lineas = [f"⏰ *RECORDATORIOS - {username}*", ""]
+    for task in ordenadas[:max_tasks]:
+        count = task.get('reminder_count', 1)
+        prefijo, texto = urgencia(count)
+        if texto:
+            lineas.append(f"{prefijo}*{texto}*")
+        lineas.append(f"#{task['id']}: {task['description']}")
+        if task.get('due_date'):
+            fecha = f"📅 {task['due_date']}"
+            if task.get('due_time'):
+                fecha += f" ⏰ {task['due_time']}"
+            lineas.append(fecha)
+        lineas.extend([f"(Recordatorio #{count})", ""])
+    if len(ordenadas) > max_tasks:
+        lineas.extend([f"… y {len(ordenadas) - max_tasks} tarea(s) más", ""])
+    lineas.extend([f"📊 Total: {len(tasks)} tarea(s) pendiente(s)", "",
+                   "💡 Completa las tareas en la app para dejar de recibir recordatorios."])
+    return '\n'.join(lineas)
+
+
+class ReminderPolicy:
+    """Cuándo repetir el recordatorio de cada tarea y cuándo puede escribirse a cada usuario"""
+
+    def __init__(self, backoff=REMINDER_BACKOFF, max_count=REMINDER_MAX_COUNT,
+                 digest_seconds=REMINDER_DIGEST_SECONDS):
+        self.backoff = parse_backoff(backoff)
+        self.max_count = max_count
+        self.digest_seconds = digest_seconds
+        self._last_sent = {}    # user_id -> momento del último mensaje
+        self._lock = Lock()
+        self.stats = {'messages': 0, 'reminders': 0, 'deferred': 0}
+
+    def delay(self, task):
+        """Espera tras el último recordatorio de la tarea según cuántos lleva"""
+        pasos = parse_backoff(task['reminder_backoff']) if task.get('reminder_backoff') else self.backoff
+        count = max(task.get('reminder_count') or 0, 1)
+        return pasos[min(count, len(pasos)) - 1]
+
+    def next_fire_ts(self, task):
+        """Próximo recordatorio de una tarea pendiente; None si no tiene fecha o llegó al máximo"""
+        if task.get('due_ts') is None:
+            return None
+        count = task.get('reminder_count') or 0
+        if self.max_count and count >= self.max_count:
+            return None
+        if count == 0 or task.get('last_reminder_ts') is None:
+            return task['due_ts']
+        return max(task['due_ts'], task['last_reminder_ts'] + self.delay(task))
+
+    def digest_wait(self, user_id, now_ts):
+        """Segundos hasta que se pueda enviar otro mensaje al usuario (0 si ya se puede)"""
+        with self._lock:
+            ultimo = self._last_sent.get(str(user_id))
+        if ultimo is None:
+            return 0
+        return max(0, ultimo + self.digest_seconds - now_ts)
+
+    def defer(self, count):
+        with self._lock:
+            self.stats['deferred'] += count
+
+    def sent(self, user_id, now_ts, count):
+        """Registra un mensaje con `count` recordatorios enviado al usuario"""
+        with self._lock:
+            self._last_sent[str(user_id)] = now_ts
+            self.stats['messages'] += 1
+            self.stats['reminders'] += count
+            # Sin crecer sin límite: fuera de la ventana ya no hace falta recordarlo
+            if len(self._last_sent) > 10000:
+                limite = now_ts - self.digest_seconds
+                self._last_sent = {u: t for u, t in self._last_sent.items() if t > limite}
+
+    def describir(self):
+        texto = f"backoff {describir_backoff(self.backoff)}"
+        if self.max_count:
+            texto += f", máximo {self.max_count} por tarea"
+        if self.digest_seconds:
+            texto += f", un resumen por usuario cada {self.digest_seconds} s como mucho"
+        return texto
+
+    def metrics(self):
+        with self._lock:
+            return {**self.stats, 'backoff': describir_backoff(self.backoff),
+                    'max_count': self.max_count, 'digest_seconds': self.digest_seconds}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Planificador de recordatorios basado en un min-heap
+Cada tarea pendiente con fecha tiene una entrada (momento de disparo,
+usuario, tarea); el bucle principal duerme hasta la próxima entrada y
+solo toca las tareas que realmente vencieron.
+"""
+
+import time
+import heapq
+import itertools
+from datetime import datetime
+from threading import Condition
+
+# Espera máxima entre revisiones aunque no haya nada programado
+MAX_IDLE_SECONDS = 60
+
+
+def parse_due_ts(due_date, due_time=None):
+    """
+    Epoch (segundos) de vencimiento a partir de due_date (YYYY-MM-DD) y
+    due_time (HH:MM). None si no hay fecha; ValueError si el formato es inválido.
+    """
+    if not due_date:
+        return None
+    if due_time:
+        due = datetime.strptime(f"{due_date} {due_time}", '%Y-%m-%d %H:%M')
+    else:
+        # Solo fecha: vence al inicio del día
+        due = datetime.strptime(due_date, '%Y-%m-%d')
+    return int(due.timestamp())
+
+
+def calcular_due_ts(task):
+    """Como parse_due_ts, pero tolerante: None para tareas con fecha inválida"""
+    try:
+        return parse_due_ts(task.get('due_date'), task.get('due_time'))
+    except (ValueError, TypeError):
+        return None
+
+
+class ReminderScheduler:
+    """Cola de prioridad de (momento de disparo, usuario, tarea)"""
+
+    def __init__(self):
+        self._heap = []
+        # (user_id, task_id) -> momento de disparo vigente; las entradas del
+        # heap que no coinciden están obsoletas y se descartan al salir
+        self._entries = {}
+        self._seq = itertools.count()
+        self._cond = Condition()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, user_id, task_id, fire_ts):
+        """Programa (o reprograma) el recordatorio de una tarea"""
+        key = (str(user_id), task_id)
+        with self._cond:
+            self._entries[key] = fire_ts
+            heapq.heappush(self._heap, (fire_ts, next(self._seq), key))
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._rebuild()
+            # Despertar al bucle si esta entrada es ahora la más próxima
+            if self._heap[0][2] == key:
+                self._cond.notify_all()
+
+    def cancel(self, user_id, task_id):
+        """Quita una tarea del planificador (completada o eliminada)"""
+        with self._cond:
+            self._entries.pop((str(user_id), task_id), None)
+
+    def clear(self):
+        """Vacía el planificador (este proceso dejó de tener el lease)"""
+        with self._cond:
+            self._entries.clear()
+            self._heap = []
+
+    def sync(self, scheduled):
+        """
+        Alinea el planificador con las tareas pendientes [(user_id, task_id, due_ts)]
+        leídas de la base: agrega las nuevas y quita las que ya no están. Las que
+        ya estaban conservan su momento de disparo (p. ej. una repetición).
+        """
+        vigentes = {(str(user_id), task_id): due_ts for user_id, task_id, due_ts in scheduled}
+        with self._cond:
+            nuevas = [(key, due_ts) for key, due_ts in vigentes.items() if key not in self._entries]
+            for key in [key for key in self._entries if key not in vigentes]:
+                del self._entries[key]
+        for (user_id, task_id), due_ts in nuevas:
+            self.schedule(user_id, task_id, due_ts)
+        return len(nuevas)
+
+    def _rebuild(self):
+        # Descarta las entradas obsoletas acumuladas por cancelaciones
+        self._heap = [entry for entry in self._heap if self._entries.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
+
+    def pop_due(self, now_ts=None):
+        """Saca todas las entradas vencidas: lista de (user_id, task_id)"""
+        now_ts = time.time() if now_ts is None else now_ts
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now_ts:
+                fire_ts, _, key = heapq.heappop(self._heap)
+                if self._entries.get(key) == fire_ts:
+                    del self._entries[key]
+                    due.append(key)
+        return due
+
+    def next_fire_ts(self):
+        """Momento de la próxima entrada vigente (None si no hay)"""
+        with self._cond:
+            while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def wait_next(self, max_wait=MAX_IDLE_SECONDS):
+        """Duerme hasta la próxima entrada, un cambio en el heap o max_wait"""
+        with self._cond:
+            next_ts = self.next_fire_ts()
+            timeout = max_wait if next_ts is None else min(max_wait, next_ts - time.time())
+            if timeout > 0:
+                self._cond.wait(timeout)
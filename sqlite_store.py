@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+Backend SQLite para usuarios y tareas
+Mismas firmas que UserManager/TaskManager de reminder_bot_auth.py, pero
+sin cargar todo en memoria: cada consulta usa índices de la base.
+Se activa con STORAGE_BACKEND=sqlite.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from scheduler import parse_due_ts
+from delivery import normalizar_e164
+from versions import nueva_epoca, formatear_version, parsear_version
+from task_index import SIN_FECHA, normalizar_filtros, formatear_cursor, parsear_cursor
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'reminderbot.db')
+
+# Clave de orden por vencimiento (sin fecha al final); los índices usan la misma expresión
+CLAVE_VENCIMIENTO = f"IFNULL(due_ts, {SIN_FECHA})"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    whatsapp_number TEXT,
+    whatsapp_e164 TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_e164 ON users (whatsapp_e164);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    user_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    due_ts INTEGER,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_id ON tasks (user_id, completed, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_due ON tasks (user_id, {CLAVE_VENCIMIENTO}, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_due ON tasks (user_id, completed, {CLAVE_VENCIMIENTO}, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (completed, due_ts);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_version ON tasks (user_id, version);
+
+CREATE TABLE IF NOT EXISTS task_counters (
+    user_id INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+
+-- Versión por usuario y tareas eliminadas, para las respuestas incrementales
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS task_tombstones (
+    user_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+
+-- Contadores por usuario, mantenidos en cada escritura
+CREATE TABLE IF NOT EXISTS task_counts (
+    user_id INTEGER PRIMARY KEY,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteDatabase:
+    """Conexión por hilo a una base SQLite en modo WAL"""
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        # La época identifica esta base: los tokens de versión de otra no valen
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (nueva_epoca(),))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: las transacciones se abren explícitamente
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transacción de escritura (BEGIN IMMEDIATE): toma el lock de escritura
+        antes de leer, así los read-modify-write concurrentes no se pisan
+        """
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    @contextmanager
+    def read_transaction(self):
+        """Transacción de lectura: varias consultas ven la misma instantánea"""
+        conn = self.connect()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+
+class SQLiteUserManager:
+    """Gestor de usuarios sobre SQLite"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def hash_password(self, password):
+        """Hash de contraseña"""
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    def _row_to_user(self, row):
+        if not row:
+            return None
+        user = dict(row)
+        user.pop('whatsapp_e164', None)
+        return user
+
+    def register(self, username, password, whatsapp_number):
+        """Registra un nuevo usuario"""
+        user = {
+            'username': username,
+            'password': self.hash_password(password),
+            'whatsapp_number': whatsapp_number,
+            'created_at': datetime.now().isoformat()
+        }
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password, whatsapp_number, whatsapp_e164, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (user['username'], user['password'], user['whatsapp_number'],
+                     normalizar_e164(whatsapp_number or ''), user['created_at'])
+                )
+        except sqlite3.IntegrityError:
+            return None, "El usuario ya existe"
+        user['id'] = cursor.lastrowid
+        return user, None
+
+    def login(self, username, password):
+        """Valida credenciales de usuario"""
+        user = self.get_user(username)
+        if user and user['password'] == self.hash_password(password):
+            return user
+        return None
+
+    def get_user(self, username):
+        """Obtiene un usuario por nombre"""
+        row = self.db.connect().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return self._row_to_user(row)
+
+    def get_user_by_id(self, user_id):
+        """Obtiene un usuario por id"""
+        row = self.db.connect().execute('SELECT * FROM users WHERE id = ?', (int(user_id),)).fetchone()
+        return self._row_to_user(row)
+
+    def find_by_whatsapp(self, numero):
+        """Busca un usuario por número de WhatsApp (coincidencia exacta en E.164)"""
+        numero = normalizar_e164(numero)
+        if not numero:
+            return None
+        row = self.db.connect().execute(
+            'SELECT * FROM users WHERE whatsapp_e164 = ? ORDER BY id LIMIT 1', (numero,)
+        ).fetchone()
+        return self._row_to_user(row)
+
+    def count_users(self):
+        """Número de usuarios registrados"""
+        return self.db.connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+
+class SQLiteTaskManager:
+    """Gestor de tareas por usuario sobre SQLite"""
+
+    def __init__(self, db):
+        self.db = db
+        # Funciones listener(user_id, task_id, task) avisadas en cada cambio;
+        # task es None cuando la tarea se eliminó
+        self.listeners = []
+        self._shard_indexes = set()
+
+    def _notify(self, user_id, task_id, task):
+        for listener in self.listeners:
+            listener(str(user_id), task_id, task)
+
+    def _fetch(self, sql, params):
+        rows = self.db.connect().execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def _bump_version(self, conn, user_id):
+        """Sube y devuelve la versión de las tareas del usuario (dentro de la transacción)"""
+        conn.execute(
+            'INSERT INTO user_versions (user_id, version) VALUES (?, 1) '
+            'ON CONFLICT(user_id) DO UPDATE SET version = version + 1',
+            (int(user_id),)
+        )
+        return self._current_version(conn, user_id)
+
+    def _current_version(self, conn, user_id):
+        row = conn.execute('SELECT version FROM user_versions WHERE user_id = ?', (int(user_id),)).fetchone()
+        return row[0] if row else 0
+
+    def _count(self, conn, user_id, total, completed):
+        """Ajusta los contadores del usuario (dentro de la transacción)"""
+        if total or completed:
+            conn.execute(
+                'INSERT INTO task_counts (user_id, total, completed) VALUES (?, ?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET total = total + excluded.total, '
+                'completed = completed + excluded.completed',
+                (int(user_id), total, completed)
+            )
+
+    def _write(self, conn, user_id, task):
+        anterior = conn.execute(
+            'SELECT completed FROM tasks WHERE user_id = ? AND id = ?', (int(user_id), task['id'])
+        ).fetchone()
+        self._count(conn, user_id, 0 if anterior else 1,
+                    int(bool(task['completed'])) - (anterior[0] if anterior else 0))
+        conn.execute(
+            'INSERT OR REPLACE INTO tasks (user_id, id, completed, due_ts, data, version) VALUES (?, ?, ?, ?, ?, ?)',
+            (int(user_id), task['id'], int(bool(task['completed'])), task.get('due_ts'),
+             json.dumps(task, ensure_ascii=False), self._bump_version(conn, user_id))
+        )
+
+    def _delete(self, conn, user_id, task_id):
+        """Borra una tarea y deja constancia para los clientes; True si existía"""
+        anterior = conn.execute(
+            'SELECT completed FROM tasks WHERE user_id = ? AND id = ?', (int(user_id), task_id)
+        ).fetchone()
+        if anterior is None:
+            return False
+        conn.execute('DELETE FROM tasks WHERE user_id = ? AND id = ?', (int(user_id), task_id))
+        self._count(conn, user_id, -1, -anterior[0])
+        conn.execute(
+            'INSERT OR REPLACE INTO task_tombstones (user_id, id, version) VALUES (?, ?, ?)',
+            (int(user_id), task_id, self._bump_version(conn, user_id))
+        )
+        return True
+
+    def _next_id(self, conn, user_id):
+        # Contador persistente por usuario: los ids no se reutilizan al borrar
+        row = conn.execute('SELECT last_id FROM task_counters WHERE user_id = ?', (int(user_id),)).fetchone()
+        if row:
+            last_id = row[0]
+        else:
+            last_id = conn.execute('SELECT MAX(id) FROM tasks WHERE user_id = ?', (int(user_id),)).fetchone()[0] or 0
+        conn.execute('INSERT OR REPLACE INTO task_counters (user_id, last_id) VALUES (?, ?)',
+                     (int(user_id), last_id + 1))
+        return last_id + 1
+
+    def save_tasks(self):
+        """Cada operación ya se confirma en la base; no hay nada que volcar"""
+        pass
+
+    def update_task(self, user_id, task):
+        """Persiste los cambios hechos a una tarea"""
+        with self.db.transaction() as conn:
+            self._write(conn, user_id, task)
+
+    def get_user_ids(self):
+        """Ids (str) de los usuarios que tienen tareas"""
+        rows = self.db.connect().execute('SELECT DISTINCT user_id FROM tasks').fetchall()
+        return [str(row[0]) for row in rows]
+
+    def get_scheduled_tasks(self, shards=None, total_shards=1):
+        """
+        (user_id, task_id, task) de las tareas pendientes con fecha, solo de los
+        usuarios de `shards` (user_id % total_shards) si se indican; de la
+        tarea solo se leen due_ts y los campos de recordatorio (ver ReminderPolicy)
+        """
+        where = 'completed = 0 AND due_ts IS NOT NULL'
+        params = ()
+        if shards is not None:
+            if not shards:
+                return []
+            total_shards = int(total_shards)
+            self._shard_index(total_shards)
+            # El módulo va literal para que la consulta use el índice de expresión
+            where = f"user_id % {total_shards} IN ({','.join('?' * len(shards))}) AND {where}"
+            params = tuple(sorted(shards))
+        rows = self.db.connect().execute(
+            "SELECT user_id, id, due_ts, json_extract(data, '$.reminder_count') AS reminder_count, "
+            "json_extract(data, '$.last_reminder_ts') AS last_reminder_ts, "
+            "json_extract(data, '$.reminder_backoff') AS reminder_backoff "
+            f"FROM tasks WHERE {where}", params
+        ).fetchall()
+        return [(str(row['user_id']), row['id'], {
+            'due_ts': row['due_ts'],
+            'reminder_count': row['reminder_count'],
+            'last_reminder_ts': row['last_reminder_ts'],
+            'reminder_backoff': row['reminder_backoff']
+        }) for row in rows]
+
+    def _shard_index(self, total_shards):
+        """Índice por shard para el número de shards configurado (se crea la primera vez)"""
+        if total_shards in self._shard_indexes:
+            return
+        with self.db.transaction() as conn:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_tasks_shard{total_shards} '
+                         f'ON tasks (user_id % {total_shards}, completed, due_ts)')
+        self._shard_indexes.add(total_shards)
+
+    def get_task(self, user_id, task_id):
+        """Obtiene una tarea de un usuario por id"""
+        tasks = self._fetch('SELECT data FROM tasks WHERE user_id = ? AND id = ?', (int(user_id), task_id))
+        return tasks[0] if tasks else None
+
+    def get_pending_tasks_many(self, ids_by_user):
+        """
+        Tareas aún pendientes de varios usuarios {user_id: [task_id]} en una
+        sola lectura: {user_id: [tarea]} en el orden pedido, sin los que no
+        tienen ninguna
+        """
+        pendientes = {}
+        with self.db.read_transaction() as conn:
+            for user_id, task_ids in ids_by_user.items():
+                task_ids = list(task_ids)
+                if not task_ids:
+                    continue
+                rows = conn.execute(
+                    f"SELECT data FROM tasks WHERE user_id = ? AND completed = 0 "
+                    f"AND id IN ({','.join('?' * len(task_ids))})", (int(user_id), *task_ids)
+                ).fetchall()
+                por_id = {task['id']: task for task in (json.loads(row['data']) for row in rows)}
+                tasks = [por_id[task_id] for task_id in task_ids if task_id in por_id]
+                if tasks:
+                    pendientes[user_id] = tasks
+        return pendientes
+
+    def get_user_tasks(self, user_id):
+        """Obtiene tareas de un usuario"""
+        return self._fetch('SELECT data FROM tasks WHERE user_id = ? ORDER BY id', (int(user_id),))
+
+    def add_task(self, user_id, description, due_date=None, due_time=None, reminder_backoff=None):
+        """Agrega una tarea para un usuario con fecha/hora programada"""
+        due_ts = parse_due_ts(due_date, due_time)
+        with self.db.transaction() as conn:
+            task_id = self._next_id(conn, user_id)
+            task = {
+                'id': task_id,
+                'description': description,
+                'completed': False,
+                'due_date': due_date,
+                'due_time': due_time,
+                'due_ts': due_ts,
+                'reminder_count': 0,
+                'created_at': datetime.now().isoformat()
+            }
+            if reminder_backoff:
+                task['reminder_backoff'] = reminder_backoff
+            self._write(conn, user_id, task)
+        self._notify(user_id, task['id'], task)
+        return task
+
+    def complete_task(self, user_id, task_id):
+        """Marca una tarea como completada"""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                'SELECT data FROM tasks WHERE user_id = ? AND id = ? AND completed = 0',
+                (int(user_id), task_id)
+            ).fetchone()
+            if not row:
+                return None
+            task = json.loads(row['data'])
+            task['completed'] = True
+            task['completed_at'] = datetime.now().isoformat()
+            self._write(conn, user_id, task)
+        self._notify(user_id, task_id, task)
+        return task
+
+    def increment_reminder_count(self, user_id, task_id):
+        """Suma un recordatorio enviado; None si la tarea ya no está pendiente"""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                'SELECT data FROM tasks WHERE user_id = ? AND id = ? AND completed = 0',
+                (int(user_id), task_id)
+            ).fetchone()
+            if not row:
+                return None
+            task = json.loads(row['data'])
+            task['reminder_count'] = task.get('reminder_count', 0) + 1
+            task['last_reminder_ts'] = int(time.time())
+            self._write(conn, user_id, task)
+        return task
+
+    def increment_reminder_counts(self, user_id, task_ids):
+        """
+        Como increment_reminder_count para varias tareas del usuario, en una
+        transacción: una lectura, una versión para todas y un UPDATE por lotes
+        (siguen pendientes, así que los contadores no cambian)
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        with self.db.transaction() as conn:
+            return self._increment_reminders(conn, user_id, task_ids, int(time.time()))
+
+    def increment_reminder_counts_many(self, ids_by_user):
+        """
+        increment_reminder_counts para varios usuarios {user_id: [task_id]} en
+        una sola transacción: {user_id: [tarea]} de los que siguen pendientes
+        """
+        now_ts = int(time.time())
+        recordados = {}
+        with self.db.transaction() as conn:
+            for user_id, task_ids in ids_by_user.items():
+                tasks = self._increment_reminders(conn, user_id, list(task_ids), now_ts) if task_ids else []
+                if tasks:
+                    recordados[user_id] = tasks
+        return recordados
+
+    def _increment_reminders(self, conn, user_id, task_ids, now_ts):
+        rows = conn.execute(
+            f"SELECT data FROM tasks WHERE user_id = ? AND completed = 0 AND id IN ({','.join('?' * len(task_ids))})",
+            (int(user_id), *task_ids)
+        ).fetchall()
+        if not rows:
+            return []
+        version = self._bump_version(conn, user_id)
+        tasks = [json.loads(row['data']) for row in rows]
+        for task in tasks:
+            task['reminder_count'] = task.get('reminder_count', 0) + 1
+            task['last_reminder_ts'] = now_ts
+        conn.executemany(
+            'UPDATE tasks SET data = ?, version = ? WHERE user_id = ? AND id = ?',
+            [(json.dumps(task, ensure_ascii=False), version, int(user_id), task['id']) for task in tasks]
+        )
+        return tasks
+
+    def delete_task(self, user_id, task_id):
+        """Elimina una tarea"""
+        with self.db.transaction() as conn:
+            borrada = self._delete(conn, user_id, task_id)
+        if borrada:
+            self._notify(user_id, task_id, None)
+        return borrada
+
+    def remove_tasks(self, user_id, task_ids):
+        """Quita tareas del conjunto activo (p. ej. al archivarlas)"""
+        with self.db.transaction() as conn:
+            for task_id in task_ids:
+                self._delete(conn, user_id, task_id)
+        for task_id in task_ids:
+            self._notify(user_id, task_id, None)
+
+    def get_pending_tasks(self, user_id):
+        """Obtiene tareas pendientes de un usuario"""
+        return self._fetch(
+            'SELECT data FROM tasks WHERE user_id = ? AND completed = 0 ORDER BY id', (int(user_id),)
+        )
+
+    def count_tasks(self, user_id, now=None):
+        """Contadores total/pending/completed/overdue del usuario, sin recorrer sus tareas"""
+        with self.db.read_transaction() as conn:
+            row = conn.execute('SELECT total, completed FROM task_counts WHERE user_id = ?', (int(user_id),)).fetchone()
+            overdue = conn.execute(
+                f'SELECT COUNT(*) FROM tasks WHERE user_id = ? AND completed = 0 AND {CLAVE_VENCIMIENTO} < ?',
+                (int(user_id), now or time.time())
+            ).fetchone()[0]
+        total, completed = (row[0], row[1]) if row else (0, 0)
+        return {'total': total, 'pending': total - completed, 'completed': completed, 'overdue': overdue}
+
+    def query_tasks(self, user_id, status=None, due_from=None, due_to=None, sort='created', cursor=None, limit=50):
+        """Como TaskManager.query_tasks: página filtrada y ordenada con cursor, servida por índices"""
+        estados, desde, hasta = normalizar_filtros(status, due_from, due_to, time.time())
+        clave = parsear_cursor(sort, cursor)
+        inverso = sort.startswith('-')
+        por_vencimiento = sort.endswith('due')
+
+        where, params = ['user_id = ?'], [int(user_id)]
+        if len(estados) == 1:
+            where.append('completed = ?')
+            params.append(int(estados[0] == 'completed'))
+        if desde is not None:
+            where.append(f'{CLAVE_VENCIMIENTO} >= ?')
+            params.append(desde)
+        if hasta is not None:
+            where.append(f'{CLAVE_VENCIMIENTO} < ?')
+            params.append(hasta)
+        if clave is not None:
+            comparacion = '<' if inverso else '>'
+            if por_vencimiento:
+                # El primer término acota el rango del índice; el segundo desempata por id
+                where.append(f'{CLAVE_VENCIMIENTO} {comparacion}= ? AND ({CLAVE_VENCIMIENTO} {comparacion} ? OR id {comparacion} ?)')
+                params.extend((clave[0], clave[0], clave[1]))
+            else:
+                where.append(f'id {comparacion} ?')
+                params.append(clave)
+        direccion = ' DESC' if inverso else ''
+        orden = f'{CLAVE_VENCIMIENTO}{direccion}, id{direccion}' if por_vencimiento else f'id{direccion}'
+
+        tasks = self._fetch(
+            f"SELECT data FROM tasks WHERE {' AND '.join(where)} ORDER BY {orden} LIMIT ?", (*params, limit + 1)
+        )
+        if len(tasks) > limit:
+            return tasks[:limit], formatear_cursor(sort, tasks[limit - 1])
+        return tasks, None
+
+    def get_version(self, user_id):
+        """Versión actual de las tareas de un usuario"""
+        return formatear_version(self.db.epoch, self._current_version(self.db.connect(), user_id))
+
+    def get_changes(self, user_id, since):
+        """(versión, tareas cambiadas, ids eliminados) desde `since`; None si hay que enviar todo"""
+        numero = parsear_version(since, self.db.epoch)
+        if numero is None:
+            return None
+        with self.db.read_transaction() as conn:
+            actual = self._current_version(conn, user_id)
+            if numero > actual:
+                return None
+            changed = [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM tasks WHERE user_id = ? AND version > ? ORDER BY id', (int(user_id), numero)
+            )]
+            deleted = [row[0] for row in conn.execute(
+                'SELECT id FROM task_tombstones WHERE user_id = ? AND version > ?', (int(user_id), numero)
+            )]
+        return formatear_version(self.db.epoch, actual), changed, deleted
+
+
+def migrar_desde_json(db, users, tasks, last_ids=None):
+    """
+    Copia usuarios y tareas cargados desde JSON a una base vacía. `last_ids`
+    (último id asignado por usuario) evita reutilizar ids de tareas borradas.
+    La comprobación de base vacía va en la misma transacción que las
+    inserciones: si web y planificador arrancan a la vez, solo uno migra
+    """
+    task_manager = SQLiteTaskManager(db)
+    with db.transaction() as conn:
+        if conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] > 0:
+            return False
+        for user in users:
+            conn.execute(
+                'INSERT INTO users (id, username, password, whatsapp_number, whatsapp_e164, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (user['id'], user['username'], user['password'], user.get('whatsapp_number'),
+                 normalizar_e164(user.get('whatsapp_number') or ''), user.get('created_at'))
+            )
+        for user_id, user_tasks in tasks.items():
+            for task in user_tasks:
+                task_manager._write(conn, user_id, task)
+        ultimos = {str(user_id): last_id for user_id, last_id in (last_ids or {}).items()}
+        for user_id, user_tasks in tasks.items():
+            ultimos[str(user_id)] = max(ultimos.get(str(user_id), 0), max((t['id'] for t in user_tasks), default=0))
+        conn.executemany('INSERT INTO task_counters (user_id, last_id) VALUES (?, ?)',
+                         ((int(user_id), last_id) for user_id, last_id in ultimos.items() if last_id))
+    return True
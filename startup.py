@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Arranque del bot: perfil de tiempos, precalentamiento y señal de listo
+Con STARTUP_PROFILE=1 se mide cada import y cada fase del arranque y se
+imprime un informe. El precalentamiento carga en segundo plano los módulos
+pesados (openai, dateparser) para que el primer mensaje no pague su coste.
+"""
+
+import os
+import sys
+import time
+import builtins
+from threading import Thread, Event, Lock
+
+# Se lee del entorno real: este módulo se importa antes de cargar .env
+STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1').lower() in ('1', 'true', 'yes')
+
+# Imports más lentos que se muestran en el informe
+TOP_IMPORTS = 15
+
+_inicio = time.perf_counter()
+_ultima_marca = _inicio
+_lock = Lock()
+
+fases = []              # [(fase, segundos)]
+tiempos_import = {}     # módulo -> segundos (incluye los módulos que importa)
+warmup = {}             # paso -> segundos, o 'error: ...'
+
+listo = Event()         # el servidor HTTP acepta peticiones (no dice nada del planificador)
+calentado = Event()     # terminó el precalentamiento
+planificador = {}       # estado del planificador de este proceso; vacío si no corre aquí
+
+
+class _ImportProfiler:
+    """Sustituye a __import__ y mide el primer import de cada módulo"""
+
+    def __init__(self, original):
+        self.original = original
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original(name, globals, locals, fromlist, level)
+        inicio = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            tiempos_import.setdefault(name, time.perf_counter() - inicio)
+
+
+if STARTUP_PROFILE:
+    builtins.__import__ = _ImportProfiler(builtins.__import__)
+
+
+def marcar(fase):
+    """Registra el tiempo transcurrido desde la marca anterior"""
+    global _ultima_marca
+    with _lock:
+        ahora = time.perf_counter()
+        fases.append((fase, ahora - _ultima_marca))
+        _ultima_marca = ahora
+
+
+def marcar_planificador(estado, recordatorios=None):
+    """Estado del planificador de este proceso: 'waiting' (sin lease) o 'active' (recordatorios cargados)"""
+    with _lock:
+        planificador.update(state=estado, reminders=recordatorios)
+
+
+def segundos_desde_inicio():
+    return time.perf_counter() - _inicio
+
+
+def calentar(pasos):
+    """Ejecuta en segundo plano los pasos [(nombre, función)] del precalentamiento"""
+    def _run():
+        for nombre, funcion in pasos:
+            inicio = time.perf_counter()
+            try:
+                funcion()
+                warmup[nombre] = round(time.perf_counter() - inicio, 3)
+            except Exception as e:
+                warmup[nombre] = f"error: {e}"
+        calentado.set()
+        if STARTUP_PROFILE:
+            print(f"🔥 Precalentamiento: {warmup}")
+
+    if not STARTUP_WARMUP:
+        calentado.set()
+        return
+    Thread(target=_run, daemon=True, name='warmup').start()
+
+
+def informe():
+    """Imprime las fases del arranque y los imports más lentos (solo con STARTUP_PROFILE)"""
+    if not STARTUP_PROFILE:
+        return
+    print("\n⏱️  Perfil de arranque")
+    for fase, segundos in fases:
+        print(f"   {fase:<32} {segundos * 1000:>8.1f} ms")
+    print(f"   {'total':<32} {segundos_desde_inicio() * 1000:>8.1f} ms")
+    print("   Imports más lentos (incluyen sus dependencias):")
+    for modulo, segundos in sorted(tiempos_import.items(), key=lambda x: -x[1])[:TOP_IMPORTS]:
+        print(f"     {modulo:<30} {segundos * 1000:>8.1f} ms")
+
+
+def estado():
+    """Estado del arranque para el endpoint de salud"""
+    with _lock:
+        scheduler = dict(planificador) or None
+    return {
+        'ready': listo.is_set(),
+        'warm': calentado.is_set(),
+        'scheduler': scheduler,
+        'uptime_seconds': round(segundos_desde_inicio(), 3),
+        'phases_ms': {fase: round(segundos * 1000, 1) for fase, segundos in fases},
+        'warmup': dict(warmup)
+    }
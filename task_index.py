@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Índices ordenados de las tareas de cada usuario (backend JSON)
+Por estado (pendiente/completada) se mantienen dos listas ordenadas: por id
+y por (vencimiento, id). Con ellas una página filtrada y ordenada cuesta
+O(log n + página) y los contadores salen de sus longitudes, sin recorrer las
+tareas. Las tareas sin fecha se ordenan al final (SIN_FECHA).
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+# 9999-12-31 23:59:59 UTC: clave de vencimiento de las tareas sin fecha
+SIN_FECHA = 253402300799
+
+ESTADOS = ('pending', 'completed')
+FILTROS_ESTADO = ('all', 'pending', 'completed', 'overdue')
+ORDENES = ('created', '-created', 'due', '-due')
+
+
+def clave_vencimiento(due_ts):
+    return SIN_FECHA if due_ts is None else due_ts
+
+
+def normalizar_filtros(status, due_from, due_to, now):
+    """
+    (estados, desde, hasta) para un filtro de estado y un rango de
+    vencimiento [due_from, due_to) en epoch. Con rango o con 'overdue' solo
+    entran tareas con fecha. ValueError si el estado no existe.
+    """
+    status = status or 'all'
+    if status not in FILTROS_ESTADO:
+        raise ValueError(f"Estado inválido: {status}")
+    estados = ESTADOS if status == 'all' else ('completed',) if status == 'completed' else ('pending',)
+    hasta = due_to
+    if status == 'overdue':
+        hasta = now if hasta is None else min(hasta, now)
+    if due_from is not None or hasta is not None:
+        hasta = SIN_FECHA if hasta is None else min(hasta, SIN_FECHA)
+    return estados, due_from, hasta
+
+
+def formatear_cursor(orden, task):
+    """Cursor opaco con la clave de orden de la última tarea de la página"""
+    if orden.endswith('due'):
+        return f"{clave_vencimiento(task.get('due_ts'))}:{task['id']}"
+    return str(task['id'])
+
+
+def parsear_cursor(orden, cursor):
+    """Clave de orden del cursor; ValueError si no es válido para ese orden"""
+    if orden not in ORDENES:
+        raise ValueError(f"Orden inválido: {orden}")
+    if cursor is None:
+        return None
+    if orden.endswith('due'):
+        vencimiento, _, task_id = cursor.partition(':')
+        return int(vencimiento), int(task_id)
+    return int(cursor)
+
+
+class TaskIndex:
+    """Listas ordenadas de ids de las tareas de un usuario, por estado"""
+
+    def __init__(self, tasks=()):
+        self._estado = {}       # id -> (estado, clave de vencimiento)
+        self._por_id = {estado: [] for estado in ESTADOS}
+        self._por_vencimiento = {estado: [] for estado in ESTADOS}
+        for task in tasks:
+            self.put(task)
+
+    def put(self, task):
+        """Indexa una tarea nueva o modificada"""
+        task_id = task['id']
+        nuevo = ('completed' if task['completed'] else 'pending', clave_vencimiento(task.get('due_ts')))
+        anterior = self._estado.get(task_id)
+        if anterior == nuevo:
+            return
+        if anterior is not None:
+            self._quitar(task_id, anterior)
+        self._estado[task_id] = nuevo
+        estado, clave = nuevo
+        insort(self._por_id[estado], task_id)
+        insort(self._por_vencimiento[estado], (clave, task_id))
+
+    def remove(self, task_id):
+        anterior = self._estado.pop(task_id, None)
+        if anterior is not None:
+            self._quitar(task_id, anterior)
+
+    def _quitar(self, task_id, anterior):
+        estado, clave = anterior
+        ids = self._por_id[estado]
+        del ids[bisect_left(ids, task_id)]
+        claves = self._por_vencimiento[estado]
+        del claves[bisect_left(claves, (clave, task_id))]
+
+    def counts(self, now):
+        """Contadores por estado; las vencidas son las pendientes con vencimiento < now"""
+        pending = len(self._por_id['pending'])
+        completed = len(self._por_id['completed'])
+        return {
+            'total': pending + completed,
+            'pending': pending,
+            'completed': completed,
+            'overdue': bisect_left(self._por_vencimiento['pending'], (now,))
+        }
+
+    def query(self, estados, desde, hasta, orden, cursor, limit):
+        """Hasta `limit` ids de los estados dados, en el orden pedido, a partir del cursor"""
+        inverso = orden.startswith('-')
+        if orden.endswith('due'):
+            fuentes = [self._rango(self._por_vencimiento[e], desde, hasta, cursor, inverso) for e in estados]
+            claves = heapq.merge(*fuentes, reverse=inverso)
+            return [task_id for _, task_id in islice(claves, limit)]
+
+        if desde is None and hasta is None:
+            fuentes = [self._rango(self._por_id[e], None, None, cursor, inverso) for e in estados]
+            return list(islice(heapq.merge(*fuentes, reverse=inverso), limit))
+
+        # Orden por id con rango de vencimiento: los ids del rango, reordenados
+        ids = sorted((task_id for e in estados
+                      for _, task_id in self._rango(self._por_vencimiento[e], desde, hasta, None, False)),
+                     reverse=inverso)
+        if cursor is not None:
+            ids = [task_id for task_id in ids if (task_id < cursor if inverso else task_id > cursor)]
+        return ids[:limit]
+
+    def _rango(self, lista, desde, hasta, cursor, inverso):
+        """Elementos de la lista ordenada dentro de [desde, hasta) y después del cursor"""
+        inicio = 0 if desde is None else bisect_left(lista, (desde,))
+        fin = len(lista) if hasta is None else bisect_left(lista, (hasta,))
+        if cursor is not None:
+            if inverso:
+                fin = min(fin, bisect_left(lista, cursor))
+            else:
+                inicio = max(inicio, bisect_right(lista, cursor))
+        indices = range(fin - 1, inicio - 1, -1) if inverso else range(inicio, fin)
+        return (lista[i] for i in indices)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Extracción de fecha y hora de mensajes en español
+Reconoce con expresiones regulares precompiladas las formas habituales
+("a las 3", "3pm", "15h", "8:30 de la noche", "mañana", "el viernes",
+"en 20 minutos", "15 de diciembre"...). dateparser solo se usa como último
+recurso y restringido a español. Los resultados se guardan en una caché LRU.
+"""
+
+import re
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+
+TIME_PARSER_CACHE_SIZE = 4096
+
+NUMEROS = {
+    'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6,
+    'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12
+}
+DIAS_SEMANA = {
+    'lunes': 0, 'martes': 1, 'miercoles': 2, 'miércoles': 2, 'jueves': 3,
+    'viernes': 4, 'sabado': 5, 'sábado': 5, 'domingo': 6
+}
+MESES = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7,
+    'agosto': 8, 'septiembre': 9, 'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
+}
+
+_HORA = r'(\d{1,2}|' + '|'.join(NUMEROS) + r')'
+_MERIDIANO = r'([ap])\.?\s?m\.?(?!\w)'
+_PERIODO = r'(?:\s+(?:de|en|por)\s+la\s+(mañana|manana|madrugada|tarde|noche))?'
+_A_LAS = r'(?:\b(?:a|para|desde|hasta)\s+las?\s+)?'
+
+# Horas, de la forma más específica a la más general
+PATRON_HH_MM = re.compile(_A_LAS + r'\b(\d{1,2}):(\d{2})\s*(?:hrs?\b|hs\b|h\b)?\s*(?:' + _MERIDIANO + r')?' + _PERIODO, re.IGNORECASE)
+PATRON_H_MERIDIANO = re.compile(_A_LAS + r'\b(\d{1,2})\s*' + _MERIDIANO + _PERIODO, re.IGNORECASE)
+PATRON_H_24 = re.compile(r'\b(\d{1,2})\s*(?:h|hs|hrs)\b', re.IGNORECASE)
+PATRON_A_LAS = re.compile(
+    r'\b(?:a|para|desde|hasta)\s+las?\s+' + _HORA + r'\b(?:\s+y\s+(media|cuarto)|\s+menos\s+cuarto)?' + _PERIODO,
+    re.IGNORECASE
+)
+PATRON_MEDIODIA = re.compile(r'\b(?:a\s+)?(?:la\s+|al\s+|a\s+la\s+)?(medi[oa]d[ií]a|medianoche)\b', re.IGNORECASE)
+PATRON_RELATIVO = re.compile(r'\ben\s+(\d{1,3}|un|una|media)\s+(minutos?|mins?|horas?|hrs?)\b', re.IGNORECASE)
+
+# Fechas
+PATRON_PASADO_MANANA = re.compile(r'\bpasado\s+ma[ñn]ana\b', re.IGNORECASE)
+PATRON_MANANA = re.compile(r'(?<!la )\bma[ñn]ana\b', re.IGNORECASE)
+PATRON_HOY = re.compile(r'\b(?:hoy|esta\s+(tarde|noche))\b', re.IGNORECASE)
+PATRON_DIA_SEMANA = re.compile(
+    r'\b(?:el\s+|este\s+|pr[oó]ximo\s+)?(' + '|'.join(DIAS_SEMANA) + r')(?:\s+que\s+viene)?\b', re.IGNORECASE
+)
+PATRON_ISO = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+PATRON_DD_MM = re.compile(r'\b(?:el\s+)?(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b', re.IGNORECASE)
+PATRON_DIA_DE_MES = re.compile(
+    r'\b(?:el\s+)?(\d{1,2})\s+de\s+(' + '|'.join(MESES) + r')(?:\s+(?:de|del)\s+(\d{4}))?\b', re.IGNORECASE
+)
+
+PATRONES_HORA = (PATRON_HH_MM, PATRON_H_MERIDIANO, PATRON_A_LAS, PATRON_H_24, PATRON_MEDIODIA)
+PATRONES_FECHA = (PATRON_ISO, PATRON_DIA_DE_MES, PATRON_DD_MM, PATRON_PASADO_MANANA,
+                  PATRON_MANANA, PATRON_HOY, PATRON_DIA_SEMANA)
+PATRON_CONECTOR_FINAL = re.compile(r'\s+(?:a|al|el|en|para|de|la|las|y)\s*$', re.IGNORECASE)
+
+
+def _numero(valor):
+    return NUMEROS[valor.lower()] if valor.lower() in NUMEROS else int(valor)
+
+
+def _hora_24(hora, minuto, meridiano=None, periodo=None):
+    """(hora, minuto, ambigua): ambigua si no se sabe si es de mañana o de tarde"""
+    if meridiano:
+        return hora % 12 + (12 if meridiano.lower() == 'p' else 0), minuto, False
+    if periodo:
+        periodo = periodo.lower()
+        if periodo in ('tarde', 'noche'):
+            if periodo == 'noche' and hora == 12:
+                return 0, minuto, False
+            return (hora + 12 if hora < 12 else hora), minuto, False
+        return hora % 12, minuto, False
+    return hora, minuto, 1 <= hora <= 11
+
+
+def _buscar_hora(texto):
+    """Primera expresión de hora del texto como (hora, minuto, ambigua) o None"""
+    match = PATRON_HH_MM.search(texto)
+    if match:
+        return _hora_24(int(match.group(1)), int(match.group(2)), match.group(3), match.group(4))
+
+    match = PATRON_H_MERIDIANO.search(texto)
+    if match:
+        return _hora_24(int(match.group(1)), 0, match.group(2), match.group(3))
+
+    match = PATRON_A_LAS.search(texto)
+    if match:
+        fraccion = match.group(2)
+        minuto = (30 if fraccion.lower() == 'media' else 15) if fraccion else 0
+        hora, minuto, ambigua = _hora_24(_numero(match.group(1)), minuto, periodo=match.group(3))
+        if 'menos' in match.group(0).lower():
+            hora, minuto = (hora - 1) % 24, 45
+        return hora, minuto, ambigua
+
+    match = PATRON_H_24.search(texto)
+    if match:
+        return int(match.group(1)), 0, False
+
+    match = PATRON_MEDIODIA.search(texto)
+    if match:
+        return (0 if match.group(1).lower() == 'medianoche' else 12), 0, False
+
+    return None
+
+
+def _buscar_fecha(texto, hoy):
+    """Primera expresión de fecha del texto como (date, periodo_implícito) o (None, None)"""
+    match = PATRON_ISO.search(texto)
+    if match:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3))), None
+
+    match = PATRON_DIA_DE_MES.search(texto) or PATRON_DD_MM.search(texto)
+    if match:
+        dia = int(match.group(1))
+        mes = MESES.get(match.group(2).lower()) or int(match.group(2))
+        anio = match.group(3)
+        if anio:
+            anio = int(anio) + (2000 if len(anio) == 2 else 0)
+            return date(anio, mes, dia), None
+        fecha = date(hoy.year, mes, dia)
+        return (fecha if fecha >= hoy else date(hoy.year + 1, mes, dia)), None
+
+    if PATRON_PASADO_MANANA.search(texto):
+        return hoy + timedelta(days=2), None
+    if PATRON_MANANA.search(texto):
+        return hoy + timedelta(days=1), None
+
+    match = PATRON_HOY.search(texto)
+    if match:
+        return hoy, match.group(1)
+
+    match = PATRON_DIA_SEMANA.search(texto)
+    if match:
+        dias = (DIAS_SEMANA[match.group(1).lower()] - hoy.weekday()) % 7 or 7
+        return hoy + timedelta(days=dias), None
+
+    return None, None
+
+
+def _con_dateparser(texto, ahora):
+    """Último recurso: dateparser solo en español"""
+    import dateparser
+    try:
+        return dateparser.parse(texto, languages=['es'], settings={
+            'PREFER_DATES_FROM': 'future',
+            'PREFER_DAY_OF_MONTH': 'current',
+            'RELATIVE_BASE': ahora
+        })
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=TIME_PARSER_CACHE_SIZE)
+def _extraer(texto, ahora):
+    match = PATRON_RELATIVO.search(texto)
+    if match:
+        cantidad = match.group(1).lower()
+        cantidad = 0.5 if cantidad == 'media' else 1 if cantidad in ('un', 'una') else int(cantidad)
+        minutos = cantidad * 60 if match.group(2).lower().startswith('h') else cantidad
+        return ahora + timedelta(minutes=minutos), True
+
+    hoy = ahora.date()
+    fecha, periodo = _buscar_fecha(texto, hoy)
+    hora = _buscar_hora(texto)
+
+    if hora is None:
+        if fecha is not None:
+            return datetime.combine(fecha, time()), False
+        resultado = _con_dateparser(texto, ahora)
+        return resultado, resultado is not None
+
+    h, m, ambigua = hora
+    if not (0 <= h <= 23 and 0 <= m <= 59):
+        return None, False
+    if ambigua and periodo:
+        h, m, ambigua = _hora_24(h, m, periodo=periodo)
+    if ambigua and h <= 6:
+        # Nadie pide un recordatorio "a las 3" pensando en la madrugada
+        h, ambigua = h + 12, False
+
+    dia = fecha or hoy
+    candidatas = [datetime.combine(dia, time(h, m))]
+    if ambigua:
+        candidatas.append(datetime.combine(dia, time(h + 12, m)))
+    for candidata in candidatas:
+        # Con "hoy" y hora ambigua también se busca la primera que no pasó
+        if (fecha is not None and fecha != hoy) or candidata > ahora:
+            return candidata, True
+    if fecha is not None:
+        # "hoy" con una hora que ya pasó: se respeta el día pedido
+        return candidatas[0], True
+    # La hora ya pasó hoy y no se indicó fecha: mañana
+    return candidatas[0] + timedelta(days=1), True
+
+
+def extraer_hora_fecha(texto, ahora=None):
+    """
+    Devuelve (fecha 'YYYY-MM-DD', hora 'HH:MM') del texto. La hora es None si no
+    se encontró; la fecha también si tampoco se encontró ninguna.
+    """
+    ahora = (ahora or datetime.now()).replace(second=0, microsecond=0)
+    try:
+        resultado, con_hora = _extraer(texto.strip(), ahora)
+    except ValueError:
+        # Fecha imposible, como 31/02
+        return None, None
+    if resultado is None:
+        return None, None
+    return resultado.strftime('%Y-%m-%d'), resultado.strftime('%H:%M') if con_hora else None
+
+
+def limpiar_descripcion(texto):
+    """Quita del texto las expresiones de fecha y hora para dejar solo la tarea"""
+    for patron in (PATRON_RELATIVO,) + PATRONES_HORA + PATRONES_FECHA:
+        texto = patron.sub(' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip(' ,.-')
+    return PATRON_CONECTOR_FINAL.sub('', texto).strip(' ,.-')
+
+
+def cache_info():
+    """Estadísticas de la caché LRU del parser"""
+    info = _extraer.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def precalentar():
+    """Carga dateparser y sus datos de español antes del primer mensaje que los necesite"""
+    import dateparser
+    dateparser.parse('mañana a las 3', languages=['es'])
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Versiones de las tareas para sincronizar clientes
+Cada usuario tiene un contador que sube con cada cambio en sus tareas. El
+cliente guarda la versión que vio ("<época>.<n>") y la usa como ETag o en
+?since= para recibir solo lo que cambió. La época cambia al reiniciar (JSON)
+o al crear la base (SQLite): un token de otra época obliga a pedir todo.
+"""
+
+import secrets
+from threading import Lock
+
+
+def nueva_epoca():
+    return secrets.token_hex(4)
+
+
+def formatear_version(epoca, numero):
+    return f"{epoca}.{numero}"
+
+
+def parsear_version(token, epoca):
+    """Número de versión del token, o None si no es de esta época o no es válido"""
+    prefijo, _, numero = (token or '').strip().strip('"').partition('.')
+    if prefijo != epoca or not numero.isdigit():
+        return None
+    return int(numero)
+
+
+class ChangeTracker:
+    """Contador de versión por usuario y versión del último cambio de cada tarea (en memoria)"""
+
+    def __init__(self):
+        self.epoch = nueva_epoca()
+        self._lock = Lock()
+        self._versions = {}     # user_id -> último número de versión
+        self._changed = {}      # user_id -> {task_id: versión del último cambio}
+
+    def bump(self, user_id, task_id):
+        """Registra un cambio (alta, modificación o borrado) de una tarea"""
+        with self._lock:
+            numero = self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._changed.setdefault(user_id, {})[task_id] = numero
+
+    def version(self, user_id):
+        return formatear_version(self.epoch, self._versions.get(user_id, 0))
+
+    def changed_since(self, user_id, since):
+        """(versión actual, ids cambiados desde `since`), o None si hay que enviar todo"""
+        numero = parsear_version(since, self.epoch)
+        with self._lock:
+            actual = self._versions.get(user_id, 0)
+            if numero is None or numero > actual:
+                return None
+            ids = [task_id for task_id, v in self._changed.get(user_id, {}).items() if v > numero]
+        return formatear_version(self.epoch, actual), ids
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Grupo de workers con colas acotadas y orden por clave
+Cada clave (p. ej. un número de WhatsApp) se asigna siempre al mismo
+worker, así que los trabajos de una misma clave se procesan en orden.
+"""
+
+import math
+import time
+import zlib
+import queue
+from collections import deque
+from threading import Thread, Lock
+
+
+class KeyedWorkerPool:
+    """Workers que ejecutan handler(*args), serializados por clave"""
+
+    def __init__(self, handler, workers=4, queue_size=1000, name='worker'):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.name = name
+        per_worker = max(1, queue_size // self.workers)
+        self.queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+
+        self.stats = {'processed': 0, 'failed': 0, 'rejected': 0}
+        self._latencies = deque(maxlen=1000)
+        self._lock = Lock()
+        self._started = False
+
+    def start(self):
+        """Arranca los workers (se llama solo al primer trabajo)"""
+        with self._lock:
+            if self._started:
+                return
+            for i, q in enumerate(self.queues):
+                Thread(target=self._run, args=(q,), name=f"{self.name}-{i}", daemon=True).start()
+            self._started = True
+
+    def submit(self, key, *args, block=True):
+        """
+        Encola un trabajo para la clave dada. Con block=False devuelve False
+        en vez de esperar si la cola de ese worker está llena.
+        """
+        self.start()
+        q = self.queues[zlib.crc32(str(key).encode()) % self.workers]
+        try:
+            q.put((time.perf_counter(), args), block=block)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        return True
+
+    def join(self):
+        """Espera a que se vacíen todas las colas"""
+        for q in self.queues:
+            q.join()
+
+    def depth(self):
+        """Trabajos en cola (sin contar los que se están procesando)"""
+        return sum(q.qsize() for q in self.queues)
+
+    def metrics(self):
+        """Profundidad de cola, contadores y latencia (encolado → fin) en ms"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.stats)
+        metrics = {'queue_depth': self.depth(), 'workers': self.workers, **stats}
+        if latencies:
+            metrics['latency_ms'] = {
+                'p50': round(latencies[len(latencies) // 2], 2),
+                'p95': round(latencies[min(len(latencies) - 1, math.ceil(len(latencies) * 0.95) - 1)], 2),
+                'max': round(latencies[-1], 2)
+            }
+        return metrics
+
+    def _run(self, q):
+        while True:
+            enqueued_at, args = q.get()
+            resultado = 'processed'
+            try:
+                self.handler(*args)
+            except Exception as e:
+                print(f"❌ Error en {self.name}: {str(e)}")
+                resultado = 'failed'
+            finally:
+                with self._lock:
+                    self.stats[resultado] += 1
+                    self._latencies.append((time.perf_counter() - enqueued_at) * 1000)
+                q.task_done()
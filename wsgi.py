@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada WSGI para producción
+gunicorn wsgi:app   (configuración en gunicorn.conf.py)
+"""
+
+from reminder_bot_auth import create_app
+
+app = create_app()